@@ -15,3 +15,21 @@ class ApiConfig(AppConfig):
             import_module("api.services.game_modes")
 
         connection_created.connect(setup_game_services)
+
+        self.connect_country_catalog()
+
+    @staticmethod
+    def connect_country_catalog():
+        from django.db.models.signals import m2m_changed, post_delete, post_save
+
+        from api.country_catalog import country_catalog
+        from core.models import City, Country
+
+        for model in (Country, City):
+            post_save.connect(country_catalog.on_catalog_change, sender=model, dispatch_uid=f"country_catalog_{model}")
+            post_delete.connect(
+                country_catalog.on_catalog_change, sender=model, dispatch_uid=f"country_catalog_delete_{model}"
+            )
+        m2m_changed.connect(
+            country_catalog.on_catalog_change, sender=Country.cities.through, dispatch_uid="country_catalog_cities"
+        )
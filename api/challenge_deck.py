@@ -0,0 +1,73 @@
+import random
+
+from django.conf import settings
+
+
+class ChallengeDeck:
+    """
+    Order of the questions of a challenge, kept as a seed, a cursor and the ids of the countries of the deck.
+
+    The ids of the eligible countries are taken once, when the deck is started, so countries added to the catalog
+    during the game do not move the cursor. The seed shuffles these sorted ids, so the same permutation is rebuilt
+    for every chunk, and the cursor is the position of the next question to send in it.
+    """
+
+    __slots__ = ("seed", "cursor", "country_ids")
+
+    SEED_FIELD = "deck_seed"
+    CURSOR_FIELD = "deck_cursor"
+    COUNTRY_IDS_FIELD = "deck_country_ids"
+    STORED_FIELDS = [SEED_FIELD, CURSOR_FIELD, COUNTRY_IDS_FIELD]
+
+    def __init__(self, seed: int | None = None, cursor: int = 0, country_ids: list[int] | None = None):
+        self.seed = seed
+        self.cursor = cursor
+        self.country_ids = country_ids
+
+    @property
+    def is_started(self) -> bool:
+        return self.seed is not None
+
+    def start(self, country_ids: list[int]) -> None:
+        self.seed = random.getrandbits(32)  # nosec
+        self.cursor = 0
+        self.country_ids = sorted(country_ids)
+
+    def get_order(self, country_ids: list[int]) -> list[int]:
+        order = sorted(country_ids)
+        random.Random(self.seed).shuffle(order)  # nosec
+        return order
+
+    def next_chunk(self, country_ids: list[int]) -> list[int]:
+        """
+        Return the ids of the next GAME_CHALLENGE_CHUNK_SIZE questions, an empty list once the deck is exhausted.
+        The countries of the deck that are no longer in country_ids (removed from the catalog) are skipped.
+        """
+        if not self.is_started:
+            self.start(country_ids)
+        elif self.country_ids is None:
+            # Deck started before its countries were stored
+            self.country_ids = sorted(country_ids)
+
+        order = self.get_order(self.country_ids)
+        eligible_ids = set(country_ids)
+        chunk = []
+        while self.cursor < len(order) and len(chunk) < settings.GAME_CHALLENGE_CHUNK_SIZE:
+            country_id = order[self.cursor]
+            self.cursor += 1
+            if country_id in eligible_ids:
+                chunk.append(country_id)
+        return chunk
+
+    @classmethod
+    def from_stored_data(cls, data: dict) -> "ChallengeDeck":
+        return cls(
+            seed=data.get(cls.SEED_FIELD),
+            cursor=data.get(cls.CURSOR_FIELD) or 0,
+            country_ids=data.get(cls.COUNTRY_IDS_FIELD),
+        )
+
+    def to_stored_data(self) -> dict:
+        if not self.is_started:
+            return {}
+        return {self.SEED_FIELD: self.seed, self.CURSOR_FIELD: self.cursor, self.COUNTRY_IDS_FIELD: self.country_ids}
@@ -1,19 +1,50 @@
-from channels.generic.websocket import JsonWebsocketConsumer
+from channels.consumer import get_handler_name
+from channels.generic.websocket import AsyncJsonWebsocketConsumer, JsonWebsocketConsumer
+from django.conf import settings
 from django.utils.translation import gettext as _
 
+from api.game_executor import game_executor
 from api.game_registery import GameServiceRegistry
+from api.game_session import GameSession
+from api.guess_recorder import guess_recorder
 from api.schema import AnswerResult, CorrectAnswer, SetUserWebsocket, WebsocketMessage
 from api.services.game_modes.base_game import GameService
 
 
 class GameConsumer(JsonWebsocketConsumer):
     game_service: GameService
+    game_session: GameSession | None = None
     language: str = ""
     session_id: str = ""  # for unique sessions by game modes
 
+    async def dispatch(self, message):
+        """
+        By default, channels runs sync handlers on the one thread shared by all the connections of the process.
+        In "pool" execution mode, they run on the bounded game executor instead.
+        """
+        if settings.GAME_EXECUTION_MODE != "pool":
+            return await super().dispatch(message)
+
+        await game_executor.run(self._dispatch_sync, message)
+
+    def _dispatch_sync(self, message):
+        handler = getattr(self, get_handler_name(message), None)
+        if handler is None:
+            raise ValueError(f"No handler for message type {message['type']}")
+
+        handler(message)
+
     def connect(self):
         self.accept()
 
+    def disconnect(self, code):
+        if self.game_session is None:
+            return
+        if self.game_session.has_unsaved_changes:
+            self.game_session.save()
+        if self.game_session.user.is_authenticated:
+            guess_recorder.flush(user_id=self.game_session.user.id, game_mode=self.game_service.GAME_MODE)
+
     def receive_json(self, content, **kwargs):
         match content["type"]:
             case "user_accept":
@@ -44,7 +75,9 @@ class GameConsumer(JsonWebsocketConsumer):
         if self.game_service is None:
             raise ValueError(_("Unknown game mode: {game_mode}".format(game_mode=data.game_mode)))
 
-        is_user_authenticated = self.game_service.user_accept(self.session_id, data.token, data.continents)
+        # Resume the game if this session was already played (e.g, reconnection on another worker)
+        self.game_session = GameSession.load(self.session_id)
+        is_user_authenticated = self.game_service.user_accept(self.game_session, data.token, data.continents)
 
         message = WebsocketMessage(
             type="user_accept",
@@ -58,25 +91,26 @@ class GameConsumer(JsonWebsocketConsumer):
         self.send_questions()
 
     def send_questions(self):
-        questions = self.game_service.get_questions(self.session_id)
+        questions = self.game_service.get_questions(self.game_session)
         message = WebsocketMessage(type="new_questions", payload=questions.model_dump(by_alias=True))
         self.send_json(message.model_dump(by_alias=True))
 
     def answer_result(self, content: dict[int, str], skipped: bool = False):
         question_id = int(content["id"])
         answer_submitted = content["answer"] if not skipped else ""
-        user = self.game_service.user_get(self.session_id)
+        user = self.game_session.user
 
         is_correct, country, *remaining_to_guess = self.game_service.check_answer(
-            self.session_id, question_id, answer_submitted, user
+            self.game_session, question_id, answer_submitted
         )
 
         # for countries with several cities as capital
         remaining_to_guess = remaining_to_guess[0] if remaining_to_guess else 0
 
         current_streak, game_over, best_streak = self.game_service.user_get_streak_score(
-            self.session_id, user, is_correct, remaining_to_guess
+            self.game_session, is_correct, remaining_to_guess
         )
+        self.game_session.answer_recorded(force_checkpoint=game_over)
 
         correct_answer: CorrectAnswer = []  # needs to be a lis, as countries can have several cities as capital
         if skipped or game_over:
@@ -97,3 +131,104 @@ class GameConsumer(JsonWebsocketConsumer):
         )
 
         self.send_json(message.model_dump(by_alias=True))
+
+
+class AsyncGameConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Same protocol as GameConsumer, but handlers await the cache and the database instead of blocking a thread.
+    """
+
+    game_service: GameService
+    game_session: GameSession | None = None
+    language: str = ""
+    session_id: str = ""  # for unique sessions by game modes
+
+    async def connect(self):
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.game_session is None:
+            return
+        if self.game_session.has_unsaved_changes:
+            await self.game_session.asave()
+        if self.game_session.user.is_authenticated:
+            await guess_recorder.aflush(user_id=self.game_session.user.id, game_mode=self.game_service.GAME_MODE)
+
+    async def receive_json(self, content, **kwargs):
+        match content["type"]:
+            case "user_accept":
+                await self.store_user(content)
+            case "answer_submission":
+                await self.answer_result(content)
+            case "request_questions":
+                await self.send_questions()
+            case "question_skipped":
+                await self.answer_result(content, skipped=True)
+            case "user_change_language":
+                self.language = content["language"]
+            case _:
+                raise ValueError(f"Unknown message type: {content['type']}")
+
+    async def store_user(self, content: dict):
+        data = SetUserWebsocket.model_validate(content, by_alias=True)
+
+        self.session_id = data.game_token
+        self.language = data.language
+
+        self.game_service = GameServiceRegistry.get_game_service(data.game_mode)
+        if self.game_service is None:
+            raise ValueError(_("Unknown game mode: {game_mode}".format(game_mode=data.game_mode)))
+
+        self.game_session = await GameSession.aload(self.session_id)
+        is_user_authenticated = await self.game_service.auser_accept(self.game_session, data.token, data.continents)
+
+        message = WebsocketMessage(
+            type="user_accept",
+            payload={
+                "isUserAuthenticated": is_user_authenticated,
+            },
+        )
+        await self.send_json(message.model_dump(by_alias=True))
+
+        # Initial questions
+        await self.send_questions()
+
+    async def send_questions(self):
+        questions = await self.game_service.aget_questions(self.game_session)
+        message = WebsocketMessage(type="new_questions", payload=questions.model_dump(by_alias=True))
+        await self.send_json(message.model_dump(by_alias=True))
+
+    async def answer_result(self, content: dict[int, str], skipped: bool = False):
+        question_id = int(content["id"])
+        answer_submitted = content["answer"] if not skipped else ""
+        user = self.game_session.user
+
+        is_correct, country, *remaining_to_guess = await self.game_service.acheck_answer(
+            self.game_session, question_id, answer_submitted
+        )
+
+        # for countries with several cities as capital
+        remaining_to_guess = remaining_to_guess[0] if remaining_to_guess else 0
+
+        current_streak, game_over, best_streak = await self.game_service.auser_get_streak_score(
+            self.game_session, is_correct, remaining_to_guess
+        )
+        await self.game_session.aanswer_recorded(force_checkpoint=game_over)
+
+        correct_answer: CorrectAnswer = []
+        if skipped or game_over:
+            correct_answer: CorrectAnswer = await self.game_service.aget_correct_answer(user, country, self.language)
+
+        message = WebsocketMessage(
+            type="answer_result",
+            payload=AnswerResult(
+                id=content["id"],
+                is_correct=is_correct,
+                current_streak=current_streak,
+                best_streak=best_streak,
+                correct_answer=correct_answer,
+                remaining_to_guess=remaining_to_guess,
+            ).model_dump(by_alias=True),
+        )
+
+        await self.send_json(message.model_dump(by_alias=True))
@@ -0,0 +1,248 @@
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import City, Country
+
+
+# Entries are hashed without their dict fields, so that they can be put in sets or used as keys
+@dataclass(frozen=True, slots=True)
+class CityEntry:
+    id: int
+    names: dict[str, str] = field(hash=False)  # language -> name
+    wikipedia_links: dict[str, str] = field(hash=False)  # language -> link
+    is_capital: bool
+    country_ids: tuple[int, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class CountryEntry:
+    id: int
+    iso2_code: str
+    names: dict[str, str] = field(hash=False)  # language -> name
+    wikipedia_links: dict[str, str] = field(hash=False)  # language -> link
+    continent: str
+    has_flag: bool
+    capital_ids: tuple[int, ...]
+
+
+# Countries a game can ask about: with a flag, or with a capital (None: all the countries)
+ELIGIBLE_WITH_FLAG = "flag"
+ELIGIBLE_WITH_CAPITAL = "capital"
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogData:
+    """
+    Sets of countries are kept as bitmasks, bit i standing for the country at position i of country_ids,
+    so that they are combined with integer operations instead of queries.
+    """
+
+    countries_by_iso2: dict[str, CountryEntry]
+    cities_by_id: dict[int, CityEntry]
+    countries_by_id: dict[int, CountryEntry]
+    # Sorted country ids, by bit position
+    country_ids: tuple[int, ...]
+    positions_by_id: dict[int, int]
+    # Eligibility -> mask (None: all the countries)
+    eligibility_masks: dict[str | None, int]
+    # Continent -> mask
+    continent_masks: dict[str, int]
+
+    def get_country(self, iso2_code: str) -> CountryEntry | None:
+        return self.countries_by_iso2.get(iso2_code)
+
+    def get_eligible_mask(self, eligibility: str | None, continents: list[str] | None = None) -> int:
+        """
+        Countries with the eligibility, on the given continents (all of them by default).
+        """
+        mask = self.eligibility_masks[eligibility]
+        if continents:
+            continents_mask = 0
+            for continent in continents:
+                continents_mask |= self.continent_masks.get(continent, 0)
+            mask &= continents_mask
+        return mask
+
+    def get_eligible_ids(self, eligibility: str | None, continents: list[str] | None = None) -> list[int]:
+        return self.get_ids(self.get_eligible_mask(eligibility, continents))
+
+    def get_mask(self, country_ids: Iterable[int]) -> int:
+        """
+        Countries unknown to the catalog are left out.
+        """
+        mask = 0
+        for country_id in country_ids:
+            position = self.positions_by_id.get(country_id)
+            if position is not None:
+                mask |= 1 << position
+        return mask
+
+    def get_ids(self, mask: int) -> list[int]:
+        """
+        Sorted ids of the countries of the mask.
+        """
+        country_ids = []
+        while mask:
+            lowest_bit = mask & -mask
+            country_ids.append(self.country_ids[lowest_bit.bit_length() - 1])
+            mask ^= lowest_bit
+        return country_ids
+
+    def is_in_mask(self, country_id: int, mask: int) -> bool:
+        position = self.positions_by_id.get(country_id)
+        return position is not None and bool(mask >> position & 1)
+
+    def get_city(self, city_id: int) -> CityEntry | None:
+        return self.cities_by_id.get(city_id)
+
+    def get_capitals(self, country: CountryEntry) -> list[CityEntry]:
+        return [self.cities_by_id[city_id] for city_id in country.capital_ids]
+
+
+class CountryCatalog:
+    """
+    Countries and cities as needed by the games, loaded once per process instead of queried on every answer.
+
+    Countries and cities only change from the admin or an import command: saving one of them drops the catalog
+    of the current process and bumps a version in the shared cache, which other processes check at most every
+    VERSION_CHECK_SECONDS. The catalog is loaded again on the next access.
+    """
+
+    VERSION_CACHE_KEY = "country_catalog_version"
+    VERSION_CHECK_SECONDS = 60
+
+    def __init__(self):
+        self._data: CatalogData | None = None
+        self._version: str | None = None
+        self._version_checked_at = 0.0
+        # Bumped on every change, so that a load running during a change is not kept
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self) -> CatalogData:
+        if self._data is not None and self._is_version_check_due():
+            self._check_version(cache.get(self.VERSION_CACHE_KEY))
+
+        data = self._data
+        if data is None:
+            data = self._load()
+        return data
+
+    async def aget(self) -> CatalogData:
+        if self._data is not None and self._is_version_check_due():
+            self._check_version(await cache.aget(self.VERSION_CACHE_KEY))
+
+        data = self._data
+        if data is None:
+            data = await sync_to_async(self._load)()
+        return data
+
+    def clear(self) -> None:
+        """
+        Drop the catalog of this process only.
+        """
+        with self._lock:
+            self._generation += 1
+            self._data = None
+
+    def invalidate(self) -> None:
+        """
+        Drop the catalog of every process.
+        """
+        self.clear()
+        cache.set(self.VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+
+    def on_catalog_change(self, **kwargs) -> None:
+        # Drop it now for this process, and for everyone once the change is visible to the other connections
+        self.clear()
+        transaction.on_commit(self.invalidate)
+
+    def _is_version_check_due(self) -> bool:
+        return time.monotonic() - self._version_checked_at >= self.VERSION_CHECK_SECONDS
+
+    def _check_version(self, version: str | None) -> None:
+        self._version_checked_at = time.monotonic()
+        if version != self._version:
+            self.clear()
+
+    def _load(self) -> CatalogData:
+        with self._lock:
+            generation = self._generation
+
+        version = cache.get(self.VERSION_CACHE_KEY)
+        data = self._build()
+
+        with self._lock:
+            if generation == self._generation:
+                self._data = data
+                self._version = version
+                self._version_checked_at = time.monotonic()
+        return data
+
+    @staticmethod
+    def _build() -> CatalogData:
+        languages = [language for language, _ in settings.LANGUAGES]
+
+        country_ids_by_city = {}
+        for country_id, city_id in Country.cities.through.objects.values_list("country_id", "city_id"):
+            country_ids_by_city.setdefault(city_id, []).append(country_id)
+
+        cities_by_id = {}
+        capital_ids_by_country = {}
+        for city in City.objects.values():
+            country_ids = tuple(country_ids_by_city.get(city["id"], ()))
+            cities_by_id[city["id"]] = CityEntry(
+                id=city["id"],
+                names={language: city[f"name_{language}"] for language in languages},
+                wikipedia_links={language: city[f"wikipedia_link_{language}"] for language in languages},
+                is_capital=city["is_capital"],
+                country_ids=country_ids,
+            )
+            if city["is_capital"]:
+                for country_id in country_ids:
+                    capital_ids_by_country.setdefault(country_id, []).append(city["id"])
+
+        countries_by_iso2 = {}
+        for country in Country.objects.order_by("id").values():
+            countries_by_iso2[country["iso2_code"]] = CountryEntry(
+                id=country["id"],
+                iso2_code=country["iso2_code"],
+                names={language: country[f"name_{language}"] for language in languages},
+                wikipedia_links={language: country[f"wikipedia_link_{language}"] for language in languages},
+                continent=country["continent"],
+                has_flag=bool(country["flag"]),
+                capital_ids=tuple(capital_ids_by_country.get(country["id"], ())),
+            )
+
+        # Loaded by id, so that the bit positions follow the ids
+        countries = list(countries_by_iso2.values())
+        eligibility_masks = {None: (1 << len(countries)) - 1, ELIGIBLE_WITH_FLAG: 0, ELIGIBLE_WITH_CAPITAL: 0}
+        continent_masks = {}
+        for position, country in enumerate(countries):
+            bit = 1 << position
+            if country.has_flag:
+                eligibility_masks[ELIGIBLE_WITH_FLAG] |= bit
+            if country.capital_ids:
+                eligibility_masks[ELIGIBLE_WITH_CAPITAL] |= bit
+            continent_masks[country.continent] = continent_masks.get(country.continent, 0) | bit
+
+        return CatalogData(
+            countries_by_iso2=countries_by_iso2,
+            cities_by_id=cities_by_id,
+            countries_by_id={country.id: country for country in countries},
+            country_ids=tuple(country.id for country in countries),
+            positions_by_id={country.id: position for position, country in enumerate(countries)},
+            eligibility_masks=eligibility_masks,
+            continent_masks=continent_masks,
+        )
+
+
+country_catalog = CountryCatalog()
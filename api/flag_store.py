@@ -12,6 +12,10 @@ class FlagStore:
     def get_path(country_iso2: int) -> str | None:
         return cache.get(country_iso2)
 
+    @staticmethod
+    async def aget_path(country_iso2: int) -> str | None:
+        return await cache.aget(country_iso2)
+
     def reload_flag(self, country_iso2: int) -> None:
         self._cache_flag(country_iso2)
 
@@ -0,0 +1,112 @@
+import logging
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from channels.db import DatabaseSyncToAsync
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class GameExecutor:
+    """
+    Bounded thread pool running the sync game handlers.
+
+    Channels runs every sync consumer handler on the single thread_sensitive thread of the process.
+    With this executor, handlers of different connections run in parallel (each pool thread keeps its own
+    database connection), while messages of the same connection stay in order: channels awaits each
+    dispatch before reading the next message of that connection.
+
+    Background tasks (e.g. question queue refills) share the pool through submit, and are counted in the stats,
+    which are logged every GAME_EXECUTOR_STATS_LOG_SECONDS while the pool runs.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._stop_stats_log: threading.Event | None = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Handlers submitted but still waiting for a free thread."""
+        return self._queued
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def max_workers(self) -> int:
+        return settings.GAME_EXECUTOR_MAX_WORKERS
+
+    def stats(self) -> dict[str, int]:
+        return {"queue_depth": self.queue_depth, "running": self.running, "max_workers": self.max_workers}
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="game")
+                if settings.GAME_EXECUTOR_STATS_LOG_SECONDS:
+                    self._stop_stats_log = threading.Event()
+                    threading.Thread(
+                        target=self._log_stats,
+                        args=(self._stop_stats_log, settings.GAME_EXECUTOR_STATS_LOG_SECONDS),
+                        name="game-executor-stats",
+                        daemon=True,
+                    ).start()
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._stop_stats_log is not None:
+                self._stop_stats_log.set()
+                self._stop_stats_log = None
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _log_stats(self, stop: threading.Event, interval: float) -> None:
+        while not stop.wait(interval):
+            logger.info("Game executor stats: %s", self.stats())
+
+    def _track(self, func: Callable) -> Callable:
+        """
+        Count func as queued until a pool thread runs it.
+        """
+        with self._lock:
+            self._queued += 1
+            queue_depth = self._queued
+
+        if queue_depth > self.max_workers:
+            logger.warning("Game executor queue depth is %s (%s workers)", queue_depth, self.max_workers)
+
+        def tracked(*func_args, **func_kwargs):
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+            try:
+                return func(*func_args, **func_kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        return tracked
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run func on the pool and wait for its result.
+        """
+        tracked = self._track(func)
+        return await DatabaseSyncToAsync(tracked, thread_sensitive=False, executor=self.get_executor())(*args, **kwargs)
+
+    def submit(self, func: Callable[[], None]) -> Future:
+        """
+        Run func on the pool in the background.
+        """
+        return self.get_executor().submit(self._track(func))
+
+
+game_executor = GameExecutor()
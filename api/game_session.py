@@ -0,0 +1,201 @@
+from dataclasses import dataclass
+from uuid import UUID
+
+from api.challenge_deck import ChallengeDeck
+from api.question_log import QuestionLog
+from api.session_state import session_state_store
+from core.models import User
+from core.services.user_services import auser_set_best_streak, user_set_best_streak
+
+
+@dataclass(frozen=True, slots=True)
+class GameUser:
+    """
+    The player, as needed by the games: resolved once on user_accept and kept for the life of the connection,
+    instead of fetching the User row again.
+    """
+
+    id: int | None = None
+    language: str = ""
+    is_authenticated: bool = False
+
+    @classmethod
+    def from_user(cls, user: User) -> "GameUser":
+        return cls(id=user.id, language=user.language, is_authenticated=True)
+
+
+ANONYMOUS_GAME_USER = GameUser()
+
+
+class GameSession:
+    """
+    State of a game, owned by the websocket consumer for the life of the connection.
+
+    Every message reads and updates this object in memory. It is written to the session state store only at
+    checkpoints (new questions, every CHECKPOINT_INTERVAL answers, new best streak, game over and disconnection),
+    so that a reconnection handled by another worker can resume the game from the last checkpoint. The checkpoints
+    also refresh the expiration of the stored state.
+
+    The streak is the exception: it is updated in the store on every answer, atomically, see update_streak.
+    """
+
+    __slots__ = (
+        "session_id",
+        "user",
+        "continents",
+        "streak",
+        "questions",
+        "deck",
+        "answers_since_checkpoint",
+        "game_mode",
+        "best_streak",
+        "best_streak_to_save",
+    )
+
+    CHECKPOINT_INTERVAL = 10
+    STORED_FIELDS = ["continents", "streak", QuestionLog.COUNT_FIELD, *ChallengeDeck.STORED_FIELDS]
+
+    def __init__(
+        self,
+        session_id: UUID | str,
+        user: GameUser | None = None,
+        continents: list[str] | None = None,
+        streak: int = 0,
+        questions: QuestionLog | None = None,
+        deck: ChallengeDeck | None = None,
+    ):
+        self.session_id = session_id
+        self.user = user or ANONYMOUS_GAME_USER
+        self.continents = continents
+        self.streak = streak
+        self.questions = questions if questions is not None else QuestionLog()
+        # Only used by challenge modes
+        self.deck = deck or ChallengeDeck()
+        self.answers_since_checkpoint = 0
+        # Set on user_accept, for authenticated users
+        self.game_mode = ""
+        self.best_streak = 0
+        self.best_streak_to_save: int | None = None
+
+    @classmethod
+    def _from_stored_data(cls, session_id: UUID | str, data: dict, questions: QuestionLog) -> "GameSession":
+        return cls(
+            session_id,
+            continents=data.get("continents"),
+            streak=data.get("streak") or 0,
+            questions=questions,
+            deck=ChallengeDeck.from_stored_data(data),
+        )
+
+    def _get_changes(self) -> tuple[dict, list[str]]:
+        question_values, deleted_question_fields = self.questions.get_changes()
+        values = {
+            "continents": self.continents,
+            **question_values,
+            **self.deck.to_stored_data(),
+        }
+        return values, deleted_question_fields
+
+    def _mark_saved(self) -> None:
+        self.questions.mark_saved()
+        self.answers_since_checkpoint = 0
+        self.best_streak_to_save = None
+
+    @classmethod
+    def load(cls, session_id: UUID | str) -> "GameSession":
+        """
+        Resume the session from its last checkpoint, or start a new one.
+        The user is not part of the checkpoint: it is resolved again on user_accept.
+        """
+        data = session_state_store.get(session_id, cls.STORED_FIELDS)
+        question_count = data.get(QuestionLog.COUNT_FIELD, 0)
+        question_fields = QuestionLog.get_retained_fields(question_count)
+        question_data = session_state_store.get(session_id, question_fields) if question_fields else {}
+        return cls._from_stored_data(session_id, data, QuestionLog.from_stored_data(question_count, question_data))
+
+    @classmethod
+    async def aload(cls, session_id: UUID | str) -> "GameSession":
+        data = await session_state_store.aget(session_id, cls.STORED_FIELDS)
+        question_count = data.get(QuestionLog.COUNT_FIELD, 0)
+        question_fields = QuestionLog.get_retained_fields(question_count)
+        question_data = await session_state_store.aget(session_id, question_fields) if question_fields else {}
+        return cls._from_stored_data(session_id, data, QuestionLog.from_stored_data(question_count, question_data))
+
+    def save(self) -> None:
+        """
+        Write the session fields, the new and updated questions, and drop the questions past the retention window.
+        """
+        values, delete_fields = self._get_changes()
+        session_state_store.set(self.session_id, values, delete_fields)
+        if self.best_streak_to_save is not None:
+            user_set_best_streak(self.user, self.game_mode, self.best_streak_to_save)
+        self._mark_saved()
+
+    async def asave(self) -> None:
+        values, delete_fields = self._get_changes()
+        await session_state_store.aset(self.session_id, values, delete_fields)
+        if self.best_streak_to_save is not None:
+            await auser_set_best_streak(self.user, self.game_mode, self.best_streak_to_save)
+        self._mark_saved()
+
+    def delete(self) -> None:
+        session_state_store.delete(self.session_id)
+
+    async def adelete(self) -> None:
+        await session_state_store.adelete(self.session_id)
+
+    def update_streak(
+        self, is_correct: bool, remaining_to_guess: int, is_challenge: bool
+    ) -> tuple[int, bool, int | None]:
+        """
+        Return the new streak, whether the game is over and the streak that just ended, if any.
+        """
+        streak, game_over, ended_streak = session_state_store.update_streak(
+            self.session_id, is_correct, remaining_to_guess, is_challenge
+        )
+        self.streak = streak
+        return streak, game_over, ended_streak
+
+    async def aupdate_streak(
+        self, is_correct: bool, remaining_to_guess: int, is_challenge: bool
+    ) -> tuple[int, bool, int | None]:
+        streak, game_over, ended_streak = await session_state_store.aupdate_streak(
+            self.session_id, is_correct, remaining_to_guess, is_challenge
+        )
+        self.streak = streak
+        return streak, game_over, ended_streak
+
+    def record_ended_streak(self, ended_streak: int) -> int:
+        """
+        Keep the streak that just ended if it is a new best streak, to be written by the checkpoint of the answer
+        (see answer_recorded). Return the best streak.
+        """
+        if ended_streak > self.best_streak:
+            self.best_streak = ended_streak
+            self.best_streak_to_save = ended_streak
+        return self.best_streak
+
+    def answer_recorded(self, force_checkpoint: bool = False) -> None:
+        """
+        Count an answer and save the session when a checkpoint is reached, or when the answer set a new best streak,
+        not to lose it if the worker stops before the next checkpoint.
+        """
+        self.answers_since_checkpoint += 1
+        if self._is_checkpoint_due(force_checkpoint):
+            self.save()
+
+    async def aanswer_recorded(self, force_checkpoint: bool = False) -> None:
+        self.answers_since_checkpoint += 1
+        if self._is_checkpoint_due(force_checkpoint):
+            await self.asave()
+
+    def _is_checkpoint_due(self, force_checkpoint: bool) -> bool:
+        return (
+            force_checkpoint
+            or self.best_streak_to_save is not None
+            or self.answers_since_checkpoint >= self.CHECKPOINT_INTERVAL
+        )
+
+    @property
+    def has_unsaved_changes(self) -> bool:
+        return self.answers_since_checkpoint > 0 or self.best_streak_to_save is not None
@@ -0,0 +1,36 @@
+from uuid import UUID
+
+from django.conf import settings
+from django.core import signing
+
+from api.game_session import GameUser
+from core.models import User
+
+GAME_TOKEN_SALT = "api.game_token"
+
+
+def game_token_issue(user: User, game_mode: str) -> str:
+    """
+    Return a token signed with the secret key, for the user to join a game of this mode
+    for GAME_TOKEN_MAX_AGE_SECONDS.
+    """
+    return signing.dumps({"uid": user.id, "lang": user.language, "mode": game_mode}, salt=GAME_TOKEN_SALT)
+
+
+def game_token_check(token: UUID | str | None, game_mode: str) -> GameUser | None:
+    """
+    Return the user of a valid game token for this mode, without any query.
+    Other tokens (e.g., a Django session token) are not valid.
+    """
+    if not token:
+        return None
+
+    try:
+        data = signing.loads(str(token), salt=GAME_TOKEN_SALT, max_age=settings.GAME_TOKEN_MAX_AGE_SECONDS)
+    except signing.BadSignature:  # also raised when expired
+        return None
+
+    if data.get("mode") != game_mode:
+        return None
+
+    return GameUser(id=data["uid"], language=data["lang"], is_authenticated=True)
@@ -0,0 +1,358 @@
+import json
+import logging
+import threading
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime
+from itertools import groupby
+from uuid import UUID, uuid4
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections, transaction
+from django.utils import timezone
+
+from api.redis_cache import get_default_cache, get_redis_cache, get_redis_client
+from core.models import Country, Guess, User, UserCountryScore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class PendingGuess:
+    user_id: int
+    country_id: int
+    game_mode: str
+    is_correct: bool
+    # Time of the answer, the guess being written later
+    created_at: datetime = field(default_factory=timezone.now)
+    idempotency_key: UUID = field(default_factory=uuid4)
+    # Failed writes of the guess
+    attempts: int = 0
+
+    def dumps(self) -> str:
+        return json.dumps(
+            asdict(self) | {"created_at": self.created_at.isoformat(), "idempotency_key": str(self.idempotency_key)}
+        )
+
+    @classmethod
+    def loads(cls, value: str | bytes) -> "PendingGuess":
+        data = json.loads(value)
+        return cls(
+            **data
+            | {
+                "created_at": datetime.fromisoformat(data["created_at"]),
+                "idempotency_key": UUID(data["idempotency_key"]),
+            }
+        )
+
+
+class GuessRecorder:
+    """
+    Queue the guesses in Redis and write them by batch, out of the latency path of the answers.
+
+    The guesses are pushed to a Redis list shared by the workers, so that they outlive the worker that recorded them.
+    A batch is written when GUESS_RECORDER_BATCH_SIZE guesses are queued after a guess is recorded, and every
+    GUESS_RECORDER_FLUSH_SECONDS by the flush thread of the worker (see start), which also writes the queue on
+    shutdown. The guesses of a player are written before selecting their questions (the weights need the latest
+    guesses), and when they disconnect.
+
+    Guesses are written at least once: they are read from the list, and removed from it only once the transaction
+    writing them is committed. Each guess carries an idempotency key, and the score rows are locked before the
+    written guesses are looked up, so that writing a guess twice (after a crash, or by two flushes) does not
+    duplicate it. When a batch fails, its guesses are written score by score, so that one failing score does not
+    hold back the others. The failed ones are queued again, up to MAX_ATTEMPTS times (the database being unavailable
+    does not count), then moved to a dead letter list (see dead_letters) and logged. Guesses of users or countries deleted in the
+    meantime are dropped. The decayed totals of the scores are updated with the guesses.
+
+    With another cache backend (tests, local development), the list is kept as is under the same key.
+    """
+
+    KEY = "guess_recorder"
+    DEAD_LETTER_SIZE = 10000
+    MAX_ATTEMPTS = 5
+
+    def __init__(self, key: str = KEY):
+        self.key = key
+        self.dead_letter_key = f"{key}:dead"
+        self._stop_flushes: threading.Event | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def pending_count(self) -> int:
+        redis_cache = get_redis_cache()
+        if redis_cache is None:
+            return len(get_default_cache().get(self.key) or [])
+
+        redis_key, client = get_redis_client(redis_cache, self.key)
+        return client.llen(redis_key)
+
+    def record(self, user_id: int, country_id: int, game_mode: str, is_correct: bool) -> None:
+        if self._push([PendingGuess(user_id, country_id, game_mode, is_correct)]) >= settings.GUESS_RECORDER_BATCH_SIZE:
+            self.flush()
+
+    async def arecord(self, user_id: int, country_id: int, game_mode: str, is_correct: bool) -> None:
+        guess = PendingGuess(user_id, country_id, game_mode, is_correct)
+        if await sync_to_async(self._push, thread_sensitive=False)([guess]) >= settings.GUESS_RECORDER_BATCH_SIZE:
+            await self.aflush()
+
+    def flush(self, user_id: int | None = None, game_mode: str | None = None) -> int:
+        """
+        Write the queued guesses, or only those of the user in the game mode, and return how many were written.
+        Guesses queued during the flush are left for the next one.
+        """
+        pending = self._read()
+        if user_id is not None:
+            pending = [(value, guess) for value, guess in pending if guess.user_id == user_id]
+        if game_mode is not None:
+            pending = [(value, guess) for value, guess in pending if guess.game_mode == game_mode]
+
+        batch_size = settings.GUESS_RECORDER_BATCH_SIZE
+        return sum(
+            self._flush_batch(pending[start : start + batch_size]) for start in range(0, len(pending), batch_size)
+        )
+
+    async def aflush(self, user_id: int | None = None, game_mode: str | None = None) -> int:
+        return await sync_to_async(self.flush)(user_id, game_mode)
+
+    def _flush_batch(self, batch: list[tuple[str, PendingGuess]]) -> int:
+        try:
+            return self._write_and_remove(batch)
+        except Exception:
+            logger.exception("Could not write a batch of %s guesses, writing them score by score", len(batch))
+
+        written_count = 0
+        for _, score_batch in groupby(sorted(batch, key=self.get_score_key), key=self.get_score_key):
+            score_batch = list(score_batch)
+            try:
+                written_count += self._write_and_remove(score_batch)
+            except (OperationalError, InterfaceError):
+                logger.exception("Could not write %s guesses, the database is unavailable", len(score_batch))
+            except Exception:
+                logger.exception("Could not write %s guesses of the score %s", len(score_batch), score_batch[0][1])
+                self._retry(score_batch)
+        return written_count
+
+    def _write_and_remove(self, batch: list[tuple[str, PendingGuess]]) -> int:
+        with transaction.atomic():
+            written_count = self._write([guess for _, guess in batch])
+            # Written, or dropped as stale: out of the queue once committed
+            transaction.on_commit(lambda: self._remove([value for value, _ in batch]))
+        return written_count
+
+    @staticmethod
+    def get_score_key(pending: tuple[str, PendingGuess]) -> tuple[int, int, str]:
+        _, guess = pending
+        return guess.user_id, guess.country_id, guess.game_mode
+
+    def _retry(self, batch: list[tuple[str, PendingGuess]]) -> None:
+        """
+        Queue the guesses again with one more attempt, or move them to the dead letters after MAX_ATTEMPTS.
+        """
+        retried = [replace(guess, attempts=guess.attempts + 1) for _, guess in batch]
+        dropped = [guess for guess in retried if guess.attempts >= self.MAX_ATTEMPTS]
+        if dropped:
+            logger.error(
+                "Moved %s guesses to %s after %s failed writes: %s",
+                len(dropped),
+                self.dead_letter_key,
+                self.MAX_ATTEMPTS,
+                dropped,
+            )
+        self._replace(
+            [value for value, _ in batch],
+            [guess for guess in retried if guess.attempts < self.MAX_ATTEMPTS],
+            dropped,
+        )
+
+    def _push(self, guesses: list[PendingGuess]) -> int:
+        """
+        Append the guesses to the list, and return its length.
+        """
+        values = [guess.dumps() for guess in guesses]
+        redis_cache = get_redis_cache()
+        if redis_cache is None:
+            with self._lock:
+                values = (get_default_cache().get(self.key) or []) + values
+                get_default_cache().set(self.key, values, timeout=None)
+            return len(values)
+
+        redis_key, client = get_redis_client(redis_cache, self.key)
+        return client.rpush(redis_key, *values)
+
+    def _replace(self, values: list[str], retried: list[PendingGuess], dropped: list[PendingGuess]) -> None:
+        """
+        Replace the values by the retried guesses in the list, and add the dropped ones to the dead letters,
+        in one transaction so that none of them is lost in between.
+        """
+        redis_cache = get_redis_cache()
+        if redis_cache is None:
+            self._remove(values)
+            if retried:
+                self._push(retried)
+            if dropped:
+                dead_letters = get_default_cache().get(self.dead_letter_key) or []
+                dead_letters += [guess.dumps() for guess in dropped]
+                get_default_cache().set(self.dead_letter_key, dead_letters[-self.DEAD_LETTER_SIZE :], timeout=None)
+            return
+
+        redis_key, client = get_redis_client(redis_cache, self.key)
+        dead_letter_key, _ = get_redis_client(redis_cache, self.dead_letter_key)
+        pipeline = client.pipeline(transaction=True)
+        for value in values:
+            pipeline.lrem(redis_key, 1, value)
+        if retried:
+            pipeline.rpush(redis_key, *[guess.dumps() for guess in retried])
+        if dropped:
+            pipeline.rpush(dead_letter_key, *[guess.dumps() for guess in dropped])
+            pipeline.ltrim(dead_letter_key, -self.DEAD_LETTER_SIZE, -1)
+        pipeline.execute()
+
+    def _read(self, key: str | None = None) -> list[tuple[str, PendingGuess]]:
+        """
+        The queued guesses, with their value in the list.
+        """
+        key = key or self.key
+        redis_cache = get_redis_cache()
+        if redis_cache is None:
+            values = get_default_cache().get(key) or []
+        else:
+            redis_key, client = get_redis_client(redis_cache, key)
+            values = client.lrange(redis_key, 0, -1)
+        return [(value, PendingGuess.loads(value)) for value in values]
+
+    def dead_letters(self) -> list[PendingGuess]:
+        """
+        The last DEAD_LETTER_SIZE guesses dropped after MAX_ATTEMPTS failed writes.
+        """
+        return [guess for _, guess in self._read(self.dead_letter_key)]
+
+    def _remove(self, values: list[str]) -> None:
+        redis_cache = get_redis_cache()
+        if redis_cache is None:
+            with self._lock:
+                removed = set(values)
+                pending = get_default_cache().get(self.key) or []
+                get_default_cache().set(self.key, [value for value in pending if value not in removed], timeout=None)
+            return
+
+        redis_key, client = get_redis_client(redis_cache, self.key)
+        pipeline = client.pipeline(transaction=True)
+        for value in values:
+            # Values are unique, thanks to the idempotency keys
+            pipeline.lrem(redis_key, 1, value)
+        pipeline.execute()
+
+    def clear(self) -> None:
+        """
+        Drop the queued guesses without writing them, and the dead letters.
+        """
+        get_default_cache().delete_many([self.key, self.dead_letter_key])
+
+    def start(self) -> None:
+        """
+        Start the flush thread of the worker, flushing every GUESS_RECORDER_FLUSH_SECONDS.
+        """
+        with self._lock:
+            if self._stop_flushes is None and settings.GUESS_RECORDER_FLUSH_SECONDS:
+                self._stop_flushes = threading.Event()
+                threading.Thread(
+                    target=self._flush_periodically,
+                    args=(self._stop_flushes, settings.GUESS_RECORDER_FLUSH_SECONDS),
+                    name="guess-recorder-flush",
+                    daemon=True,
+                ).start()
+
+    def stop(self) -> None:
+        """
+        Stop the flush thread and write the queue one last time.
+        """
+        with self._lock:
+            if self._stop_flushes is not None:
+                self._stop_flushes.set()
+                self._stop_flushes = None
+        self._flush_in_thread()
+
+    def _flush_periodically(self, stop: threading.Event, interval: float) -> None:
+        while not stop.wait(interval):
+            self._flush_in_thread()
+
+    def _flush_in_thread(self) -> None:
+        # Out of the request cycle: the connection of the thread is closed by hand, as with DatabaseSyncToAsync
+        close_old_connections()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Could not flush the guesses")
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def _write(batch: list[PendingGuess]) -> int:
+        """
+        Write the guesses and return how many were written, in the transaction of _write_and_remove.
+        """
+        # Users or countries deleted since the guesses were recorded: their guesses can never be written
+        user_ids = set(User.objects.filter(pk__in={guess.user_id for guess in batch}).values_list("pk", flat=True))
+        country_ids = set(
+            Country.objects.filter(pk__in={guess.country_id for guess in batch}).values_list("pk", flat=True)
+        )
+        stale_guesses = [
+            guess for guess in batch if guess.user_id not in user_ids or guess.country_id not in country_ids
+        ]
+        if stale_guesses:
+            logger.warning("Dropped %s guesses of deleted users or countries: %s", len(stale_guesses), stale_guesses)
+            batch = [guess for guess in batch if guess.user_id in user_ids and guess.country_id in country_ids]
+            if not batch:
+                return 0
+
+        # One upsert for all the scores of the batch, sorted to always lock the rows in the same order
+        score_keys = sorted({(guess.user_id, guess.country_id, guess.game_mode) for guess in batch})
+        scores = UserCountryScore.objects.bulk_create(
+            [
+                UserCountryScore(user_id=user_id, country_id=country_id, game_mode=game_mode)
+                for user_id, country_id, game_mode in score_keys
+            ],
+            update_conflicts=True,
+            unique_fields=["user", "country", "game_mode"],
+            update_fields=["updated_at"],
+        )
+        score_ids = {(score.user_id, score.country_id, score.game_mode): score.pk for score in scores}
+
+        # Skip the guesses already written by a previous attempt, not to count them twice in the decayed totals
+        written_keys = set(
+            Guess.objects.filter(idempotency_key__in=[guess.idempotency_key for guess in batch]).values_list(
+                "idempotency_key", flat=True
+            )
+        )
+        batch = [guess for guess in batch if guess.idempotency_key not in written_keys]
+
+        guesses = Guess.objects.bulk_create(
+            [
+                Guess(
+                    score_id=score_ids[(guess.user_id, guess.country_id, guess.game_mode)],
+                    created_at=guess.created_at,
+                    is_correct=guess.is_correct,
+                    idempotency_key=guess.idempotency_key,
+                )
+                for guess in batch
+            ],
+            update_conflicts=True,
+            unique_fields=["idempotency_key"],
+            update_fields=["is_correct"],
+        )
+
+        # The score rows are locked by the upsert above until the end of the transaction
+        scores_by_id = UserCountryScore.objects.in_bulk(set(score_ids.values()))
+        for pending, guess in zip(batch, guesses):
+            score_id = score_ids[(pending.user_id, pending.country_id, pending.game_mode)]
+            scores_by_id[score_id].add_guess(guess.created_at, guess.is_correct)
+        for score in scores_by_id.values():
+            # Set to the flush time by the upsert: the cooldown of the scheduler starts at the last answer
+            score.updated_at = score.last_guess_at or score.updated_at
+        UserCountryScore.objects.bulk_update(
+            scores_by_id.values(), ["decayed_failures", "decayed_total", "last_guess_at", "updated_at"]
+        )
+        return len(batch)
+
+
+guess_recorder = GuessRecorder()
@@ -0,0 +1,113 @@
+import json
+from typing import Any
+
+from django.conf import settings
+
+
+class QuestionLog:
+    """
+    Questions asked during a game, by index, with what is needed to check their answer (depends on the game mode).
+
+    Questions are only appended: the index of a new question is the number of questions asked before it.
+    Only the last GAME_QUESTION_LOG_RETENTION questions are kept, older ones can no longer be answered,
+    so the cost of a question or an answer does not depend on the length of the game.
+
+    In the session state store, each question is one field of the session hash holding a compact JSON entry,
+    and only the questions changed since the last save are written.
+    """
+
+    __slots__ = ("entries", "next_index", "retention", "_changed_indexes", "_dropped_indexes")
+
+    COUNT_FIELD = "question_count"
+    FIELD_PREFIX = "question:"
+
+    def __init__(self, entries: dict[int, Any] | None = None, next_index: int | None = None):
+        self.entries = dict(entries or {})
+        if next_index is None:
+            next_index = max(self.entries) + 1 if self.entries else 0
+        self.next_index = next_index
+        self.retention = settings.GAME_QUESTION_LOG_RETENTION
+        self._changed_indexes = set(self.entries)
+        self._dropped_indexes = set()
+
+    def __contains__(self, index: int) -> bool:
+        return index in self.entries
+
+    def __getitem__(self, index: int) -> Any:
+        return self.entries[index]
+
+    def __setitem__(self, index: int, entry: Any) -> None:
+        """
+        Update a question still in the log (e.g. the capitals found so far).
+        """
+        if index not in self.entries:
+            raise KeyError(index)
+        self.entries[index] = entry
+        self._changed_indexes.add(index)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, index: int, default: Any = None) -> Any:
+        return self.entries.get(index, default)
+
+    def append(self, entry: Any) -> int:
+        """
+        Add a question and return its index, dropping the oldest one past the retention window.
+        """
+        index = self.next_index
+        self.entries[index] = entry
+        self._changed_indexes.add(index)
+        self.next_index += 1
+
+        expired_index = self.next_index - self.retention - 1
+        if self.entries.pop(expired_index, None) is not None:
+            self._changed_indexes.discard(expired_index)
+            self._dropped_indexes.add(expired_index)
+
+        return index
+
+    def last(self) -> Any:
+        return self.entries.get(self.next_index - 1)
+
+    @classmethod
+    def get_field(cls, index: int) -> str:
+        return f"{cls.FIELD_PREFIX}{index}"
+
+    @classmethod
+    def get_retained_fields(cls, question_count: int) -> list[str]:
+        """
+        Fields of the questions that can still be answered after question_count questions.
+        """
+        return [cls.get_field(index) for index in cls._get_retained_indexes(question_count)]
+
+    @staticmethod
+    def _get_retained_indexes(question_count: int) -> range:
+        return range(max(0, question_count - settings.GAME_QUESTION_LOG_RETENTION), question_count)
+
+    @classmethod
+    def from_stored_data(cls, question_count: int, data: dict[str, str]) -> "QuestionLog":
+        entries = {}
+        for index in cls._get_retained_indexes(question_count):
+            value = data.get(cls.get_field(index))
+            if value is not None:
+                entries[index] = json.loads(value)
+
+        question_log = cls(entries, next_index=question_count)
+        question_log.mark_saved()
+        return question_log
+
+    def get_changes(self) -> tuple[dict[str, Any], list[str]]:
+        """
+        Return the fields to write and the fields to delete since the last save.
+        """
+        values = {
+            self.get_field(index): json.dumps(self.entries[index], separators=(",", ":"))
+            for index in sorted(self._changed_indexes)
+        }
+        values[self.COUNT_FIELD] = self.next_index
+        return values, [self.get_field(index) for index in sorted(self._dropped_indexes)]
+
+    def mark_saved(self) -> None:
+        self._changed_indexes.clear()
+        self._dropped_indexes.clear()
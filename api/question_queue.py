@@ -0,0 +1,151 @@
+import logging
+from collections.abc import Callable
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from redis import WatchError
+
+from api.game_executor import game_executor
+from api.redis_cache import get_default_cache, get_redis_cache, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionQueue:
+    """
+    Upcoming personalized questions of a player, per (user, game mode, continents), as a Redis list of country ids.
+
+    Questions are popped from the head of the list, in the order they were picked by the scheduler.
+    The list is computed again in the background once it gets short (see UserCountryScoreService.compute_questions),
+    and an answered country is removed from it, so that it is not asked again during its cooldown.
+
+    Each answer also bumps the generation of the queue. A refill is only saved if no answer came since it was
+    scheduled: otherwise it may have been computed before the guess was written, with the answered country out
+    of its cooldown, and it is dropped (the next questions schedule another one).
+
+    With another cache backend (tests, local development), the list is kept as is under the same key.
+    """
+
+    KEY_PREFIX = "question_queue"
+    # Weights get stale, e.g. when the player leaves for a while
+    TIMEOUT_SECONDS = 600
+    REFILL_LOCK_SECONDS = 60
+
+    def get_key(self, user_id: int, game_mode: str, continents: list[str] | None) -> str:
+        return f"{self.KEY_PREFIX}:{user_id}:{game_mode}:{','.join(sorted(continents or []))}"
+
+    def pop(self, key: str, count: int) -> tuple[list[int], int]:
+        """
+        Pop up to count country ids, and return them with the number of ids left.
+        """
+        redis_cache = get_redis_cache()
+        if redis_cache is None:
+            country_ids = get_default_cache().get(key) or []
+            if country_ids:
+                get_default_cache().set(key, country_ids[count:], timeout=self.TIMEOUT_SECONDS)
+            return country_ids[:count], max(len(country_ids) - count, 0)
+
+        redis_key, client = get_redis_client(redis_cache, key)
+        pipeline = client.pipeline(transaction=True)
+        pipeline.lpop(redis_key, count)
+        pipeline.llen(redis_key)
+        country_ids, remaining = pipeline.execute()
+        return [int(country_id) for country_id in country_ids or []], remaining
+
+    def get_generation(self, key: str) -> int:
+        redis_cache = get_redis_cache()
+        if redis_cache is None:
+            return get_default_cache().get(f"{key}:generation", 0)
+
+        generation_key, client = get_redis_client(redis_cache, f"{key}:generation")
+        return int(client.get(generation_key) or 0)
+
+    def replace(self, key: str, country_ids: list[int], generation: int | None = None) -> bool:
+        """
+        Replace the queue, only if it is still at the given generation (if any). Return whether it was replaced.
+        """
+        redis_cache = get_redis_cache()
+        if redis_cache is None:
+            if generation is not None and generation != self.get_generation(key):
+                return False
+            get_default_cache().set(key, list(country_ids), timeout=self.TIMEOUT_SECONDS)
+            return True
+
+        redis_key, client = get_redis_client(redis_cache, key)
+        generation_key, _ = get_redis_client(redis_cache, f"{key}:generation")
+        with client.pipeline(transaction=True) as pipeline:
+            try:
+                # Fails on execute if an answer bumps the generation in between
+                pipeline.watch(generation_key)
+                if generation is not None and generation != int(pipeline.get(generation_key) or 0):
+                    return False
+                pipeline.multi()
+                pipeline.delete(redis_key)
+                if country_ids:
+                    pipeline.rpush(redis_key, *country_ids)
+                    pipeline.expire(redis_key, self.TIMEOUT_SECONDS)
+                pipeline.execute()
+            except WatchError:
+                return False
+        return True
+
+    def remove(self, key: str, country_id: int) -> None:
+        """
+        Remove an answered country, and bump the generation of the queue.
+        """
+        redis_cache = get_redis_cache()
+        if redis_cache is None:
+            country_ids = get_default_cache().get(key)
+            if country_ids and country_id in country_ids:
+                country_ids.remove(country_id)
+                get_default_cache().set(key, country_ids, timeout=self.TIMEOUT_SECONDS)
+            get_default_cache().set(f"{key}:generation", self.get_generation(key) + 1, timeout=self.TIMEOUT_SECONDS)
+            return
+
+        redis_key, client = get_redis_client(redis_cache, key)
+        generation_key, _ = get_redis_client(redis_cache, f"{key}:generation")
+        pipeline = client.pipeline(transaction=True)
+        pipeline.lrem(redis_key, 0, country_id)
+        pipeline.incr(generation_key)
+        pipeline.expire(generation_key, self.TIMEOUT_SECONDS)
+        pipeline.execute()
+
+    async def aremove(self, key: str, country_id: int) -> None:
+        await sync_to_async(self.remove, thread_sensitive=False)(key, country_id)
+
+    def schedule_refill(self, key: str, refill: Callable[[], list[int]]) -> bool:
+        """
+        Compute the queue again on the game executor pool, unless it is already being computed.
+        refill returns the new country ids, dropped if an answer comes in the meantime.
+        """
+        lock_key = f"{key}:refill"
+        if not get_default_cache().add(lock_key, 1, timeout=self.REFILL_LOCK_SECONDS):
+            return False
+        generation = self.get_generation(key)
+
+        def run_refill():
+            try:
+                if not self.replace(key, refill(), generation):
+                    logger.info("Dropped a refill of the question queue %s computed before an answer", key)
+            except Exception:
+                logger.exception("Could not refill the question queue %s", key)
+            finally:
+                get_default_cache().delete(lock_key)
+
+        self.submit(run_refill)
+        return True
+
+    @staticmethod
+    def submit(func: Callable[[], None]) -> None:
+        def run():
+            # The pool threads keep their database connection between tasks, as with DatabaseSyncToAsync
+            close_old_connections()
+            try:
+                func()
+            finally:
+                close_old_connections()
+
+        game_executor.submit(run)
+
+
+question_queue = QuestionQueue()
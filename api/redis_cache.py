@@ -0,0 +1,35 @@
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from redis import Redis
+
+
+def get_default_cache():
+    return caches["default"]
+
+
+def get_redis_cache() -> RedisCache | None:
+    """
+    The default cache when it is Redis, for the stores using Redis structures (hashes, lists, scripts).
+    They fall back on plain cache values with another backend (tests, local development).
+    """
+    default_cache = get_default_cache()
+    return default_cache if isinstance(default_cache, RedisCache) else None
+
+
+# Django exposes neither the Redis client nor the serializer of RedisCache: both helpers below use its private
+# _cache attribute (django.core.cache.backends.redis.RedisCacheClient), check them when upgrading Django.
+
+
+def get_redis_client(redis_cache: RedisCache, key: str) -> tuple[str, Redis]:
+    """
+    Return the Redis key of the cache key, with the client to write it.
+    """
+    redis_key = redis_cache.make_key(key)
+    return redis_key, redis_cache._cache.get_client(redis_key, write=True)
+
+
+def get_redis_serializer(redis_cache: RedisCache):
+    """
+    The serializer of the cache values, to read and write them in Redis structures.
+    """
+    return redis_cache._cache._serializer
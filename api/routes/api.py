@@ -1,10 +1,14 @@
+from django.conf import settings
 from django.http import HttpRequest
 from django.utils import translation
 from django.utils.translation import gettext as _
 from ninja import Router
 
+from api.game_token import game_token_issue
 from api.schema import (
+    GameTokenIn,
     ResponseError,
+    ResponseGameToken,
     ResponseUserOut,
     UserLanguageSet,
     UserStatsByGameMode,
@@ -124,3 +128,14 @@ def city_get_list(request: HttpRequest):
 def user_stats(request: HttpRequest):
     stats = user_get_stats(request.user)
     return 200, stats
+
+
+@router.post("game/token", response={200: ResponseGameToken})
+def game_token_get(request: HttpRequest, payload: GameTokenIn):
+    """
+    Return a short-lived token to join a game of the given mode, checked on the websocket without any query.
+    """
+    return 200, {
+        "token": game_token_issue(request.user, payload.game_mode),
+        "expires_in": settings.GAME_TOKEN_MAX_AGE_SECONDS,
+    }
@@ -1,7 +1,9 @@
 from django.urls import path
 
-from .consumers import GameConsumer
+from .consumers import AsyncGameConsumer, GameConsumer
 
+# Both consumers speak the same protocol, the async one is served on its own route to compare them side by side
 websocket_urlpatterns = [
     path("ws/game/", GameConsumer.as_asgi()),
+    path("ws/game/async/", AsyncGameConsumer.as_asgi()),
 ]
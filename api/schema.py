@@ -149,6 +149,15 @@ class CitiesOut(BaseSchema):
     cities: list[CityOut]
 
 
+class GameTokenIn(BaseSchema):
+    game_mode: GameModes
+
+
+class ResponseGameToken(BaseSchema):
+    token: str
+    expires_in: int
+
+
 class SetUserWebsocket(BaseSchema):
     type: str
     token: str | None
@@ -1,144 +1,197 @@
 from abc import ABC
 from uuid import UUID
 
-from django.contrib.auth.models import AnonymousUser
+from django.conf import settings
 from django.contrib.sessions.models import Session
-from django.core.cache import cache
-from django.db import transaction
-from django.utils import timezone
 
+from api.country_catalog import CountryEntry
+from api.game_session import ANONYMOUS_GAME_USER, GameSession, GameUser
+from api.game_token import game_token_check
+from api.guess_recorder import guess_recorder
+from api.question_log import QuestionLog
+from api.question_queue import question_queue
 from api.schema import CorrectAnswer, NewQuestions
-from core.models import Country, Guess, User, UserCountryScore, UserStats
-from core.services.user_services import user_get_best_steak
+from core.models import Country, User
+from core.services.user_services import auser_get_best_steak, user_get_best_steak
 
 
 class GameService(ABC):
-    CACHE_TIMEOUT_SECONDS = 86400
     GAME_MODE = ""
 
     @classmethod
-    def user_accept(cls, session_id: UUID, session_token: UUID, continents: list[str] | None = None) -> bool:
-        cache.set(f"{session_id}_continents", continents, timeout=cls.CACHE_TIMEOUT_SECONDS)
+    def user_accept(cls, session: GameSession, token: UUID | str | None, continents: list[str] | None = None) -> bool:
+        """
+        Accept a signed game token (see api/game_token.py), checked without any query,
+        or else a Django session token.
+        """
+        session.continents = continents
+        # The user is kept in memory for the rest of the game
+        session.user = game_token_check(token, cls.GAME_MODE) or cls._get_session_user(token)
+        if not session.user.is_authenticated:
+            return False
+
+        cls.load_best_streak(session)
+        return True
+
+    @classmethod
+    async def auser_accept(
+        cls, session: GameSession, token: UUID | str | None, continents: list[str] | None = None
+    ) -> bool:
+        session.continents = continents
+        session.user = game_token_check(token, cls.GAME_MODE) or await cls._aget_session_user(token)
+        if not session.user.is_authenticated:
+            return False
+
+        await cls.aload_best_streak(session)
+        return True
+
+    @staticmethod
+    def _get_session_user(session_token: UUID | str | None) -> GameUser:
         try:
-            # Get session data
-            session = Session.objects.get(pk=session_token)
-            session_data = session.get_decoded()
+            session_data = Session.objects.get(pk=session_token).get_decoded()
+            user_id, language = User.objects.values_list("id", "language").get(id=session_data.get("_auth_user_id"))
+        except (Session.DoesNotExist, User.DoesNotExist):
+            return ANONYMOUS_GAME_USER
 
-            # Get the user stored
-            uid = session_data.get("_auth_user_id")
-            user = User.objects.get(id=uid)
+        return GameUser(id=user_id, language=language, is_authenticated=True)
 
-            # Cache it for later requests
-            cache.set(f"{session_id}_user_id", user.id, timeout=cls.CACHE_TIMEOUT_SECONDS)
-            return True
+    @staticmethod
+    async def _aget_session_user(session_token: UUID | str | None) -> GameUser:
+        try:
+            session_data = (await Session.objects.aget(pk=session_token)).get_decoded()
+            user_id, language = await User.objects.values_list("id", "language").aget(
+                id=session_data.get("_auth_user_id")
+            )
         except (Session.DoesNotExist, User.DoesNotExist):
-            return False
+            return ANONYMOUS_GAME_USER
+
+        return GameUser(id=user_id, language=language, is_authenticated=True)
 
     @classmethod
-    def user_get(cls, session_id: UUID) -> User:
-        cache_key = f"{session_id}_user_id"
-        user_id = cache.get(cache_key)
-        if user_id:
-            try:
-                user = User.objects.get(id=user_id)
-                # Reset timeout for sliding expiration
-                cache.set(cache_key, user_id, timeout=cls.CACHE_TIMEOUT_SECONDS)
-                return user
-            except User.DoesNotExist:
-                pass
+    def load_best_streak(cls, session: GameSession) -> None:
+        """
+        Load the best streak of the user once, to compare the ended streaks with it in memory.
+        """
+        session.game_mode = cls.GAME_MODE
+        session.best_streak = user_get_best_steak(session.user, cls.GAME_MODE)
 
-        return AnonymousUser()
+    @classmethod
+    async def aload_best_streak(cls, session: GameSession) -> None:
+        session.game_mode = cls.GAME_MODE
+        session.best_streak = await auser_get_best_steak(session.user, cls.GAME_MODE)
 
     @classmethod
-    def continents_get(cls, session_id: UUID) -> list[str] | None:
-        return cache.get(f"{session_id}_continents")
+    def clear_cache(cls, session: GameSession) -> None:
+        session.delete()
 
     @classmethod
-    def clear_cache(cls, session_id: UUID) -> None:
-        cache.delete(f"{session_id}_user_id")
-        cache.delete(f"{session_id}_continents")
+    async def aclear_cache(cls, session: GameSession) -> None:
+        await session.adelete()
 
     @classmethod
-    def get_questions(cls, session_id: UUID) -> NewQuestions:
+    def get_questions(cls, session: GameSession) -> NewQuestions:
         pass
 
     @classmethod
-    def get_last_question(cls, questions_with_answer: dict) -> str | None:
-        if questions_with_answer:
-            return list(questions_with_answer.values())[::-1][0]
+    async def aget_questions(cls, session: GameSession) -> NewQuestions:
+        pass
 
-        return None
+    @classmethod
+    def get_last_question(cls, questions: QuestionLog) -> str | None:
+        return questions.last()
 
     @classmethod
     def check_answer(
-        cls,
-        session_id: UUID,
-        question_index: int,
-        answer_submitted: str,
-        user: User | AnonymousUser,
-    ) -> tuple[bool, Country | None]:
+        cls, session: GameSession, question_index: int, answer_submitted: str
+    ) -> tuple[bool, CountryEntry | None]:
+        pass
+
+    @classmethod
+    async def acheck_answer(
+        cls, session: GameSession, question_index: int, answer_submitted: str
+    ) -> tuple[bool, CountryEntry | None]:
         pass
 
     @classmethod
-    def get_correct_answer(cls, user: User, country: Country, user_language: str) -> list[CorrectAnswer]:
+    def get_correct_answer(cls, user: GameUser, country: CountryEntry, user_language: str) -> list[CorrectAnswer]:
         """
         As a country can have multiple capitals, we need to return a list of correct answers everytime,
         even if there is only one.
         """
 
     @classmethod
-    @transaction.atomic
-    def guess_register(cls, user: User, is_correct: bool, country: Country) -> None:
+    async def aget_correct_answer(
+        cls, user: GameUser, country: CountryEntry, user_language: str
+    ) -> list[CorrectAnswer]:
+        pass
+
+    @classmethod
+    def guess_register(cls, user: GameUser, is_correct: bool, country: Country | CountryEntry) -> None:
         """
-        Save a user's guess
+        Save a user's guess, by batch with the other guesses (see GuessRecorder)
         """
-        score, _ = UserCountryScore.objects.get_or_create(
-            user=user,
-            country=country,
-            game_mode=cls.GAME_MODE,
-        )
-        guess = Guess.objects.create(is_correct=is_correct)
-        score.user_guesses.add(guess)
+        guess_recorder.record(user.id, country.id, cls.GAME_MODE, is_correct)
 
-        score.updated_at = timezone.now()
-        score.save()
+    @classmethod
+    async def aguess_register(cls, user: GameUser, is_correct: bool, country: Country | CountryEntry) -> None:
+        await guess_recorder.arecord(user.id, country.id, cls.GAME_MODE, is_correct)
+
+    @classmethod
+    def question_answered(cls, session: GameSession, country: Country | CountryEntry) -> None:
+        """
+        Drop an answered country from the questions picked in advance (see QuestionQueue), as it is now in cooldown.
+        """
+        if settings.GAME_QUESTION_QUEUE_SIZE and not cls.is_challenge():
+            question_queue.remove(
+                question_queue.get_key(session.user.id, cls.GAME_MODE, session.continents), country.id
+            )
+
+    @classmethod
+    async def aquestion_answered(cls, session: GameSession, country: Country | CountryEntry) -> None:
+        if settings.GAME_QUESTION_QUEUE_SIZE and not cls.is_challenge():
+            await question_queue.aremove(
+                question_queue.get_key(session.user.id, cls.GAME_MODE, session.continents), country.id
+            )
+
+    @classmethod
+    def is_challenge(cls) -> bool:
+        return "challenge" in cls.GAME_MODE.lower()
 
     @classmethod
     def user_get_streak_score(
-        cls, session_id: UUID, user: User, is_correct: bool, remaining_to_guess: int
+        cls, session: GameSession, is_correct: bool, remaining_to_guess: int
+    ) -> tuple[int, bool, int | None]:
+        user = session.user
+
+        current_score, game_over, ended_streak = session.update_streak(
+            is_correct, remaining_to_guess, cls.is_challenge()
+        )
+
+        best_streak = None
+        if ended_streak is not None and user.is_authenticated:
+            # Written with the session, see GameSession.record_ended_streak
+            best_streak = session.record_ended_streak(ended_streak)
+
+        return (
+            current_score,
+            game_over,
+            best_streak,
+        )
+
+    @classmethod
+    async def auser_get_streak_score(
+        cls, session: GameSession, is_correct: bool, remaining_to_guess: int
     ) -> tuple[int, bool, int | None]:
-        cache_streak_key = f"{session_id}_user_streak"
-        current_streak = cache.get(cache_streak_key) or 0
+        user = session.user
+
+        current_score, game_over, ended_streak = await session.aupdate_streak(
+            is_correct, remaining_to_guess, cls.is_challenge()
+        )
 
-        game_over = False
         best_streak = None
-        if not is_correct:
-            # do not increment streak
-            current_score = 0
-
-            if "challenge" in cls.GAME_MODE.lower():
-                game_over = True
-                current_score = current_streak  # keep the current streak as is for game over summary
-
-            if user.is_authenticated:
-                best_streak = user_get_best_steak(user, cls.GAME_MODE)
-
-                if current_streak > best_streak:
-                    UserStats.objects.update_or_create(
-                        user=user,
-                        game_mode=cls.GAME_MODE,
-                        defaults={"best_streak": current_streak},
-                    )
-                    best_streak = current_streak
-        # Update streak only if all answers have been guessed
-        elif remaining_to_guess > 0:
-            # do not update streak
-            current_score = current_streak
-        else:
-            # update streak
-            current_score = current_streak + 1
-
-        cache.set(cache_streak_key, current_score, timeout=cls.CACHE_TIMEOUT_SECONDS)
+        if ended_streak is not None and user.is_authenticated:
+            # Written with the session, see GameSession.record_ended_streak
+            best_streak = session.record_ended_streak(ended_streak)
 
         return (
             current_score,
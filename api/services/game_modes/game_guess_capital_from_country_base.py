@@ -1,86 +1,114 @@
-from uuid import UUID
-
-from django.contrib.auth.models import AnonymousUser
-from django.core.cache import cache
-
+from api.country_catalog import CatalogData, CountryEntry, country_catalog
+from api.game_session import GameSession, GameUser
+from api.question_log import QuestionLog
 from api.schema import CorrectAnswer, NewQuestions
 from api.services.game_modes.base_game import GameService
 from api.services.user_country_score import UserCountryScoreService
-from core.models import City, Country, User
+from core.models import Country
 
 
 class GameServiceGuessCapitalFromCountryBase(GameService):
     GAME_MODE = ""
 
     @classmethod
-    def get_questions(cls, session_id: UUID) -> NewQuestions:
+    def get_questions(cls, session: GameSession) -> NewQuestions:
         """
         Get the selected questions.
-        Append questions in the cache for answer checking after.
+        Append questions in the session for answer checking after.
         """
-        questions_with_answer = cache.get(session_id) or {}
-        len_previous_data = len(questions_with_answer)
+        last_question = cls.get_last_question(session.questions)
 
-        new_questions = {}
-        user = cls.user_get(session_id)
-        continents = cls.continents_get(session_id)
-        last_question = cls.get_last_question(questions_with_answer)
+        countries = UserCountryScoreService(
+            session.user, game_mode=cls.GAME_MODE, continents=session.continents
+        ).compute_questions(last_question, session.deck)
 
-        countries = UserCountryScoreService(user, game_mode=cls.GAME_MODE, continents=continents).compute_questions(
-            last_question
-        )
+        new_questions = cls._add_questions(session, countries, country_catalog.get())
+        session.save()
+
+        return NewQuestions(questions=new_questions)
+
+    @classmethod
+    async def aget_questions(cls, session: GameSession) -> NewQuestions:
+        last_question = cls.get_last_question(session.questions)
 
-        question_index = 0
+        countries = await UserCountryScoreService(
+            session.user, game_mode=cls.GAME_MODE, continents=session.continents
+        ).acompute_questions(last_question, session.deck)
+
+        new_questions = cls._add_questions(session, countries, await country_catalog.aget())
+        await session.asave()
+
+        return NewQuestions(questions=new_questions)
+
+    @classmethod
+    def _add_questions(cls, session: GameSession, countries: list[Country], catalog: CatalogData) -> dict[int, str]:
+        new_questions = {}
         for country in countries:
-            if not country.cities.exists():
+            country_entry = catalog.get_country(country.iso2_code)
+            if country_entry is None or not country_entry.capital_ids:
                 continue
-            next_index = len_previous_data + question_index
-            new_questions[next_index] = country.iso2_code
-            # Send name field to keep a consistent answer check
+            # Keep the capitals found so far, for countries with several capitals
             found_capitals = []
-            questions_with_answer[next_index] = (
-                list(country.cities.values_list("id", flat=True)),
-                found_capitals,
-                country.iso2_code,
+            question_index = session.questions.append(
+                (list(country_entry.capital_ids), found_capitals, country_entry.iso2_code)
             )
+            new_questions[question_index] = country_entry.iso2_code
 
-            question_index += 1
-
-        cache.set(session_id, questions_with_answer, timeout=cls.CACHE_TIMEOUT_SECONDS)
-
-        return NewQuestions(questions=new_questions)
+        return new_questions
 
     @classmethod
-    def get_last_question(cls, questions_with_answer: dict[int, tuple[list[int], list[int], str]]) -> str | None:
+    def get_last_question(cls, questions: QuestionLog) -> str | None:
         """
-        Override to return the last question from the cache, as for capital the cache structure is different.
+        Override to return the last question from the session, as for capital the questions structure is different.
         """
-        if questions_with_answer:
-            last_question_key = list(questions_with_answer.keys())[-1]
-            return questions_with_answer.get(last_question_key)[2]
+        last_question = questions.last()
+        if last_question is not None:
+            return last_question[2]
 
         return None
 
     @classmethod
     def check_answer(
-        cls,
-        session_id: UUID,
-        question_index: int,
-        answer_submitted: str,
-        user: User | AnonymousUser,
-    ) -> tuple[bool, Country | None, int]:
+        cls, session: GameSession, question_index: int, answer_submitted: str
+    ) -> tuple[bool, CountryEntry | None, int]:
         """
-        Return whether the answer received is the expected one comparing it with what is stored in the cache.
+        Return whether the answer received is the expected one comparing it with what is stored in the session.
         """
-        questions = cache.get(session_id)
+        is_correct, country, remaining_cities = cls._check_capital(
+            session, question_index, answer_submitted, country_catalog.get()
+        )
+        if country is not None and session.user.is_authenticated:
+            cls.guess_register(session.user, is_correct, country)
+            cls.question_answered(session, country)
+
+        return is_correct, country, remaining_cities
 
-        if not questions or question_index not in questions:
+    @classmethod
+    async def acheck_answer(
+        cls, session: GameSession, question_index: int, answer_submitted: str
+    ) -> tuple[bool, CountryEntry | None, int]:
+        is_correct, country, remaining_cities = cls._check_capital(
+            session, question_index, answer_submitted, await country_catalog.aget()
+        )
+        if country is not None and session.user.is_authenticated:
+            await cls.aguess_register(session.user, is_correct, country)
+            await cls.aquestion_answered(session, country)
+
+        return is_correct, country, remaining_cities
+
+    @classmethod
+    def _check_capital(
+        cls, session: GameSession, question_index: int, answer_submitted: str, catalog: CatalogData
+    ) -> tuple[bool, CountryEntry | None, int]:
+        questions = session.questions
+
+        if question_index not in questions:
             return False, None, 0
 
         cities_ids_list, found_capitals_ids, country_code = questions.get(question_index)
 
-        cities_ids = City.objects.filter(id__in=cities_ids_list, is_capital=True).values_list("pk", flat=True)
-        is_correct = answer_submitted in cities_ids
+        cities = [catalog.get_city(city_id) for city_id in cities_ids_list]
+        is_correct = any(city is not None and city.is_capital and city.id == answer_submitted for city in cities)
 
         # Case of a country with multiple capitals
         remaining_cities = 0
@@ -88,33 +116,30 @@ class GameServiceGuessCapitalFromCountryBase(GameService):
             if answer_submitted not in found_capitals_ids:
                 found_capitals_ids.append(answer_submitted)
             remaining_cities = len(cities_ids_list) - len(found_capitals_ids)
-            # cache what has been found so far
-            questions[question_index] = (cities_ids_list, found_capitals_ids)
-            cache.set(session_id, questions, timeout=cls.CACHE_TIMEOUT_SECONDS)
+            # keep what has been found so far
+            questions[question_index] = (cities_ids_list, found_capitals_ids, country_code)
 
-        countries = Country.objects.filter(cities__in=cities_ids_list).distinct()
-        if countries.count() != 1:
+        country_ids = {country_id for city in cities if city is not None for country_id in city.country_ids}
+        if len(country_ids) != 1:
             raise ValueError(f"Multiple countries found for cities: {list(cities_ids_list)}")
-        country = countries.first()
 
-        if user.is_authenticated:
-            cls.guess_register(user, is_correct, country)
-
-        return is_correct, country, remaining_cities
+        return is_correct, catalog.get_country(country_code), remaining_cities
 
     @classmethod
-    def get_correct_answer(cls, user: User, country: Country, user_language: str) -> list[CorrectAnswer]:
+    def get_correct_answer(cls, user: GameUser, country: CountryEntry, user_language: str) -> list[CorrectAnswer]:
         """
         As a country can have multiple capitals, we need to return a list of correct answers.
         """
-        name_field = f"name_{user_language}"
-        wikipedia_field = f"wikipedia_link_{user_language}"
-
-        cities = list(country.cities.filter(is_capital=True).values(name_field, wikipedia_field))
-        correct_answer_data = []
-        for city in cities:
-            city_name = city[name_field]
-            wikipedia_link = city[wikipedia_field]
-            correct_answer_data.append(CorrectAnswer(name=city_name, code="", wikipedia_link=wikipedia_link))
+        return [
+            CorrectAnswer(name=city.names[user_language], code="", wikipedia_link=city.wikipedia_links[user_language])
+            for city in country_catalog.get().get_capitals(country)
+        ]
 
-        return correct_answer_data
+    @classmethod
+    async def aget_correct_answer(
+        cls, user: GameUser, country: CountryEntry, user_language: str
+    ) -> list[CorrectAnswer]:
+        return [
+            CorrectAnswer(name=city.names[user_language], code="", wikipedia_link=city.wikipedia_links[user_language])
+            for city in (await country_catalog.aget()).get_capitals(country)
+        ]
@@ -1,74 +1,103 @@
-from uuid import UUID
-
-from django.contrib.auth.models import AnonymousUser
-from django.core.cache import cache
-
+from api.country_catalog import CountryEntry, country_catalog
+from api.game_session import GameSession, GameUser
 from api.schema import CorrectAnswer, NewQuestions
 from api.services.game_modes.base_game import GameService
 from api.services.user_country_score import UserCountryScoreService
-from core.models import Country, User
 
 
 class GameServiceGuessCountryFromFlagBase(GameService):
     GAME_MODE = ""
 
     @classmethod
-    def get_questions(cls, session_id: UUID) -> NewQuestions:
+    def get_questions(cls, session: GameSession) -> NewQuestions:
         """
         Get the selected questions.
-        Append questions in the cache for answer checking after.
+        Append questions in the session for answer checking after.
         """
         from api.flag_store import flag_store
 
-        questions_with_answer = cache.get(session_id) or {}
-        len_previous_data = len(questions_with_answer)
+        new_questions = {}
+        last_question = cls.get_last_question(session.questions)
+
+        countries = UserCountryScoreService(session.user, cls.GAME_MODE, session.continents).compute_questions(
+            last_question, session.deck
+        )
+
+        for country in countries:
+            question_index = session.questions.append(country.iso2_code)
+            new_questions[question_index] = flag_store.get_path(country.iso2_code) or ""
+
+        session.save()
+        return NewQuestions(questions=new_questions)
+
+    @classmethod
+    async def aget_questions(cls, session: GameSession) -> NewQuestions:
+        from api.flag_store import flag_store
 
         new_questions = {}
-        user = cls.user_get(session_id)
-        continents = cls.continents_get(session_id)
-        last_question = cls.get_last_question(questions_with_answer)
+        last_question = cls.get_last_question(session.questions)
 
-        countries = UserCountryScoreService(user, cls.GAME_MODE, continents).compute_questions(last_question)
+        countries = await UserCountryScoreService(session.user, cls.GAME_MODE, session.continents).acompute_questions(
+            last_question, session.deck
+        )
 
-        for index, country in enumerate(countries):
-            next_index = len_previous_data + index
-            new_questions[next_index] = flag_store.get_path(country.iso2_code) or ""
-            questions_with_answer[next_index] = country.iso2_code
+        for country in countries:
+            question_index = session.questions.append(country.iso2_code)
+            new_questions[question_index] = await flag_store.aget_path(country.iso2_code) or ""
 
-        cache.set(session_id, questions_with_answer, timeout=cls.CACHE_TIMEOUT_SECONDS)
+        await session.asave()
         return NewQuestions(questions=new_questions)
 
     @classmethod
     def check_answer(
-        cls,
-        session_id: UUID,
-        question_index: int,
-        answer_submitted: str,
-        user: User | AnonymousUser,
-    ) -> tuple[bool, Country | None]:
+        cls, session: GameSession, question_index: int, answer_submitted: str
+    ) -> tuple[bool, CountryEntry | None]:
         """
         Return whether the answer received is the expected one.
         """
-        questions = cache.get(session_id)
+        questions = session.questions
 
-        if not questions or question_index not in questions:
+        if question_index not in questions:
             return False, None
 
         country_to_guess_iso2_code = questions.get(question_index)
         is_correct = country_to_guess_iso2_code == answer_submitted
-        country = Country.objects.get(iso2_code=country_to_guess_iso2_code)
-        if user.is_authenticated:
-            cls.guess_register(user, is_correct, country)
+        country = country_catalog.get().get_country(country_to_guess_iso2_code)
+        if session.user.is_authenticated:
+            cls.guess_register(session.user, is_correct, country)
+            cls.question_answered(session, country)
 
         return is_correct, country
 
     @classmethod
-    def get_correct_answer(cls, user: User, country: Country, user_language: str) -> list[CorrectAnswer]:
-        name_field = f"name_{user_language}"
-        correct_answer = getattr(country, name_field)
-        code = country.iso2_code
+    async def acheck_answer(
+        cls, session: GameSession, question_index: int, answer_submitted: str
+    ) -> tuple[bool, CountryEntry | None]:
+        questions = session.questions
 
-        wikipedia_field = f"wikipedia_link_{user_language}"
-        wikipedia_link = getattr(country, wikipedia_field)
+        if question_index not in questions:
+            return False, None
+
+        country_to_guess_iso2_code = questions.get(question_index)
+        is_correct = country_to_guess_iso2_code == answer_submitted
+        country = (await country_catalog.aget()).get_country(country_to_guess_iso2_code)
+        if session.user.is_authenticated:
+            await cls.aguess_register(session.user, is_correct, country)
+            await cls.aquestion_answered(session, country)
+
+        return is_correct, country
+
+    @classmethod
+    def get_correct_answer(cls, user: GameUser, country: CountryEntry, user_language: str) -> list[CorrectAnswer]:
+        correct_answer = country.names[user_language]
+        code = country.iso2_code
+        wikipedia_link = country.wikipedia_links[user_language]
 
         return [CorrectAnswer(name=correct_answer, code=code, wikipedia_link=wikipedia_link)]
+
+    @classmethod
+    async def aget_correct_answer(
+        cls, user: GameUser, country: CountryEntry, user_language: str
+    ) -> list[CorrectAnswer]:
+        # Everything is already in the catalog entry
+        return cls.get_correct_answer(user, country, user_language)
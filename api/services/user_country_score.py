@@ -1,24 +1,80 @@
 import math
 import random
-
-from django.db.models import Count, Q, QuerySet
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, Func, Max, OuterRef, Q, QuerySet, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Exp, Greatest, Least, Ln, Log, Power, Random
 from django.utils import timezone
 
-from core.models import Country, User, UserCountryScore
+from api.challenge_deck import ChallengeDeck
+from api.country_catalog import (
+    ELIGIBLE_WITH_CAPITAL,
+    ELIGIBLE_WITH_FLAG,
+    CatalogData,
+    CountryEntry,
+    country_catalog,
+)
+from api.game_session import GameUser
+from api.guess_recorder import guess_recorder
+from api.question_queue import question_queue
+from api.weighted_sampling import weighted_sample
+from core.models import Country, Guess, GuessRollup, User, UserCountryScore
+from core.models.guess_rollup import RollupPeriods
 from core.models.user_country_score import GameModes
 
 
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+ONE_MICROSECOND = timedelta(microseconds=1)
+# PostgreSQL exp() raises an underflow error below about -745, where math.exp returns 0
+MIN_DECAY_EXPONENT = -700.0
+
+
+class Epoch(Func):
+    """
+    Seconds since EPOCH of a datetime, as a float (PostgreSQL).
+    """
+
+    template = "EXTRACT(EPOCH FROM %(expressions)s)::double precision"
+    output_field = FloatField()
+
+
 class UserCountryScoreService:
-    DECAY_CONSTANT = 4000
+    DECAY_CONSTANT = UserCountryScore.DECAY_CONSTANT
     COOLDOWN = 2
+    SELECTION_LEN = 10
     DEFAULT_FORGETTING_SCORE = 90
     DEFAULT_FAILURE_SCORE = 90
-
-    def __init__(self, user: User, game_mode: GameModes, continents: list[str] | None = None):
+    ROLLUP_FIELDS = ("period", "bucket_start", "decayed_total", "decayed_failures", "last_guess_at")
+
+    def __init__(
+        self,
+        user: User | GameUser,
+        game_mode: GameModes,
+        continents: list[str] | None = None,
+        rng: random.Random | None = None,
+        clock: Callable[[], datetime] | None = None,
+        weighting_engine: str | None = None,
+    ):
         self.user = user
         self.user_country_scores = []
         self.game_mode = game_mode
         self.continents = continents
+        # Seeded for reproducible selections
+        self.rng = rng
+        # Frozen for reproducible weights, timezone.now by default
+        self.clock = clock
+        # GAME_WEIGHTING_ENGINE by default
+        self.weighting_engine = weighting_engine
+
+    def now(self) -> datetime:
+        return self.clock() if self.clock else timezone.now()
+
+    def get_weighting_engine(self) -> str:
+        return self.weighting_engine or settings.GAME_WEIGHTING_ENGINE
 
     @property
     def is_game_mode_challenge(self):
@@ -41,22 +97,31 @@ class UserCountryScoreService:
         weight = (failure_score * 0.6 + forgetting_score * 0.4) / 100
         return max(weight, 0.0001)  # Ensure minimum weight to avoid division by zero
 
-    def _compute_failure_score(self, guesses: list):
+    def _compute_failure_score(self, guesses: list, rollups: list | None = None):
         """
         Retourne un score entre 0 et 100 où plus proche de 100 signifie plus d'échecs,
         donc qu'il y a "urgence" à poser la question
         Args:
             guesses:
+            rollups: old guesses, folded by compact_guesses
 
         Returns:
 
         """
-        if len(guesses) == 0:
+        rollups = rollups or []
+        if len(guesses) == 0 and len(rollups) == 0:
             return self.DEFAULT_FAILURE_SCORE  # on met un score au milieu
 
         total_weight = 0
         failure_weight = 0
-        datetime_now = timezone.now()
+        datetime_now = self.now()
+        for rollup in rollups:
+            # The weights of the rollup guesses are taken at the end of the bucket
+            minutes_ago = (datetime_now - rollup["bucket_end"]).total_seconds() / 60
+            decay = math.exp(-minutes_ago / self.DECAY_CONSTANT)
+            failure_weight += rollup["decayed_failures"] * decay
+            total_weight += rollup["decayed_total"] * decay
+
         for guess in guesses:
             minutes_ago = (datetime_now - guess["created_at"]).total_seconds() / 60
             weight = math.exp(-minutes_ago / self.DECAY_CONSTANT)
@@ -82,7 +147,7 @@ class UserCountryScoreService:
             return self.DEFAULT_FORGETTING_SCORE  # middle score
 
         last_asked = last_guess["created_at"]
-        datetime_now = timezone.now()
+        datetime_now = self.now()
         t_minutes = max((datetime_now - last_asked).total_seconds() / 60, 1)
 
         log_result = math.log(t_minutes, 10)
@@ -91,12 +156,46 @@ class UserCountryScoreService:
 
         return min(100 - retention_factor, 100)
 
-    def compute_weight(self, user_country_score: UserCountryScore):
-        guesses = user_country_score.user_guesses.values("created_at", "is_correct")
-        guesses = list(guesses)
-        last_guess = max(guesses, key=lambda g: g["created_at"]) if guesses else None
+    def compute_weight(
+        self,
+        user_country_score: UserCountryScore,
+        guesses: list[dict] | None = None,
+        rollups: list[dict] | None = None,
+    ):
+        """
+        The guesses and guess rollups of the score are queried unless given (see compute_weights).
+        """
+        if guesses is None:
+            guesses = list(user_country_score.guesses.values("created_at", "is_correct"))
+            rollups = [
+                self.get_rollup_dict(*row) for row in user_country_score.guess_rollups.values_list(*self.ROLLUP_FIELDS)
+            ]
+        rollups = rollups or []
+        last_guess_times = [guess["created_at"] for guess in guesses] + [r["last_guess_at"] for r in rollups]
+        last_guess = {"created_at": max(last_guess_times)} if last_guess_times else None
+
+        failure_score = self._compute_failure_score(guesses, rollups)
+        forgetting_score = self._compute_forgetting_score(last_guess)
 
-        failure_score = self._compute_failure_score(guesses)
+        question_weight = self._compute_question_weight(failure_score, forgetting_score)
+
+        return {
+            "user_country_score": user_country_score,
+            "country": user_country_score.country,
+            "weight": round(question_weight, 4),
+            "failure_score": round(failure_score, 2),
+            "forgetting_score": round(forgetting_score, 2),
+        }
+
+    def compute_weight_from_totals(self, user_country_score: UserCountryScore):
+        """
+        Same as compute_weight, from the decayed totals kept on the score instead of its guesses.
+        """
+        if user_country_score.decayed_total > 0:
+            failure_score = min(user_country_score.decayed_failures / user_country_score.decayed_total * 100, 100)
+        else:
+            failure_score = self.DEFAULT_FAILURE_SCORE
+        last_guess = {"created_at": user_country_score.last_guess_at} if user_country_score.last_guess_at else None
         forgetting_score = self._compute_forgetting_score(last_guess)
 
         question_weight = self._compute_question_weight(failure_score, forgetting_score)
@@ -109,6 +208,159 @@ class UserCountryScoreService:
             "forgetting_score": round(forgetting_score, 2),
         }
 
+    def compute_weights(self, user_country_scores: QuerySet[UserCountryScore]) -> list[dict]:
+        """
+        Weights of all the given scores, with the engine selected by GAME_WEIGHTING_ENGINE.
+        """
+        if self.get_weighting_engine() == "totals":
+            return [self.compute_weight_from_totals(score) for score in user_country_scores.select_related("country")]
+        if self.get_weighting_engine() == "numpy":
+            return self.compute_weights_vectorized(user_country_scores)
+
+        scores, guesses = self.load_history(user_country_scores)
+        guesses_by_score = {}
+        for score_id, created_at, is_correct in guesses:
+            guesses_by_score.setdefault(score_id, []).append({"created_at": created_at, "is_correct": is_correct})
+        rollups_by_score = {}
+        for score_id, *rollup in self.load_rollups(scores):
+            rollups_by_score.setdefault(score_id, []).append(self.get_rollup_dict(*rollup))
+
+        return [
+            self.compute_weight(score, guesses_by_score.get(score.pk, []), rollups_by_score.get(score.pk, []))
+            for score in scores
+        ]
+
+    @staticmethod
+    def load_history(
+        user_country_scores: QuerySet[UserCountryScore],
+    ) -> tuple[list[UserCountryScore], list[tuple[int, datetime, bool]]]:
+        """
+        Return the scores with their country, and the (score id, created_at, is_correct) rows of all their guesses.
+        Two queries, whatever the number of scores and guesses.
+        """
+        scores = list(user_country_scores.select_related("country"))
+        if not scores:
+            return [], []
+
+        guesses = Guess.objects.filter(score_id__in=[score.pk for score in scores]).values_list(
+            "score_id", "created_at", "is_correct"
+        )
+        return scores, list(guesses)
+
+    @classmethod
+    def load_rollups(cls, scores: list[UserCountryScore]) -> list[tuple]:
+        """
+        Return the (score id, period, bucket_start, decayed_total, decayed_failures, last_guess_at) rows
+        of the guess rollups of the scores, in one query.
+        """
+        if not scores:
+            return []
+        return list(
+            GuessRollup.objects.filter(score__in=[score.pk for score in scores]).values_list(
+                "score_id", *cls.ROLLUP_FIELDS
+            )
+        )
+
+    @staticmethod
+    def get_rollup_dict(
+        period: str, bucket_start: datetime, decayed_total: float, decayed_failures: float, last_guess_at: datetime
+    ) -> dict:
+        return {
+            "bucket_end": GuessRollup.get_bucket_end(bucket_start, period),
+            "decayed_total": decayed_total,
+            "decayed_failures": decayed_failures,
+            "last_guess_at": last_guess_at,
+        }
+
+    def compute_weights_vectorized(self, user_country_scores: QuerySet[UserCountryScore]) -> list[dict]:
+        """
+        Same results as compute_weight, for all the scores at once: the guesses of the scores are loaded
+        into arrays (score index, timestamp, correctness), and the failure and forgetting scores
+        are computed for every score in a few passes over them.
+        """
+        # Optional dependency (numpy extra), only imported by the workers using this engine
+        import numpy as np
+
+        scores, guesses = self.load_history(user_country_scores)
+        if not scores:
+            return []
+        index_by_score_id = {score.pk: index for index, score in enumerate(scores)}
+
+        score_indexes = np.fromiter(
+            (index_by_score_id[score_id] for score_id, _, _ in guesses), dtype=np.intp, count=len(guesses)
+        )
+        # Whole microseconds, as timedelta does, so that the ages are the same as with compute_weight
+        created_at = np.fromiter(
+            ((created_at - EPOCH) // ONE_MICROSECOND for _, created_at, _ in guesses),
+            dtype=np.int64,
+            count=len(guesses),
+        )
+        is_correct = np.fromiter((is_correct for _, _, is_correct in guesses), dtype=bool, count=len(guesses))
+        now = (self.now() - EPOCH) // ONE_MICROSECOND
+
+        # Old guesses, folded by compact_guesses: their weights are taken at the end of their bucket
+        rollups = self.load_rollups(scores)
+        rollup_indexes = np.fromiter(
+            (index_by_score_id[score_id] for score_id, *_ in rollups), dtype=np.intp, count=len(rollups)
+        )
+        rollup_ends = np.fromiter(
+            (
+                (GuessRollup.get_bucket_end(bucket_start, period) - EPOCH) // ONE_MICROSECOND
+                for _, period, bucket_start, *_ in rollups
+            ),
+            dtype=np.int64,
+            count=len(rollups),
+        )
+        rollup_totals = np.fromiter((row[3] for row in rollups), dtype=float, count=len(rollups))
+        rollup_failures = np.fromiter((row[4] for row in rollups), dtype=float, count=len(rollups))
+        rollup_last_guesses = np.fromiter(
+            ((row[5] - EPOCH) // ONE_MICROSECOND for row in rollups), dtype=np.int64, count=len(rollups)
+        )
+
+        has_guesses = (np.bincount(score_indexes, minlength=len(scores)) > 0) | (
+            np.bincount(rollup_indexes, minlength=len(scores)) > 0
+        )
+
+        # Failure score: share of the failures, weighted by an exponential decay of their age
+        decay_weights = np.exp(-((now - created_at) / 1e6 / 60) / self.DECAY_CONSTANT)
+        rollup_decays = np.exp(-((now - rollup_ends) / 1e6 / 60) / self.DECAY_CONSTANT)
+        total_weights = np.bincount(
+            rollup_indexes, weights=rollup_totals * rollup_decays, minlength=len(scores)
+        ) + np.bincount(score_indexes, weights=decay_weights, minlength=len(scores))
+        failure_weights = np.bincount(
+            rollup_indexes, weights=rollup_failures * rollup_decays, minlength=len(scores)
+        ) + np.bincount(score_indexes, weights=np.where(is_correct, 0.0, decay_weights), minlength=len(scores))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            failure_scores = np.where(
+                has_guesses, np.minimum(failure_weights / total_weights * 100, 100), self.DEFAULT_FAILURE_SCORE
+            )
+
+        # Forgetting score: from the age of the last guess
+        last_guesses = np.zeros(len(scores), dtype=np.int64)
+        np.maximum.at(last_guesses, score_indexes, created_at)
+        np.maximum.at(last_guesses, rollup_indexes, rollup_last_guesses)
+        t_minutes = np.maximum((now - last_guesses) / 1e6 / 60, 1)
+        # Same as math.log(t_minutes, 10)
+        retention_factors = (100 * 1.84) / (np.power(np.log(t_minutes) / math.log(10), 1.25) + 1.84)
+        forgetting_scores = np.where(
+            has_guesses, np.minimum(100 - retention_factors, 100), self.DEFAULT_FORGETTING_SCORE
+        )
+
+        question_weights = np.maximum((failure_scores * 0.6 + forgetting_scores * 0.4) / 100, 0.0001)
+
+        return [
+            {
+                "user_country_score": score,
+                "country": score.country,
+                "weight": round(float(question_weight), 4),
+                "failure_score": round(float(failure_score), 2),
+                "forgetting_score": round(float(forgetting_score), 2),
+            }
+            for score, question_weight, failure_score, forgetting_score in zip(
+                scores, question_weights, failure_scores, forgetting_scores
+            )
+        ]
+
     def get_default_weight(self, country: Country):
         """
         Weight for a country without any UserCountryScore yet. Default values.
@@ -121,106 +373,257 @@ class UserCountryScoreService:
             "forgetting_score": self.DEFAULT_FORGETTING_SCORE,
         }
 
-    def get_valid_countries_filter(self, queryset: QuerySet[Country]) -> QuerySet[Country]:
+    def get_eligibility(self) -> str | None:
         if self.is_game_mode_gcff:
-            queryset = queryset.exclude(flag__isnull=True).exclude(flag="")
+            return ELIGIBLE_WITH_FLAG
         elif self.is_game_mode_gcfc:
-            queryset = queryset.filter(cities__is_capital=True).distinct()
+            return ELIGIBLE_WITH_CAPITAL
+        return None
 
-        if self.continents:
-            queryset = queryset.filter(continent__in=self.continents)
+    def get_valid_country_mask(self, catalog: CatalogData) -> int:
+        """
+        Countries of the game mode (with a flag or a capital) on the continents of the game, from the catalog.
+        """
+        return catalog.get_eligible_mask(self.get_eligibility(), self.continents)
 
-        return queryset
+    def get_valid_country_ids(self, catalog: CatalogData) -> set[int]:
+        return set(catalog.get_ids(self.get_valid_country_mask(catalog)))
 
-    def get_valid_user_country_filter(self, queryset: QuerySet[UserCountryScore]) -> QuerySet[UserCountryScore]:
-        if self.is_game_mode_gcff:
-            queryset = queryset.exclude(country__flag__isnull=True).exclude(country__flag="")
-        elif self.is_game_mode_gcfc:
-            queryset = queryset.filter(country__cities__is_capital=True).distinct()
-
-        if self.continents:
-            queryset = queryset.filter(country__continent__in=self.continents)
-        return queryset
-
-    def compute_questions(self, last_question: str | None) -> list[Country]:
-        selection_len = 10
-        if not self.user.is_authenticated or self.is_game_mode_challenge:
-            countries = Country.objects.all()
-            if self.continents:
-                countries = countries.filter(continent__in=self.continents)
-            countries = self.get_valid_countries_filter(countries)
-
-            if self.is_game_mode_challenge:
-                countries_list = list(countries)
-                random.shuffle(countries_list)
-                return countries_list
-            else:
-                # Training mode is not available for anonymous users, but keep this line for now.
-                return countries.order_by("?")[0:selection_len]
+    def compute_questions(
+        self, last_question: str | None, deck: ChallengeDeck | None = None
+    ) -> list[Country] | list[CountryEntry]:
+        """
+        In challenge mode, return the next chunk of the deck (a new deck is started when none is given).
+        Challenge and anonymous questions are catalog entries, picked without any query.
+        """
+        if self.is_catalog_selection:
+            return self.catalog_questions(country_catalog.get(), deck)
+
+        # Apply the algorithm
+        if settings.GAME_QUESTION_QUEUE_SIZE:
+            return self.queued_questions(self.SELECTION_LEN, last_question)
+        return self.personalized_questions(self.SELECTION_LEN, last_question)
+
+    async def acompute_questions(
+        self, last_question: str | None, deck: ChallengeDeck | None = None
+    ) -> list[Country] | list[CountryEntry]:
+        """
+        The selection runs a handful of dependent queries and some weighting in Python: run it as one unit.
+        """
+        if self.is_catalog_selection:
+            return self.catalog_questions(await country_catalog.aget(), deck)
+        return await sync_to_async(lambda: list(self.compute_questions(last_question, deck)))()
+
+    @property
+    def is_catalog_selection(self) -> bool:
+        return not self.user.is_authenticated or self.is_game_mode_challenge
+
+    def catalog_questions(self, catalog: CatalogData, deck: ChallengeDeck | None) -> list[CountryEntry]:
+        country_ids = catalog.get_ids(self.get_valid_country_mask(catalog))
+
+        if self.is_game_mode_challenge:
+            return self.challenge_questions(catalog, country_ids, deck or ChallengeDeck())
         else:
-            # Apply the algorithm
-            return self.personalized_questions(selection_len, last_question)
+            # Training mode is not available for anonymous users, but keep this line for now.
+            sample = (self.rng or random).sample(country_ids, min(self.SELECTION_LEN, len(country_ids)))  # nosec
+            return [catalog.countries_by_id[country_id] for country_id in sample]
 
-    def personalized_questions(self, selection_len: int, last_question: str | None) -> list[Country]:
-        datetime_now = timezone.now()
+    @staticmethod
+    def challenge_questions(catalog: CatalogData, country_ids: list[int], deck: ChallengeDeck) -> list[CountryEntry]:
+        """
+        Only the ids of the eligible countries are needed: the deck keeps its own, taken when it was started.
+        """
+        return [catalog.countries_by_id[country_id] for country_id in deck.next_chunk(country_ids)]
 
-        countries_without_score = Country.objects.none()
-        # The cooldown can be too harsh depending on the user's speed
-        # Reduce it until we find results
-        for cooldown_seconds in range(self.COOLDOWN * 60, -1, -30):
-            cooldown_threshold = datetime_now - timezone.timedelta(seconds=cooldown_seconds)
+    def get_queue_key(self) -> str:
+        return question_queue.get_key(self.user.id, self.game_mode, self.continents)
 
-            user_country_scores = UserCountryScore.objects.filter(
-                user=self.user,
-                game_mode=self.game_mode,
-                updated_at__lte=cooldown_threshold,
+    def queued_questions(self, selection_len: int, last_question: str | None) -> list[Country]:
+        """
+        Pop the questions from the queue computed in the background, completed by the scheduler when the queue
+        runs short, and refill the queue once it gets short.
+        """
+        queue_key = self.get_queue_key()
+        country_ids, remaining = question_queue.pop(queue_key, selection_len)
+        countries_by_id = Country.objects.in_bulk(country_ids) if country_ids else {}
+        selection = [countries_by_id[country_id] for country_id in country_ids if country_id in countries_by_id]
+        if len(selection) < selection_len:
+            # The popped questions are asked first, the scheduler picks the others
+            selection += self.personalized_questions(
+                selection_len - len(selection),
+                last_question=None,
+                exclude_country_ids={country.id for country in selection},
             )
-            self.user_country_scores = self.get_valid_user_country_filter(user_country_scores)
+        selection = self.avoid_last_question(selection, last_question)
+
+        if remaining <= settings.GAME_QUESTION_QUEUE_LOW_WATER_MARK:
+            # The questions just selected are not answered yet: they are not in their cooldown
+            asked_country_ids = {country.id for country in selection}
+            question_queue.schedule_refill(queue_key, lambda: self.get_queue_country_ids(asked_country_ids))
+
+        return selection
+
+    def get_queue_country_ids(self, exclude_country_ids: set[int]) -> list[int]:
+        countries = self.personalized_questions(
+            settings.GAME_QUESTION_QUEUE_SIZE, last_question=None, exclude_country_ids=exclude_country_ids
+        )
+        return [country.id for country in countries]
+
+    def personalized_questions(
+        self, selection_len: int, last_question: str | None, exclude_country_ids: set[int] | None = None
+    ) -> list[Country]:
+        # The weights are computed from the guesses: write the ones of the player still queued first, the others are
+        # left to the batches
+        guess_recorder.flush(user_id=self.user.id, game_mode=self.game_mode)
+
+        datetime_now = self.now()
+
+        # The scores of the countries out of the game are left out with the catalog masks, not with joins
+        catalog = country_catalog.get()
+        valid_mask = self.get_valid_country_mask(catalog)
+        user_country_scores = UserCountryScore.objects.filter(user_id=self.user.id, game_mode=self.game_mode)
+        updated_at_by_country = {
+            country_id: updated_at
+            # Unordered, read from the (user, game mode, updated_at) index only
+            for country_id, updated_at in user_country_scores.order_by().values_list("country_id", "updated_at")
+            if catalog.is_in_mask(country_id, valid_mask)
+        }
 
-            # We need to ask countries that have never been asked before, or that have no score yet.
-            countries_without_score = Country.objects.annotate(
-                score_count=Count(
-                    "country_scores", filter=Q(country_scores__user=self.user, country_scores__game_mode=self.game_mode)
-                )
-            ).filter(score_count=0)
-            countries_without_score = self.get_valid_countries_filter(countries_without_score)
+        # We need to ask countries that have never been asked before, or that have no score yet.
+        never_seen_country_ids = set(catalog.get_ids(valid_mask & ~catalog.get_mask(updated_at_by_country)))
 
-            if self.user_country_scores or countries_without_score:
+        # The cooldown can be too harsh depending on the user's speed
+        # Reduce it until we find results
+        oldest_updated_at = min(updated_at_by_country.values(), default=None)
+        for cooldown_seconds in range(self.COOLDOWN * 60, -1, -30):
+            cooldown_threshold = datetime_now - timezone.timedelta(seconds=cooldown_seconds)
+            if never_seen_country_ids or (oldest_updated_at is not None and oldest_updated_at <= cooldown_threshold):
                 break
+        cooled_down_country_ids = {
+            country_id for country_id, updated_at in updated_at_by_country.items() if updated_at <= cooldown_threshold
+        }
+        self.user_country_scores = user_country_scores.filter(
+            country_id__in=cooled_down_country_ids, updated_at__lte=cooldown_threshold
+        )
+
+        if self.get_weighting_engine() == "database":
+            # Weights and selection in one query, see database_questions
+            candidate_country_ids = never_seen_country_ids | cooled_down_country_ids
+            selection = self.database_questions(candidate_country_ids - (exclude_country_ids or set()), selection_len)
+            return self.avoid_last_question(selection, last_question)
 
         # Step 1: Compute weights
-        scored_questions = [self.compute_weight(q) for q in self.user_country_scores]
+        scored_questions = self.compute_weights(self.user_country_scores)
         # Add never seen countries if any (no score yet, but we need to ask)
-        if countries_without_score.exists():
+        if never_seen_country_ids:
+            countries_without_score = Country.objects.in_bulk(never_seen_country_ids).values()
             scored_questions.extend([self.get_default_weight(c) for c in countries_without_score])
 
-        # Step 2: Normalize the weights (total amount of "chance" available)
-        total_weight = sum(q["weight"] for q in scored_questions)
-
-        # Now each weight is divided by the total to convert it into a percentage of the total (values between 0 and 1).
-        # E.g., if a question has weight 5 and the total is 20, its normalized weight becomes 0.25 → it gets a 25% chance of being picked.
-        for q in scored_questions:
-            q["normalized_weight"] = q["weight"] / total_weight
-
-        selection = []
-        for _ in range(selection_len):
-            # Step 3: Weighted random selection
-            # picking a random point.
-            rand_val = random.uniform(0, sum(q["normalized_weight"] for q in scored_questions))  # nosec
-            cumulative = 0
-            for q in scored_questions:
-                # Cumulative is a way of checking each weight, the bigger the weight the more likely it is to be in the rand_val
-                cumulative += q["normalized_weight"]
-                # The first time the cumulative chance exceeds the rand_val, we stop
-                if cumulative >= rand_val:
-                    chosen = q["country"]
-                    selection.append(chosen)
-                    scored_questions.remove(q)
-                    break
-
-        # Avoid re-asking the same country twice in a row
-        # This can happen if the cooldown was so small (or inexistant)
-        # that the last question is able to be in the possible selected countries again
+        if exclude_country_ids:
+            scored_questions = [q for q in scored_questions if q["country"].id not in exclude_country_ids]
+
+        # Step 2: Weighted random selection, without picking a country twice
+        selection = weighted_sample(
+            [q["country"] for q in scored_questions], [q["weight"] for q in scored_questions], selection_len, self.rng
+        )
+
+        return self.avoid_last_question(selection, last_question)
+
+    def annotate_database_weights(self, countries: QuerySet[Country]) -> QuerySet[Country]:
+        """
+        Annotate the weight of each country, computed by PostgreSQL as compute_weight does, from the guesses
+        and the guess rollups of the user (without rounding).
+        """
+        now = Value((self.now() - EPOCH) / ONE_MICROSECOND / 1e6, output_field=FloatField())
+        minutes_per_decay = Value(60.0 * self.DECAY_CONSTANT, output_field=FloatField())
+        score_filter = {"user_id": self.user.id, "game_mode": self.game_mode, "country_id": OuterRef("pk")}
+
+        guesses = (
+            Guess.objects.filter(**{f"score__{key}": value for key, value in score_filter.items()})
+            .order_by()
+            .values("score__country_id")
+        )
+        guess_decay = Exp(Greatest((Epoch(F("created_at")) - now) / minutes_per_decay, Value(MIN_DECAY_EXPONENT)))
+
+        rollups = (
+            GuessRollup.objects.filter(**{f"score__{key}": value for key, value in score_filter.items()})
+            .order_by()
+            .values("score__country_id")
+        )
+        # The weights of the rollup guesses are taken at the end of the bucket
+        bucket_seconds = Case(
+            *[
+                When(period=period, then=Value((GuessRollup.get_bucket_end(EPOCH, period) - EPOCH).total_seconds()))
+                for period in RollupPeriods.values
+            ],
+            output_field=FloatField(),
+        )
+        rollup_decay = Exp(
+            Greatest((Epoch(F("bucket_start")) + bucket_seconds - now) / minutes_per_decay, Value(MIN_DECAY_EXPONENT))
+        )
+
+        def aggregate(queryset, aggregate_expression):
+            return Subquery(queryset.annotate(value=aggregate_expression).values("value"))
+
+        default_failure_score = Value(float(self.DEFAULT_FAILURE_SCORE))
+        default_forgetting_score = Value(float(self.DEFAULT_FORGETTING_SCORE))
+        return (
+            countries.annotate(
+                decayed_total=Coalesce(aggregate(guesses, Sum(guess_decay)), 0.0)
+                + Coalesce(aggregate(rollups, Sum(F("decayed_total") * rollup_decay)), 0.0),
+                decayed_failures=Coalesce(aggregate(guesses, Sum(guess_decay, filter=Q(is_correct=False))), 0.0)
+                + Coalesce(aggregate(rollups, Sum(F("decayed_failures") * rollup_decay)), 0.0),
+                guesses_count=Coalesce(aggregate(guesses, Count("pk")), 0)
+                + Coalesce(aggregate(rollups, Count("pk")), 0),
+                last_guess_at=Greatest(
+                    aggregate(guesses, Max(Epoch(F("created_at")))), aggregate(rollups, Max(Epoch(F("last_guess_at"))))
+                ),
+            )
+            .annotate(
+                failure_score=Case(
+                    When(guesses_count=0, then=default_failure_score),
+                    default=Least(F("decayed_failures") / F("decayed_total") * 100.0, 100.0),
+                    output_field=FloatField(),
+                ),
+                # As _compute_forgetting_score
+                forgetting_score=Case(
+                    When(last_guess_at__isnull=True, then=default_forgetting_score),
+                    default=Least(
+                        100.0
+                        - (100.0 * 1.84)
+                        / (Power(Log(10.0, Greatest((now - F("last_guess_at")) / 60.0, 1.0)), 1.25) + 1.84),
+                        100.0,
+                    ),
+                    output_field=FloatField(),
+                ),
+            )
+            .annotate(weight=Greatest((F("failure_score") * 0.6 + F("forgetting_score") * 0.4) / 100.0, 0.0001))
+        )
+
+    def database_questions(self, country_ids: set[int], selection_len: int) -> list[Country]:
+        """
+        Same selection as weighted_sample with the weights of compute_weights, made by PostgreSQL:
+        each country gets the key -ln(u) / weight and the ones with the smallest keys are picked,
+        so that only the selected countries are fetched.
+        """
+        if self.rng is not None:
+            # Seeds random() for the rest of the database session
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT setseed(%s)", [self.rng.uniform(-1, 1)])
+
+        countries = self.annotate_database_weights(Country.objects.filter(id__in=country_ids))
+        # 1 - random() is in (0, 1], its log is defined
+        return list(
+            countries.annotate(sampling_key=-Ln(1.0 - Random()) / F("weight")).order_by("sampling_key")[:selection_len]
+        )
+
+    @staticmethod
+    def avoid_last_question(selection: list[Country], last_question: str | None) -> list[Country]:
+        """
+        Avoid re-asking the same country twice in a row.
+        This can happen if the cooldown was so small (or inexistant)
+        that the last question is able to be in the possible selected countries again
+        """
         first_selection = selection[0] if selection else None
         if first_selection and first_selection.iso2_code == last_question:
             selection = selection[1:] + [first_selection]
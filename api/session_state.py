@@ -0,0 +1,188 @@
+from typing import Any
+from uuid import UUID
+
+from asgiref.sync import sync_to_async
+from redis import Redis
+from redis.commands.core import Script
+
+from api.redis_cache import get_default_cache, get_redis_cache, get_redis_client, get_redis_serializer
+
+# Same rules as next_streak, see SessionStateStore.update_streak
+UPDATE_STREAK_SCRIPT = """
+local current_streak = tonumber(redis.call("HGET", KEYS[1], ARGV[1])) or 0
+local is_correct = ARGV[2] == "1"
+local remaining_to_guess = tonumber(ARGV[3])
+local is_challenge = ARGV[4] == "1"
+
+local streak = current_streak
+local game_over = 0
+local ended_streak = -1
+if not is_correct then
+    ended_streak = current_streak
+    if is_challenge then
+        game_over = 1
+    else
+        streak = 0
+    end
+elseif remaining_to_guess <= 0 then
+    streak = current_streak + 1
+end
+
+redis.call("HSET", KEYS[1], ARGV[1], streak)
+-- The expiration is refreshed by the checkpoints, only set it on a new session
+if redis.call("TTL", KEYS[1]) < 0 then
+    redis.call("EXPIRE", KEYS[1], ARGV[5])
+end
+return {streak, game_over, ended_streak}
+"""
+
+
+def next_streak(
+    current_streak: int, is_correct: bool, remaining_to_guess: int, is_challenge: bool
+) -> tuple[int, bool, int | None]:
+    """
+    Return the new streak, whether the game is over and the streak that just ended, if any.
+    """
+    if not is_correct:
+        if is_challenge:
+            # keep the current streak as is for game over summary
+            return current_streak, True, current_streak
+        return 0, False, current_streak
+
+    # Update streak only if all answers have been guessed
+    if remaining_to_guess > 0:
+        return current_streak, False, None
+
+    return current_streak + 1, False, None
+
+
+class SessionStateStore:
+    """
+    Store all the fields of a game session in one Redis hash, with one sliding TTL.
+
+    Reads fetch only the requested fields (HMGET) and refresh the TTL in the same round trip,
+    writes update the given fields and refresh the TTL, and deleting the hash removes the whole session at once.
+    Streak updates, sent on every answer, leave the TTL to the next write.
+
+    With another cache backend (tests, local development), the fields are kept in one dict under the same key.
+    """
+
+    KEY_PREFIX = "game_session"
+    TIMEOUT_SECONDS = 86400
+    STREAK_FIELD = "streak"
+
+    def __init__(self):
+        self._update_streak_script: Script | None = None
+
+    def get_key(self, session_id: UUID | str) -> str:
+        return f"{self.KEY_PREFIX}:{session_id}"
+
+    def get_update_streak_script(self, client: Redis) -> Script:
+        """
+        Registered once: the script keeps its SHA, and is run on the client given to each call.
+        """
+        if self._update_streak_script is None:
+            self._update_streak_script = client.register_script(UPDATE_STREAK_SCRIPT)
+        return self._update_streak_script
+
+    def get(self, session_id: UUID | str, fields: list[str]) -> dict[str, Any]:
+        """
+        Return the requested fields that are set.
+        """
+        key = self.get_key(session_id)
+        redis_cache = get_redis_cache()
+        if redis_cache is None:
+            data = get_default_cache().get(key) or {}
+            if data:
+                get_default_cache().touch(key, self.TIMEOUT_SECONDS)
+            return {field: data[field] for field in fields if field in data}
+
+        redis_key, client = get_redis_client(redis_cache, key)
+        pipeline = client.pipeline(transaction=False)
+        pipeline.hmget(redis_key, fields)
+        pipeline.expire(redis_key, self.TIMEOUT_SECONDS)
+        values, _ = pipeline.execute()
+
+        serializer = get_redis_serializer(redis_cache)
+        return {field: serializer.loads(value) for field, value in zip(fields, values) if value is not None}
+
+    def set(self, session_id: UUID | str, values: dict[str, Any], delete_fields: list[str] | None = None) -> None:
+        """
+        Update the given fields and remove delete_fields, leaving the others untouched.
+        """
+        key = self.get_key(session_id)
+        redis_cache = get_redis_cache()
+        if redis_cache is None:
+            data = get_default_cache().get(key) or {}
+            data.update(values)
+            for field in delete_fields or []:
+                data.pop(field, None)
+            get_default_cache().set(key, data, timeout=self.TIMEOUT_SECONDS)
+            return
+
+        redis_key, client = get_redis_client(redis_cache, key)
+        serializer = get_redis_serializer(redis_cache)
+        pipeline = client.pipeline(transaction=True)
+        pipeline.hset(redis_key, mapping={field: serializer.dumps(value) for field, value in values.items()})
+        if delete_fields:
+            pipeline.hdel(redis_key, *delete_fields)
+        pipeline.expire(redis_key, self.TIMEOUT_SECONDS)
+        pipeline.execute()
+
+    def delete(self, session_id: UUID | str) -> None:
+        key = self.get_key(session_id)
+        redis_cache = get_redis_cache()
+        if redis_cache is None:
+            get_default_cache().delete(key)
+            return
+
+        redis_key, client = get_redis_client(redis_cache, key)
+        client.delete(redis_key)
+
+    def update_streak(
+        self, session_id: UUID | str, is_correct: bool, remaining_to_guess: int, is_challenge: bool
+    ) -> tuple[int, bool, int | None]:
+        """
+        Apply an answer to the stored streak and return the new streak, whether the game is over
+        and the streak that just ended, if any.
+
+        With Redis, this runs as one script: answers received at the same time (e.g. from two tabs)
+        are applied one after the other, in one round trip.
+        """
+        key = self.get_key(session_id)
+        redis_cache = get_redis_cache()
+        if redis_cache is None:
+            current_streak = self.get(session_id, [self.STREAK_FIELD]).get(self.STREAK_FIELD, 0)
+            result = next_streak(current_streak, is_correct, remaining_to_guess, is_challenge)
+            self.set(session_id, {self.STREAK_FIELD: result[0]})
+            return result
+
+        redis_key, client = get_redis_client(redis_cache, key)
+        streak, game_over, ended_streak = self.get_update_streak_script(client)(
+            keys=[redis_key],
+            args=[self.STREAK_FIELD, int(is_correct), remaining_to_guess, int(is_challenge), self.TIMEOUT_SECONDS],
+            client=client,
+        )
+        return streak, bool(game_over), ended_streak if ended_streak >= 0 else None
+
+    # Redis calls are plain network I/O, they do not need the thread shared with the ORM
+    async def aget(self, session_id: UUID | str, fields: list[str]) -> dict[str, Any]:
+        return await sync_to_async(self.get, thread_sensitive=False)(session_id, fields)
+
+    async def aset(
+        self, session_id: UUID | str, values: dict[str, Any], delete_fields: list[str] | None = None
+    ) -> None:
+        await sync_to_async(self.set, thread_sensitive=False)(session_id, values, delete_fields)
+
+    async def aupdate_streak(
+        self, session_id: UUID | str, is_correct: bool, remaining_to_guess: int, is_challenge: bool
+    ) -> tuple[int, bool, int | None]:
+        return await sync_to_async(self.update_streak, thread_sensitive=False)(
+            session_id, is_correct, remaining_to_guess, is_challenge
+        )
+
+    async def adelete(self, session_id: UUID | str) -> None:
+        await sync_to_async(self.delete, thread_sensitive=False)(session_id)
+
+
+session_state_store = SessionStateStore()
@@ -1,9 +1,11 @@
 from unittest.mock import patch
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.test import Client
 from django.urls import reverse
 
+from api.game_token import game_token_check
 from core.models import UserPreferenceGameMode
 from core.models.user_country_score import GameModes
 from core.tests.factories import CityFactory, CountryFactory
@@ -24,6 +26,7 @@ class TestApi(FlagoraTestCase):
         self.city_get_list_url = reverse("api-1.0.0:city_get_list")
         self.user_update_preferences_url = reverse("api-1.0.0:user_me_preferences")
         self.user_stats_url = reverse("api-1.0.0:user_stats")
+        self.game_token_url = reverse("api-1.0.0:game_token_get")
 
     #### USER ME TESTS ####
     def test_user_me_authenticated(self):
@@ -339,3 +342,24 @@ class TestApi(FlagoraTestCase):
         response = self.client.get(self.user_stats_url, headers=headers)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json(), [])
+
+    #### GAME TOKEN TESTS ####
+    def test_game_token_authenticated(self):
+        headers = self.user_do_login()
+        game_mode = GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE
+        response = self.client.post(
+            self.game_token_url, data={"gameMode": game_mode}, content_type="application/json", headers=headers
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["expiresIn"], settings.GAME_TOKEN_MAX_AGE_SECONDS)
+        self.assertEqual(game_token_check(data["token"], game_mode).id, self.user.id)
+
+    def test_game_token_unauthenticated(self):
+        response = self.client.post(
+            self.game_token_url,
+            data={"gameMode": GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,49 @@
+from django.test import SimpleTestCase, override_settings
+
+from api.challenge_deck import ChallengeDeck
+
+
+@override_settings(GAME_CHALLENGE_CHUNK_SIZE=2)
+class ChallengeDeckTest(SimpleTestCase):
+    def test_chunks_cover_the_deck_once(self):
+        deck = ChallengeDeck()
+        country_ids = [5, 3, 8, 1, 9]
+
+        chunks = [deck.next_chunk(country_ids) for _ in range(4)]
+
+        self.assertTrue(deck.is_started)
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1, 0])
+        self.assertEqual(sum(chunks, []), deck.get_order(country_ids))
+        self.assertCountEqual(sum(chunks, []), country_ids)
+
+    def test_order_does_not_depend_on_the_order_of_the_ids(self):
+        deck = ChallengeDeck(seed=7)
+
+        self.assertEqual(deck.get_order([1, 2, 3, 4]), deck.get_order([4, 3, 2, 1]))
+
+    def test_catalog_change_during_the_game(self):
+        deck = ChallengeDeck()
+        first_chunk = deck.next_chunk([5, 3, 8, 1, 9])
+        order = deck.get_order([5, 3, 8, 1, 9])
+        removed_id = order[-1]
+
+        # A country is added to the catalog and another one removed after the first chunk
+        country_ids = [country_id for country_id in [5, 3, 8, 1, 9, 4] if country_id != removed_id]
+        chunks = [first_chunk] + [deck.next_chunk(country_ids) for _ in range(3)]
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 0, 0])
+        self.assertEqual(sum(chunks, []), order[:-1])
+
+    def test_stored_data(self):
+        self.assertEqual(ChallengeDeck().to_stored_data(), {})
+
+        deck = ChallengeDeck(seed=7, cursor=4, country_ids=[1, 3, 5])
+        resumed = ChallengeDeck.from_stored_data(deck.to_stored_data())
+
+        self.assertEqual((resumed.seed, resumed.cursor, resumed.country_ids), (7, 4, [1, 3, 5]))
+
+    def test_deck_stored_without_its_countries(self):
+        deck = ChallengeDeck.from_stored_data({ChallengeDeck.SEED_FIELD: 7, ChallengeDeck.CURSOR_FIELD: 2})
+
+        self.assertEqual(deck.next_chunk([1, 2, 3, 4]), deck.get_order([1, 2, 3, 4])[2:])
+        self.assertEqual(deck.country_ids, [1, 2, 3, 4])
@@ -0,0 +1,138 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from api.country_catalog import ELIGIBLE_WITH_CAPITAL, ELIGIBLE_WITH_FLAG, CountryCatalog, country_catalog
+from core.tests.factories import CityFactory, CountryFactory
+from flagora.tests.base import FlagoraTestCase
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "isolated-test-cache",
+        }
+    }
+)
+class CountryCatalogTest(FlagoraTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        country_catalog.clear()
+
+    def tearDown(self):
+        super().tearDown()
+        cache.clear()
+
+    def test_country_entry(self):
+        country = country_catalog.get().get_country("GL")
+
+        self.assertEqual(country.id, self.country.id)
+        self.assertEqual(country.names, {"fr": "Groenland", "en": "Greenland"})
+        self.assertEqual(country.wikipedia_links["en"], "https://en.wikipedia.org/wiki/Greenland")
+        self.assertEqual(country.continent, self.country.continent)
+        self.assertTrue(country.has_flag)
+        # The non-capital city added by the factory is left out
+        self.assertEqual(country.capital_ids, (self.city.id,))
+
+    def test_city_entry(self):
+        city = country_catalog.get().get_city(self.city.id)
+
+        self.assertEqual(city.names["en"], "Nuuk")
+        self.assertEqual(city.wikipedia_links["fr"], "https://fr.wikipedia.org/wiki/Nuuk")
+        self.assertTrue(city.is_capital)
+        self.assertEqual(city.country_ids, (self.country.id,))
+
+    def test_entries_are_hashable(self):
+        catalog = country_catalog.get()
+        country = catalog.get_country("GL")
+
+        self.assertEqual({country, catalog.get_country("GL")}, {country})
+        self.assertEqual({catalog.get_city(self.city.id): country}[catalog.get_city(self.city.id)], country)
+
+    def test_eligible_ids(self):
+        without_flag = CountryFactory(iso2_code="XF", iso3_code="XFX", continent="EU", flag=None)
+        european = CountryFactory(iso2_code="XE", iso3_code="XEX", continent="EU")
+        european.cities.add(CityFactory(is_capital=True))
+        asian = CountryFactory(iso2_code="XA", iso3_code="XAX", continent="AS")
+        self.country.continent = "NA"
+        self.country.save()
+        catalog = country_catalog.get()
+
+        self.assertEqual(catalog.get_eligible_ids(ELIGIBLE_WITH_FLAG), sorted([self.country.id, european.id, asian.id]))
+        self.assertEqual(catalog.get_eligible_ids(ELIGIBLE_WITH_FLAG, ["EU", "AS", "EU"]), [european.id, asian.id])
+        self.assertEqual(catalog.get_eligible_ids(ELIGIBLE_WITH_CAPITAL), [self.country.id, european.id])
+        self.assertEqual(catalog.get_eligible_ids(ELIGIBLE_WITH_CAPITAL, ["AS", "OC"]), [])
+        self.assertEqual(catalog.get_eligible_ids(None, ["EU"]), [without_flag.id, european.id])
+        self.assertEqual(catalog.countries_by_id[asian.id].iso2_code, "XA")
+
+    def test_masks(self):
+        other = CountryFactory(iso2_code="XO", iso3_code="XOX")
+        catalog = country_catalog.get()
+
+        mask = catalog.get_mask([other.id, self.country.id, 0])
+
+        self.assertEqual(mask.bit_count(), 2)
+        self.assertEqual(catalog.get_ids(mask), [self.country.id, other.id])
+        self.assertTrue(catalog.is_in_mask(other.id, mask))
+        self.assertFalse(catalog.is_in_mask(other.id, mask & ~catalog.get_mask([other.id])))
+        self.assertFalse(catalog.is_in_mask(0, mask))
+        self.assertEqual(
+            catalog.get_ids(catalog.get_eligible_mask(ELIGIBLE_WITH_FLAG) & mask), [self.country.id, other.id]
+        )
+        self.assertEqual(catalog.get_ids(0), [])
+
+    def test_loaded_once(self):
+        country_catalog.get()
+
+        with self.assertNumQueries(0):
+            country_catalog.get().get_country("GL")
+
+    def test_rebuilt_on_country_save(self):
+        country_catalog.get()
+
+        self.country.name_en = "Kalaallit Nunaat"
+        self.country.save()
+
+        self.assertEqual(country_catalog.get().get_country("GL").names["en"], "Kalaallit Nunaat")
+
+    def test_rebuilt_on_capital_change(self):
+        country_catalog.get()
+
+        second_capital = CityFactory(is_capital=True)
+        self.country.cities.add(second_capital)
+
+        self.assertCountEqual(country_catalog.get().get_country("GL").capital_ids, [self.city.id, second_capital.id])
+
+        second_capital.is_capital = False
+        second_capital.save()
+
+        self.assertEqual(country_catalog.get().get_country("GL").capital_ids, (self.city.id,))
+
+    def test_rebuilt_on_country_delete(self):
+        country = CountryFactory(iso2_code="IS", iso3_code="ISL")
+        self.assertIsNotNone(country_catalog.get().get_country("IS"))
+
+        country.delete()
+
+        self.assertIsNone(country_catalog.get().get_country("IS"))
+
+    def test_reloaded_when_changed_by_another_process(self):
+        catalog = CountryCatalog()
+        catalog.get()
+
+        # Another process changed the catalog
+        cache.set(CountryCatalog.VERSION_CACHE_KEY, "new-version")
+
+        with self.assertNumQueries(0):
+            catalog.get()
+
+        with patch.object(CountryCatalog, "VERSION_CHECK_SECONDS", 0), self.assertNumQueries(3):
+            catalog.get()
+
+    async def test_aget(self):
+        catalog = await country_catalog.aget()
+
+        self.assertEqual(catalog.get_country("GL").id, self.country.id)
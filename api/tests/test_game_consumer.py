@@ -1,11 +1,15 @@
-from unittest.mock import MagicMock, patch
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from channels.routing import URLRouter
 from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
 from django.test import TransactionTestCase, override_settings
 
-from api.consumers import GameConsumer
+from api.consumers import AsyncGameConsumer, GameConsumer
+from api.question_log import QuestionLog
 from api.routing import websocket_urlpatterns
+from api.session_state import session_state_store
 from core.models.user_country_score import GameModes
 from core.tests.factories import UserFactory
 from core.tests.mocks import MockGameService
@@ -170,6 +174,41 @@ class GameConsumerTestCase(TransactionTestCase):
             response["payload"]["correctAnswer"][0]["wikipediaLink"], "https://fr.wikipedia.org/wiki/Allemagne"
         )
 
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "consumer-test-cache",
+            }
+        }
+    )
+    @patch("api.consumers.GameServiceRegistry.get_game_service", return_value=MockGameService())
+    async def test_disconnect_saves_unsaved_answers(self, _mock_get_game_service):
+        communicator = WebsocketCommunicator(self.application, self.url)
+        await communicator.connect()
+        await communicator.send_json_to(
+            {
+                "type": "user_accept",
+                "gameMode": GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE,
+                "gameToken": "disconnect-token",
+                "token": self.token,
+                "language": "fr",
+            }
+        )
+        await communicator.receive_json_from()  # auth
+        await communicator.receive_json_from()  # questions
+        await communicator.send_json_to({"type": "answer_submission", "id": 1, "answer": "DE"})
+        await communicator.receive_json_from()
+
+        self.assertEqual(await session_state_store.aget("disconnect-token", [QuestionLog.COUNT_FIELD]), {})
+
+        await communicator.disconnect()
+
+        self.assertEqual(
+            await session_state_store.aget("disconnect-token", [QuestionLog.COUNT_FIELD]), {QuestionLog.COUNT_FIELD: 0}
+        )
+        await cache.aclear()
+
     async def test_receive_json_invalid_type_raises(self):
         consumer = GameConsumer()
         consumer.scope = {"type": "websocket"}
@@ -199,3 +238,90 @@ class GameConsumerTestCase(TransactionTestCase):
         )
 
         self.assertEqual(consumer.session_id, game_token)
+
+
+@override_settings(GAME_EXECUTION_MODE="pool")
+class PooledGameConsumerTestCase(GameConsumerTestCase):
+    """
+    Run the same protocol tests with the sync handlers on the game executor.
+    """
+
+    @patch("api.consumers.GameServiceRegistry.get_game_service")
+    async def test_answers_of_a_connection_are_handled_in_order(self, mock_get_game_service):
+        mock_service = MockGameService(check_answer_result=True)
+        check_answer_result = mock_service.check_answer.return_value
+        handler_threads = []
+
+        def check_answer(*args, **kwargs):
+            handler_threads.append(threading.current_thread().name)
+            return check_answer_result
+
+        mock_service.check_answer.side_effect = check_answer
+        mock_get_game_service.return_value = mock_service
+
+        communicator = WebsocketCommunicator(self.application, self.url)
+        await communicator.connect()
+        await communicator.send_json_to(
+            {
+                "type": "user_accept",
+                "gameMode": GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE,
+                "gameToken": "dummy-token",
+                "token": self.token,
+                "language": "fr",
+            }
+        )
+        await communicator.receive_json_from()  # auth
+        await communicator.receive_json_from()  # questions
+
+        for question_id in range(5):
+            await communicator.send_json_to({"type": "answer_submission", "id": question_id, "answer": "DE"})
+
+        received_ids = [(await communicator.receive_json_from())["payload"]["id"] for _ in range(5)]
+        self.assertEqual(received_ids, list(range(5)))
+        # Run by the game executor, not by the thread shared by the sync consumers
+        self.assertEqual(len(handler_threads), 5)
+        self.assertTrue(all(name.startswith("game_") for name in handler_threads), handler_threads)
+        await communicator.disconnect()
+
+
+class AsyncGameConsumerTestCase(GameConsumerTestCase):
+    """
+    Run the same protocol tests against the async consumer route.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.url = "/ws/game/async/"
+
+    async def test_receive_json_invalid_type_raises(self):
+        consumer = AsyncGameConsumer()
+        consumer.scope = {"type": "websocket"}
+        consumer.channel_name = "test_channel"
+        consumer.send_json = AsyncMock()
+
+        with self.assertRaises(ValueError) as context:
+            await consumer.receive_json({"type": "invalid_type"})
+
+        self.assertIn("Unknown message type", str(context.exception))
+
+    @patch("api.consumers.GameServiceRegistry.get_game_service", return_value=MockGameService())
+    async def test_game_token_set_to_session_id(self, _mock_get_game_service):
+        consumer = AsyncGameConsumer()
+        consumer.scope = {"type": "websocket"}
+        consumer.channel_name = "test_channel"
+        consumer.send_json = AsyncMock()
+
+        game_token = "very-real-token"
+        await consumer.receive_json(
+            {
+                "type": "user_accept",
+                "gameMode": GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE,
+                "gameToken": game_token,
+                "token": self.token,
+                "language": "fr",
+            }
+        )
+
+        self.assertEqual(consumer.session_id, game_token)
+        self.assertEqual(consumer.game_session.session_id, game_token)
+        _mock_get_game_service.return_value.aget_questions.assert_awaited_once_with(consumer.game_session)
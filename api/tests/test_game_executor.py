@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from api.game_executor import GameExecutor
+
+
+@override_settings(GAME_EXECUTOR_MAX_WORKERS=2)
+class GameExecutorTest(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.executor = GameExecutor()
+        self.addCleanup(self.executor.shutdown)
+
+    async def test_run_returns_result_from_pool_thread(self):
+        main_thread = threading.get_ident()
+
+        result = await self.executor.run(lambda value: (value, threading.get_ident()), 42)
+
+        self.assertEqual(result[0], 42)
+        self.assertNotEqual(result[1], main_thread)
+
+    async def test_queue_depth_counts_waiting_handlers(self):
+        release = threading.Event()
+        started = threading.Semaphore(0)
+
+        def blocking():
+            started.release()
+            release.wait(timeout=5)
+
+        tasks = [asyncio.ensure_future(self.executor.run(blocking)) for _ in range(3)]
+        # Both workers are busy, the third handler waits for a thread
+        for _ in range(2):
+            await asyncio.to_thread(started.acquire, timeout=5)
+
+        self.assertEqual(self.executor.stats(), {"queue_depth": 1, "running": 2, "max_workers": 2})
+
+        release.set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(self.executor.queue_depth, 0)
+        self.assertEqual(self.executor.running, 0)
+
+    async def test_run_propagates_exceptions(self):
+        def failing():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            await self.executor.run(failing)
+
+        self.assertEqual(self.executor.stats()["queue_depth"], 0)
+
+    def test_submitted_tasks_are_counted(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait(timeout=5)
+
+        future = self.executor.submit(blocking)
+        started.wait(timeout=5)
+
+        self.assertEqual(self.executor.running, 1)
+
+        release.set()
+        future.result(timeout=5)
+        self.assertEqual(self.executor.running, 0)
+
+    @override_settings(GAME_EXECUTOR_STATS_LOG_SECONDS=0.01)
+    def test_stats_logged_periodically(self):
+        with self.assertLogs("api.game_executor", level="INFO") as logs:
+            self.executor.get_executor()
+            deadline = time.monotonic() + 5
+            while not logs.output and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        self.assertIn("'queue_depth': 0", logs.output[0])
@@ -0,0 +1,114 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from api.game_session import GameSession
+from api.question_log import QuestionLog
+from api.session_state import session_state_store
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "isolated-test-cache",
+        }
+    }
+)
+class GameSessionTest(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.session_id = uuid4()
+
+    def tearDown(self):
+        super().tearDown()
+        cache.clear()
+
+    def test_load_new_session(self):
+        session = GameSession.load(self.session_id)
+
+        self.assertEqual(session.session_id, self.session_id)
+        self.assertFalse(session.user.is_authenticated)
+        self.assertIsNone(session.continents)
+        self.assertEqual(session.streak, 0)
+        self.assertEqual(session.questions.entries, {})
+
+    def test_save_and_resume(self):
+        session = GameSession(self.session_id, continents=["EU"], questions=QuestionLog({0: "FR", 1: "DE"}))
+        session.save()
+
+        resumed = GameSession.load(self.session_id)
+
+        self.assertEqual(resumed.continents, ["EU"])
+        self.assertEqual(resumed.questions.entries, {0: "FR", 1: "DE"})
+
+    def test_answers_are_written_only_at_checkpoints(self):
+        session = GameSession(self.session_id, questions=QuestionLog({0: ([1, 2], [], "ZA")}))
+        session.save()
+
+        for found_capitals in range(1, GameSession.CHECKPOINT_INTERVAL):
+            session.questions[0] = ([1, 2], list(range(found_capitals)), "ZA")
+            session.answer_recorded()
+
+        self.assertTrue(session.has_unsaved_changes)
+        self.assertEqual(GameSession.load(self.session_id).questions[0], [[1, 2], [], "ZA"])
+
+        session.answer_recorded()
+
+        self.assertFalse(session.has_unsaved_changes)
+        self.assertEqual(GameSession.load(self.session_id).questions[0], [[1, 2], list(range(9)), "ZA"])
+
+    def test_forced_checkpoint(self):
+        session = GameSession(self.session_id, questions=QuestionLog({0: "FR"}))
+
+        session.answer_recorded(force_checkpoint=True)
+
+        self.assertEqual(GameSession.load(self.session_id).questions.entries, {0: "FR"})
+
+    def test_streak_is_stored_on_every_answer(self):
+        session = GameSession(self.session_id)
+
+        self.assertEqual(
+            session.update_streak(is_correct=True, remaining_to_guess=0, is_challenge=False), (1, False, None)
+        )
+        self.assertEqual(
+            session.update_streak(is_correct=True, remaining_to_guess=0, is_challenge=False), (2, False, None)
+        )
+
+        self.assertEqual(session.streak, 2)
+        self.assertFalse(session.has_unsaved_changes)
+        self.assertEqual(GameSession.load(self.session_id).streak, 2)
+
+    def test_delete(self):
+        GameSession(self.session_id, continents=["EU"], questions=QuestionLog({0: "FR"})).save()
+
+        GameSession(self.session_id).delete()
+
+        self.assertIsNone(cache.get(session_state_store.get_key(self.session_id)))
+
+    @override_settings(GAME_QUESTION_LOG_RETENTION=2)
+    def test_resume_keeps_only_retained_questions(self):
+        session = GameSession(self.session_id)
+        session.questions.append("FR")
+        session.save()
+        session.questions.append("DE")
+        session.questions.append("IT")
+        session.save()
+
+        resumed = GameSession.load(self.session_id)
+
+        self.assertEqual(resumed.questions.entries, {1: "DE", 2: "IT"})
+        self.assertEqual(resumed.questions.append("ES"), 3)
+        self.assertNotIn(QuestionLog.get_field(0), cache.get(session_state_store.get_key(self.session_id)))
+
+    async def test_async_save_and_resume(self):
+        session = GameSession(self.session_id, questions=QuestionLog({0: "FR"}))
+        await session.aupdate_streak(is_correct=True, remaining_to_guess=0, is_challenge=False)
+        await session.aanswer_recorded(force_checkpoint=True)
+
+        resumed = await GameSession.aload(self.session_id)
+
+        self.assertEqual(resumed.streak, 1)
+        self.assertEqual(resumed.questions.entries, {0: "FR"})
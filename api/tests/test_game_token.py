@@ -0,0 +1,40 @@
+import time
+from unittest.mock import patch
+
+from django.test import override_settings
+
+from api.game_session import GameUser
+from api.game_token import game_token_check, game_token_issue
+from core.models.user_country_score import GameModes
+from flagora.tests.base import FlagoraTestCase
+
+GAME_MODE = GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE
+
+
+@override_settings(GAME_TOKEN_MAX_AGE_SECONDS=60)
+class GameTokenTest(FlagoraTestCase):
+    def test_check_valid_token(self):
+        token = game_token_issue(self.user, GAME_MODE)
+
+        with self.assertNumQueries(0):
+            game_user = game_token_check(token, GAME_MODE)
+
+        self.assertEqual(game_user, GameUser.from_user(self.user))
+
+    def test_check_other_game_mode(self):
+        token = game_token_issue(self.user, GAME_MODE)
+
+        self.assertIsNone(game_token_check(token, GameModes.GUESS_COUNTRY_FROM_FLAG_CHALLENGE_COMBO))
+
+    def test_check_expired_token(self):
+        token = game_token_issue(self.user, GAME_MODE)
+
+        with patch("django.core.signing.time.time", return_value=time.time() + 61):
+            self.assertIsNone(game_token_check(token, GAME_MODE))
+
+    def test_check_tampered_token(self):
+        token = game_token_issue(self.user, GAME_MODE)
+
+        self.assertIsNone(game_token_check(token[:-1] + ("a" if token[-1] != "a" else "b"), GAME_MODE))
+        self.assertIsNone(game_token_check("not-a-token", GAME_MODE))
+        self.assertIsNone(game_token_check(None, GAME_MODE))
@@ -0,0 +1,300 @@
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.db import IntegrityError, OperationalError
+from django.test import override_settings
+from django.utils import timezone
+from freezegun import freeze_time
+
+from api.guess_recorder import GuessRecorder, PendingGuess, guess_recorder
+from core.models import Guess, UserCountryScore
+from core.models.user_country_score import GameModes
+from core.tests.factories import CountryFactory, UserCountryScoreFactory, UserFactory
+from flagora.tests.base import FlagoraTestCase
+
+GAME_MODE = GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE
+
+
+@override_settings(GUESS_RECORDER_BATCH_SIZE=100, GUESS_RECORDER_FLUSH_SECONDS=60)
+class GuessRecorderTest(FlagoraTestCase):
+    def setUp(self):
+        super().setUp()
+        self.recorder = GuessRecorder(key="guess_recorder_test")
+        self.recorder.clear()
+        self.addCleanup(self.recorder.clear)
+        self.other_country = CountryFactory(iso2_code="IS", iso3_code="ISL")
+
+    def test_guesses_are_queued(self):
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+
+        self.assertEqual(self.recorder.pending_count, 1)
+        self.assertEqual(Guess.objects.count(), 0)
+        # Shared by the workers
+        self.assertEqual(GuessRecorder(key=self.recorder.key).pending_count, 1)
+
+    def test_pending_guess_serialization(self):
+        guess = PendingGuess(self.user.id, self.country.id, GAME_MODE, True, attempts=2)
+
+        self.assertEqual(PendingGuess.loads(guess.dumps()), guess)
+
+    def test_flush_writes_a_batch(self):
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, False)
+        self.recorder.record(self.user.id, self.other_country.id, GAME_MODE, True)
+
+        # Savepoint, users, countries, scores upsert, written guesses, guesses insert, scores, decayed totals update,
+        # release
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(9):
+            self.assertEqual(self.recorder.flush(), 3)
+
+        self.assertEqual(self.recorder.pending_count, 0)
+        score = UserCountryScore.objects.get(user=self.user, country=self.country, game_mode=GAME_MODE)
+        self.assertEqual(sorted(score.user_guesses.values_list("is_correct", flat=True)), [False, True])
+        other_score = UserCountryScore.objects.get(user=self.user, country=self.other_country, game_mode=GAME_MODE)
+        self.assertEqual(other_score.user_guesses.count(), 1)
+
+    def test_guesses_leave_the_queue_once_committed(self):
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.recorder.flush()
+
+        self.assertEqual(Guess.objects.count(), 1)
+        self.assertEqual(self.recorder.pending_count, 1)
+
+        callbacks[0]()
+
+        self.assertEqual(self.recorder.pending_count, 0)
+
+    def test_flush_of_a_player(self):
+        other_user = UserFactory(username="other", email="other@example.com")
+        other_game_mode = GameModes.GUESS_CAPITAL_FROM_COUNTRY_TRAINING_INFINITE
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+        self.recorder.record(self.user.id, self.country.id, other_game_mode, True)
+        self.recorder.record(other_user.id, self.country.id, GAME_MODE, True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.recorder.flush(user_id=self.user.id, game_mode=GAME_MODE), 1)
+
+        self.assertEqual(self.recorder.pending_count, 2)
+        self.assertEqual(Guess.objects.get().score.user, self.user)
+
+    def test_flush_updates_existing_score(self):
+        score = UserCountryScoreFactory(user=self.user, country=self.country, game_mode=GAME_MODE)
+        previous_updated_at = UserCountryScore.objects.get(pk=score.pk).updated_at
+
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+        self.recorder.flush()
+
+        self.assertEqual(UserCountryScore.objects.count(), 1)
+        score.refresh_from_db()
+        self.assertEqual(score.user_guesses.count(), 1)
+        self.assertGreater(score.updated_at, previous_updated_at)
+
+    def test_guesses_keep_their_recording_time(self):
+        answered_at = timezone.now() - timedelta(minutes=10)
+        with freeze_time(answered_at):
+            self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+
+        self.recorder.flush()
+
+        score = UserCountryScore.objects.get(user=self.user, country=self.country, game_mode=GAME_MODE)
+        self.assertEqual(score.user_guesses.get().created_at, answered_at)
+        self.assertEqual(score.last_guess_at, answered_at)
+        self.assertEqual(score.updated_at, answered_at)
+
+    def test_flush_updates_decayed_totals(self):
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, False)
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+        self.recorder.flush()
+
+        score = UserCountryScore.objects.get(user=self.user, country=self.country, game_mode=GAME_MODE)
+        self.assertEqual(score.last_guess_at, score.user_guesses.latest("created_at").created_at)
+        self.assertAlmostEqual(score.decayed_total, 2, places=3)
+        self.assertAlmostEqual(score.decayed_failures, 1, places=3)
+
+    def test_flush_empty_queue(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.recorder.flush(), 0)
+
+    @override_settings(GUESS_RECORDER_BATCH_SIZE=2)
+    def test_flush_on_batch_size(self):
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+        self.assertEqual(Guess.objects.count(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+
+        self.assertEqual(Guess.objects.count(), 2)
+        self.assertEqual(self.recorder.pending_count, 0)
+
+    @override_settings(GUESS_RECORDER_FLUSH_SECONDS=0.01)
+    def test_flush_thread(self):
+        flushed = threading.Event()
+
+        with patch.object(self.recorder, "flush", side_effect=lambda: flushed.set()) as mock_flush:
+            self.recorder.start()
+            self.assertTrue(flushed.wait(5))
+
+            # The connection of the test must stay open
+            with patch("api.guess_recorder.close_old_connections"):
+                self.recorder.stop()
+            mock_flush.reset_mock()
+            flushed.clear()
+
+            # Stopped
+            self.assertFalse(flushed.wait(0.05))
+
+    def test_stop_writes_the_queue(self):
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+
+        with patch("api.guess_recorder.close_old_connections"):
+            self.recorder.stop()
+
+        self.assertEqual(Guess.objects.count(), 1)
+
+    def test_batch_written_twice_is_not_duplicated(self):
+        batch = [PendingGuess(self.user.id, self.country.id, GAME_MODE, True)]
+
+        GuessRecorder._write(batch)
+        GuessRecorder._write(batch)
+
+        self.assertEqual(Guess.objects.count(), 1)
+        score = UserCountryScore.objects.get()
+        self.assertEqual(score.user_guesses.count(), 1)
+        self.assertEqual(score.decayed_total, 1)
+
+    def test_guesses_of_deleted_rows_are_dropped(self):
+        deleted_user = UserFactory(username="deleted", email="deleted@example.com")
+        self.recorder.record(deleted_user.id, self.country.id, GAME_MODE, True)
+        self.recorder.record(self.user.id, self.other_country.id, GAME_MODE, True)
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+        deleted_user.delete()
+        self.other_country.delete()
+
+        with self.captureOnCommitCallbacks(execute=True), self.assertLogs("api.guess_recorder", "WARNING"):
+            self.assertEqual(self.recorder.flush(), 1)
+
+        self.assertEqual(self.recorder.pending_count, 0)
+        self.assertEqual(Guess.objects.get().score.country, self.country)
+
+    def test_failing_score_does_not_hold_back_the_others(self):
+        write = GuessRecorder._write
+
+        def write_unless_other_country(batch):
+            if any(guess.country_id == self.other_country.id for guess in batch):
+                raise IntegrityError
+            return write(batch)
+
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+        self.recorder.record(self.user.id, self.other_country.id, GAME_MODE, True)
+
+        with (
+            patch.object(GuessRecorder, "_write", side_effect=write_unless_other_country),
+            self.captureOnCommitCallbacks(execute=True),
+            self.assertLogs("api.guess_recorder"),
+        ):
+            self.assertEqual(self.recorder.flush(), 1)
+
+        self.assertEqual(self.recorder.pending_count, 1)
+        self.assertEqual(Guess.objects.get().score.country, self.country)
+
+    def test_failed_guesses_are_dead_lettered_after_max_attempts(self):
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+
+        with patch.object(GuessRecorder, "_write", side_effect=RuntimeError), self.assertLogs("api.guess_recorder"):
+            for _ in range(GuessRecorder.MAX_ATTEMPTS - 1):
+                self.recorder.flush()
+            self.assertEqual(self.recorder.pending_count, 1)
+
+            with self.assertLogs("api.guess_recorder", "ERROR") as logs:
+                self.recorder.flush()
+
+        self.assertEqual(self.recorder.pending_count, 0)
+        self.assertIn("Moved 1 guesses", logs.output[-1])
+        [dead_letter] = self.recorder.dead_letters()
+        self.assertEqual((dead_letter.user_id, dead_letter.attempts), (self.user.id, GuessRecorder.MAX_ATTEMPTS))
+
+    def test_unavailable_database_is_not_an_attempt(self):
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+
+        with patch.object(GuessRecorder, "_write", side_effect=OperationalError), self.assertLogs("api.guess_recorder"):
+            self.assertEqual(self.recorder.flush(), 0)
+
+        [(_, guess)] = self.recorder._read()
+        self.assertEqual(guess.attempts, 0)
+
+    def test_failed_batch_is_queued_again(self):
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+
+        with patch.object(GuessRecorder, "_write", side_effect=RuntimeError), self.assertLogs("api.guess_recorder"):
+            self.assertEqual(self.recorder.flush(), 0)
+
+        self.assertEqual(self.recorder.pending_count, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.recorder.flush(), 1)
+        self.assertEqual(Guess.objects.count(), 1)
+        self.assertEqual(self.recorder.pending_count, 0)
+
+    def test_queued_guesses_of_the_player_are_written_before_selecting_questions(self):
+        from api.services.user_country_score import UserCountryScoreService
+
+        guess_recorder.clear()
+        self.addCleanup(guess_recorder.clear)
+        other_user = UserFactory(username="other", email="other@example.com")
+        guess_recorder.record(self.user.id, self.country.id, GAME_MODE, False)
+        guess_recorder.record(other_user.id, self.country.id, GAME_MODE, False)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserCountryScoreService(self.user, GAME_MODE).compute_questions(last_question=None)
+
+        # The guesses of the other players are left to the batches
+        self.assertEqual(guess_recorder.pending_count, 1)
+        self.assertEqual(Guess.objects.filter(score__user=self.user).count(), 1)
+        self.assertEqual(Guess.objects.count(), 1)
+
+    async def test_async_record_and_flush(self):
+        await self.recorder.arecord(self.user.id, self.country.id, GAME_MODE, True)
+
+        self.assertEqual(await self.recorder.aflush(), 1)
+        self.assertEqual(await Guess.objects.acount(), 1)
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "isolated-test-cache",
+        }
+    },
+    GUESS_RECORDER_BATCH_SIZE=100,
+)
+class CacheGuessRecorderTest(FlagoraTestCase):
+    def setUp(self):
+        super().setUp()
+        self.recorder = GuessRecorder(key="guess_recorder_test")
+        self.addCleanup(self.recorder.clear)
+
+    def test_record_and_flush(self):
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+        self.assertEqual(self.recorder.pending_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.recorder.flush(), 1)
+
+        self.assertEqual(self.recorder.pending_count, 0)
+        self.assertEqual(Guess.objects.count(), 1)
+
+    def test_dead_letters(self):
+        self.recorder.record(self.user.id, self.country.id, GAME_MODE, True)
+
+        with (
+            patch.object(GuessRecorder, "MAX_ATTEMPTS", 1),
+            patch.object(GuessRecorder, "_write", side_effect=RuntimeError),
+        ):
+            with self.assertLogs("api.guess_recorder", "ERROR"):
+                self.recorder.flush()
+
+        self.assertEqual(self.recorder.pending_count, 0)
+        self.assertEqual(len(self.recorder.dead_letters()), 1)
@@ -0,0 +1,60 @@
+from django.test import SimpleTestCase, override_settings
+
+from api.question_log import QuestionLog
+
+
+@override_settings(GAME_QUESTION_LOG_RETENTION=3)
+class QuestionLogTest(SimpleTestCase):
+    def test_append_returns_next_index(self):
+        questions = QuestionLog()
+
+        self.assertEqual(questions.append("FR"), 0)
+        self.assertEqual(questions.append("DE"), 1)
+        self.assertEqual(questions.get(1), "DE")
+        self.assertEqual(questions.last(), "DE")
+
+    def test_last_of_empty_log(self):
+        self.assertIsNone(QuestionLog().last())
+
+    def test_oldest_questions_are_dropped_past_retention(self):
+        questions = QuestionLog()
+        for iso2_code in ["FR", "DE", "IT", "ES", "PT"]:
+            questions.append(iso2_code)
+
+        self.assertEqual(questions.entries, {2: "IT", 3: "ES", 4: "PT"})
+        self.assertNotIn(0, questions)
+        self.assertEqual(questions.next_index, 5)
+
+    def test_update_unknown_question_raises(self):
+        questions = QuestionLog({0: "FR"})
+
+        with self.assertRaises(KeyError):
+            questions[1] = "DE"
+
+    def test_changes_since_last_save(self):
+        questions = QuestionLog({0: (["1"], [], "FR")})
+        questions.mark_saved()
+
+        questions[0] = (["1"], ["1"], "FR")
+        questions.append("DE")
+        questions.append("IT")
+        questions.append("ES")
+
+        values, deleted_fields = questions.get_changes()
+
+        self.assertEqual(
+            values,
+            {"question:1": '"DE"', "question:2": '"IT"', "question:3": '"ES"', QuestionLog.COUNT_FIELD: 4},
+        )
+        self.assertEqual(deleted_fields, ["question:0"])
+
+        questions.mark_saved()
+        self.assertEqual(questions.get_changes(), ({QuestionLog.COUNT_FIELD: 4}, []))
+
+    def test_from_stored_data(self):
+        self.assertEqual(QuestionLog.get_retained_fields(5), ["question:2", "question:3", "question:4"])
+
+        questions = QuestionLog.from_stored_data(5, {"question:3": '[[1,2],[1],"ZA"]', "question:4": '"FR"'})
+
+        self.assertEqual(questions.entries, {3: [[1, 2], [1], "ZA"], 4: "FR"})
+        self.assertEqual(questions.append("DE"), 5)
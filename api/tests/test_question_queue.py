@@ -0,0 +1,172 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from api.country_catalog import country_catalog
+from api.question_queue import QuestionQueue, question_queue
+from api.services.user_country_score import UserCountryScoreService
+from core.models.user_country_score import GameModes
+from core.tests.factories import CountryFactory
+from flagora.tests.base import FlagoraTestCase
+
+
+def run_inline(func):
+    func()
+
+
+class QuestionQueueTest(SimpleTestCase):
+    """
+    Run against the Redis cache configured in the settings.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.queue = QuestionQueue()
+        self.key = self.queue.get_key(1, GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE, ["EU", "AF"])
+
+    def tearDown(self):
+        super().tearDown()
+        cache.delete(self.key)
+        cache.delete(f"{self.key}:refill")
+        cache.delete(f"{self.key}:generation")
+
+    def test_key_ignores_continents_order(self):
+        self.assertEqual(
+            self.key, self.queue.get_key(1, GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE, ["AF", "EU"])
+        )
+
+    def test_pop_in_order(self):
+        self.queue.replace(self.key, [3, 1, 2])
+
+        self.assertEqual(self.queue.pop(self.key, 2), ([3, 1], 1))
+        self.assertEqual(self.queue.pop(self.key, 2), ([2], 0))
+        self.assertEqual(self.queue.pop(self.key, 2), ([], 0))
+
+    def test_replace_drops_previous_ids(self):
+        self.queue.replace(self.key, [1, 2])
+        self.queue.replace(self.key, [4])
+
+        self.assertEqual(self.queue.pop(self.key, 5), ([4], 0))
+
+    def test_remove(self):
+        self.queue.replace(self.key, [1, 2, 3])
+
+        self.queue.remove(self.key, 2)
+        self.queue.remove(self.key, 5)
+
+        self.assertEqual(self.queue.pop(self.key, 5), ([1, 3], 0))
+
+    def test_remove_bumps_the_generation(self):
+        generation = self.queue.get_generation(self.key)
+
+        self.queue.remove(self.key, 2)
+
+        self.assertEqual(self.queue.get_generation(self.key), generation + 1)
+        self.assertFalse(self.queue.replace(self.key, [1], generation))
+        self.assertTrue(self.queue.replace(self.key, [1], generation + 1))
+        self.assertEqual(self.queue.pop(self.key, 5), ([1], 0))
+
+    @patch.object(QuestionQueue, "submit", side_effect=run_inline)
+    def test_refill_computed_before_an_answer_is_dropped(self, mock_submit):
+        self.queue.replace(self.key, [1, 2])
+
+        def refill():
+            # Answered while the refill is computed, before its guess is written
+            self.queue.remove(self.key, 5)
+            return [5, 6]
+
+        self.assertTrue(self.queue.schedule_refill(self.key, refill))
+
+        self.assertEqual(self.queue.pop(self.key, 5), ([1, 2], 0))
+        self.assertIsNone(cache.get(f"{self.key}:refill"))
+
+    @patch.object(QuestionQueue, "submit", side_effect=run_inline)
+    def test_schedule_refill(self, mock_submit):
+        self.assertTrue(self.queue.schedule_refill(self.key, lambda: [5, 6]))
+
+        self.assertEqual(self.queue.pop(self.key, 5), ([5, 6], 0))
+        # The lock is released once refilled
+        self.assertIsNone(cache.get(f"{self.key}:refill"))
+
+    @patch.object(QuestionQueue, "submit")
+    def test_schedule_refill_once_at_a_time(self, mock_submit):
+        self.assertTrue(self.queue.schedule_refill(self.key, lambda: [5]))
+        self.assertFalse(self.queue.schedule_refill(self.key, lambda: [6]))
+
+        mock_submit.assert_called_once()
+
+    @patch.object(QuestionQueue, "submit", side_effect=run_inline)
+    def test_failed_refill_releases_lock(self, mock_submit):
+        def refill():
+            raise ValueError
+
+        with self.assertLogs("api.question_queue", level="ERROR"):
+            self.queue.schedule_refill(self.key, refill)
+
+        self.assertIsNone(cache.get(f"{self.key}:refill"))
+
+
+@override_settings(GAME_QUESTION_QUEUE_SIZE=4, GAME_QUESTION_QUEUE_LOW_WATER_MARK=1)
+@patch.object(QuestionQueue, "submit", side_effect=run_inline)
+class QueuedQuestionsTest(FlagoraTestCase):
+    def setUp(self):
+        super().setUp()
+        self.countries = [self.country] + [
+            CountryFactory(iso2_code=f"Q{index}", iso3_code=f"QQ{index}") for index in range(5)
+        ]
+        country_catalog.get()
+        self.service = UserCountryScoreService(self.user, GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE)
+        self.key = self.service.get_queue_key()
+
+    def tearDown(self):
+        super().tearDown()
+        cache.delete(self.key)
+        cache.delete(f"{self.key}:refill")
+        cache.delete(f"{self.key}:generation")
+
+    def test_empty_queue_is_computed_and_refilled(self, mock_submit):
+        questions = self.service.queued_questions(2, last_question=None)
+
+        self.assertEqual(len(questions), 2)
+        country_ids, remaining = question_queue.pop(self.key, 10)
+        self.assertEqual(len(country_ids), 4)
+        # The questions just asked are not queued again
+        self.assertFalse({country.id for country in questions} & set(country_ids))
+
+    def test_questions_popped_from_queue(self, mock_submit):
+        question_queue.replace(self.key, [country.id for country in self.countries[:4]])
+
+        with self.assertNumQueries(1):
+            questions = self.service.queued_questions(2, last_question=None)
+
+        self.assertEqual(questions, self.countries[:2])
+        mock_submit.assert_not_called()
+        self.assertEqual(question_queue.pop(self.key, 10), ([country.id for country in self.countries[2:4]], 0))
+
+    def test_short_queue_is_completed_by_the_scheduler(self, mock_submit):
+        question_queue.replace(self.key, [self.countries[3].id])
+
+        questions = self.service.queued_questions(3, last_question=None)
+
+        self.assertEqual(len(questions), 3)
+        self.assertEqual(questions[0], self.countries[3])
+        self.assertEqual(len({country.id for country in questions}), 3)
+
+    def test_refill_at_low_water_mark(self, mock_submit):
+        question_queue.replace(self.key, [country.id for country in self.countries[:3]])
+
+        questions = self.service.queued_questions(2, last_question=None)
+
+        self.assertEqual(questions, self.countries[:2])
+        mock_submit.assert_called_once()
+        country_ids, _ = question_queue.pop(self.key, 10)
+        self.assertEqual(len(country_ids), 4)
+        self.assertFalse({country.id for country in questions} & set(country_ids))
+
+    def test_last_question_not_asked_first(self, mock_submit):
+        question_queue.replace(self.key, [country.id for country in self.countries[:4]])
+
+        questions = self.service.queued_questions(2, last_question=self.countries[0].iso2_code)
+
+        self.assertEqual(questions, [self.countries[1], self.countries[0]])
@@ -1,12 +1,18 @@
 from unittest.mock import patch
 from uuid import uuid4
 
-from django.contrib.auth.models import AnonymousUser
 from django.contrib.sessions.models import Session
 from django.core.cache import cache
 from django.test import override_settings
 from django.utils import timezone
 
+from api.country_catalog import country_catalog
+from api.game_session import ANONYMOUS_GAME_USER, GameSession, GameUser
+from api.game_token import game_token_issue
+from api.guess_recorder import guess_recorder
+from api.question_log import QuestionLog
+from api.question_queue import question_queue
+from api.session_state import session_state_store
 from api.services.game_modes.challenge_modes.game_guess_country_from_flag import (
     GameServiceGuessCountryFromFlagChallengeCombo,
 )
@@ -17,7 +23,7 @@ from api.services.game_modes.training_modes.game_guess_country_from_flag import
     GameServiceGuessCountryFromFlagTrainingInfinite,
 )
 from core.models import Guess, UserCountryScore, UserStats
-from core.tests.factories import CountryFactory
+from core.tests.factories import CityFactory, CountryFactory
 from flagora.tests.base import FlagoraTestCase
 
 
@@ -38,6 +44,7 @@ class GameServiceTest(FlagoraTestCase):
         self.session_id = uuid4()
         self.session_token = uuid4()
         self._create_mock_session(self.session_token, self.user.id)
+        self.game_session = GameSession(self.session_id)
 
         self.game_service = GameServiceGuessCountryFromFlagTrainingInfinite
 
@@ -56,35 +63,56 @@ class GameServiceTest(FlagoraTestCase):
         super().tearDown()
         cache.clear()
 
-    def _set_cache(self, index, country_iso2_code):
-        cache.set(self.session_id, {index: country_iso2_code})
+    def _set_questions(self, index, country_iso2_code):
+        self.game_session.questions = QuestionLog({index: country_iso2_code})
+
+    def _set_streak(self, streak):
+        session_state_store.set(self.session_id, {"streak": streak})
+        self.game_session.streak = streak
 
     def test_user_accept_success(self):
-        result = self.game_service.user_accept(self.session_id, self.session_token)
-        cached_user_id = cache.get(f"{self.session_id}_user_id")
+        result = self.game_service.user_accept(self.game_session, self.session_token, ["EU"])
 
         self.assertTrue(result)
-        self.assertEqual(cached_user_id, self.user.id)
+        self.assertEqual(self.game_session.user, GameUser.from_user(self.user))
+        self.assertEqual(self.game_session.continents, ["EU"])
 
     def test_user_accept_invalid_session(self):
         fake_token = uuid4()
-        result = self.game_service.user_accept(self.session_id, fake_token)
-        cached_user_id = cache.get(f"{self.session_id}_user_id")
+        result = self.game_service.user_accept(self.game_session, fake_token)
 
         self.assertFalse(result)
-        self.assertIsNone(cached_user_id)
+        self.assertFalse(self.game_session.user.is_authenticated)
+
+    def test_user_accept_game_token(self):
+        token = game_token_issue(self.user, self.game_service.GAME_MODE)
+
+        # Only the best streak
+        with self.assertNumQueries(1):
+            result = self.game_service.user_accept(self.game_session, token)
+
+        self.assertTrue(result)
+        self.assertEqual(self.game_session.user, GameUser.from_user(self.user))
 
-    def test_user_get_authenticated_user(self):
-        cache.set(f"{self.session_id}_user_id", self.user.id)
-        user = self.game_service.user_get(self.session_id)
+    def test_user_accept_game_token_of_other_mode(self):
+        token = game_token_issue(self.user, GameServiceGuessCountryFromFlagChallengeCombo.GAME_MODE)
 
-        self.assertTrue(user.is_authenticated)
-        self.assertEqual(user.id, self.user.id)
+        self.assertFalse(self.game_service.user_accept(self.game_session, token))
 
-    def test_user_get_anonymous_user(self):
-        # No user present in cache
-        user = self.game_service.user_get(self.session_id)
-        self.assertFalse(user.is_authenticated)
+    def test_user_accept_loads_best_streak(self):
+        UserStats.objects.create(user=self.user, game_mode=self.game_service.GAME_MODE, best_streak=7)
+
+        self.game_service.user_accept(self.game_session, self.session_token)
+
+        self.assertEqual(self.game_session.best_streak, 7)
+        self.assertEqual(self.game_session.game_mode, self.game_service.GAME_MODE)
+
+    def test_user_accept_does_not_write_cache(self):
+        # Session, user and best streak
+        with self.assertNumQueries(3):
+            self.game_service.user_accept(self.game_session, self.session_token)
+
+        self.assertEqual(session_state_store.get(self.session_id, ["continents"]), {})
 
     @patch("api.services.user_country_score.UserCountryScoreService.compute_questions")
     @patch("api.flag_store.flag_store.get_path")
@@ -92,44 +120,75 @@ class GameServiceTest(FlagoraTestCase):
         mock_compute_questions.return_value = [self.country]
         mock_get_path.return_value = "/mock/path/to/flag.svg"
 
-        result = self.game_service.get_questions(self.session_id)
+        result = self.game_service.get_questions(self.game_session)
 
         self.assertIn(0, result.questions)
         self.assertEqual(result.questions[0], "/mock/path/to/flag.svg")
 
-        # Check the internal cache structure (used for answer validation)
-        questions_with_answers = cache.get(self.session_id)
-        self.assertEqual(questions_with_answers[0], self.country.iso2_code)
+        # Check the internal session structure (used for answer validation)
+        self.assertEqual(self.game_session.questions[0], self.country.iso2_code)
+        # New questions are a checkpoint
+        self.assertEqual(GameSession.load(self.session_id).questions.entries, {0: self.country.iso2_code})
 
     def test_check_answer_correct(self):
-        self._set_cache(0, self.country.iso2_code)
+        self._set_questions(0, self.country.iso2_code)
+        self.game_session.user = GameUser.from_user(self.user)
 
-        is_correct, country = self.game_service.check_answer(self.session_id, 0, self.country.iso2_code, self.user)
+        is_correct, country = self.game_service.check_answer(self.game_session, 0, self.country.iso2_code)
 
         self.assertTrue(is_correct)
         self.assertEqual(country.iso2_code, self.country.iso2_code)
 
     def test_check_answer_incorrect(self):
-        self._set_cache(0, self.country.iso2_code)
+        self._set_questions(0, self.country.iso2_code)
+        self.game_session.user = GameUser.from_user(self.user)
 
-        is_correct, country = self.game_service.check_answer(self.session_id, 0, "FR", self.user)
+        is_correct, country = self.game_service.check_answer(self.game_session, 0, "FR")
 
         self.assertFalse(is_correct)
         self.assertEqual(country.iso2_code, self.country.iso2_code)
 
+    def test_check_answer_makes_no_catalog_query(self):
+        self._set_questions(0, self.country.iso2_code)
+        country_catalog.get()
+
+        with self.assertNumQueries(0):
+            is_correct, country = self.game_service.check_answer(self.game_session, 0, self.country.iso2_code)
+            self.game_service.get_correct_answer(GameUser.from_user(self.user), country, "en")
+
+        self.assertTrue(is_correct)
+
+    @override_settings(GAME_QUESTION_QUEUE_SIZE=30)
+    def test_check_answer_removes_country_from_question_queue(self):
+        self._set_questions(0, self.country.iso2_code)
+        self.game_session.user = GameUser.from_user(self.user)
+        queue_key = question_queue.get_key(self.user.id, self.game_service.GAME_MODE, None)
+        question_queue.replace(queue_key, [self.country.id, self.country.id + 1])
+
+        self.game_service.check_answer(self.game_session, 0, self.country.iso2_code)
+
+        self.assertEqual(question_queue.pop(queue_key, 10), ([self.country.id + 1], 0))
+
     def test_check_answer_invalid_index(self):
-        self._set_cache(0, self.country.iso2_code)
+        self._set_questions(0, self.country.iso2_code)
+        self.game_session.user = GameUser.from_user(self.user)
 
-        is_correct, country = self.game_service.check_answer(self.session_id, 1, "FR", self.user)
+        is_correct, country = self.game_service.check_answer(self.game_session, 1, "FR")
 
         self.assertFalse(is_correct)
         self.assertIsNone(country)
 
     def test_guess_register(self):
+        # Guesses queued by other tests would count towards the batch size
+        guess_recorder.clear()
         self.assertEqual(UserCountryScore.objects.count(), 0)
         self.assertEqual(Guess.objects.count(), 0)
 
-        self.game_service.guess_register(self.user, is_correct=True, country=self.country)
+        self.game_service.guess_register(GameUser.from_user(self.user), is_correct=True, country=self.country)
+
+        # Queued until the next batch
+        self.assertEqual(Guess.objects.count(), 0)
+        guess_recorder.flush()
 
         self.assertEqual(UserCountryScore.objects.count(), 1)
         self.assertEqual(Guess.objects.count(), 1)
@@ -140,105 +199,149 @@ class GameServiceTest(FlagoraTestCase):
         self.assertTrue(score.user_guesses.first().is_correct)
 
     def test_user_get_streak_score_no_remaining(self):
-        cache.set(f"{self.session_id}_user_streak", 2)  # current streak is 2
+        self._set_streak(2)  # current streak is 2
 
         (
             current_score,
             game_over,
             best_streak,
-        ) = self.game_service.user_get_streak_score(self.session_id, self.user, is_correct=True, remaining_to_guess=0)
+        ) = self.game_service.user_get_streak_score(self.game_session, is_correct=True, remaining_to_guess=0)
 
         self.assertEqual(current_score, 3)
         self.assertFalse(game_over)
         self.assertEqual(best_streak, None)  # beast streak only if failure
-        self.assertEqual(cache.get(f"{self.session_id}_user_streak"), 3)
+        self.assertEqual(self.game_session.streak, 3)
 
     def test_user_get_streak_score_with_remaining(self):
-        cache.set(f"{self.session_id}_user_streak", 2)  # the current streak is 2
+        self._set_streak(2)  # the current streak is 2
 
         (
             current_score,
             game_over,
             best_streak,
-        ) = self.game_service.user_get_streak_score(self.session_id, self.user, is_correct=True, remaining_to_guess=1)
+        ) = self.game_service.user_get_streak_score(self.game_session, is_correct=True, remaining_to_guess=1)
 
         self.assertEqual(current_score, 2)  # score is not incremented as we have remaining to guess
         self.assertFalse(game_over)
         self.assertEqual(best_streak, None)  # beast streak only if failure
-        self.assertEqual(cache.get(f"{self.session_id}_user_streak"), 2)
+        self.assertEqual(self.game_session.streak, 2)
 
     def test_user_get_streak_score_incorrect(self):
-        cache.set(f"{self.session_id}_user_streak", 2)  # the current streak is 2
+        self._set_streak(2)  # the current streak is 2
 
         # unauthenticated user
-        user = AnonymousUser()
+        self.game_session.user = ANONYMOUS_GAME_USER
 
         # training mode, no game over
         (
             current_score,
             game_over,
             best_streak,
-        ) = self.game_service.user_get_streak_score(self.session_id, user, is_correct=False, remaining_to_guess=1)
+        ) = self.game_service.user_get_streak_score(self.game_session, is_correct=False, remaining_to_guess=1)
 
         self.assertEqual(current_score, 0)  # score is reset to 0
         self.assertFalse(game_over)
         self.assertEqual(best_streak, None)
-        self.assertEqual(cache.get(f"{self.session_id}_user_streak"), 0)
+        self.assertEqual(self.game_session.streak, 0)
 
         # challenge mode, game over
-        cache.set(f"{self.session_id}_user_streak", 2)  # reset streak
+        self._set_streak(2)  # reset streak
         game_service = GameServiceGuessCountryFromFlagChallengeCombo
         (
             current_score,
             game_over,
             best_streak,
-        ) = game_service.user_get_streak_score(self.session_id, user, is_correct=False, remaining_to_guess=1)
+        ) = game_service.user_get_streak_score(self.game_session, is_correct=False, remaining_to_guess=1)
 
         self.assertEqual(current_score, 2)  # score is not incremented
         self.assertTrue(game_over)
         self.assertEqual(best_streak, None)
-        self.assertEqual(cache.get(f"{self.session_id}_user_streak"), 2)
+        self.assertEqual(self.game_session.streak, 2)
 
     def test_user_get_streak_score_authenticated_user(self):
+        self.game_session.user = GameUser.from_user(self.user)
+        self.game_service.load_best_streak(self.game_session)
         # No best streak stored yet, should create one
-        cache.set(f"{self.session_id}_user_streak", 9)
+        self._set_streak(9)
         (
             current_score,
             game_over,
             best_streak,
-        ) = self.game_service.user_get_streak_score(self.session_id, self.user, is_correct=False, remaining_to_guess=1)
+        ) = self.game_service.user_get_streak_score(self.game_session, is_correct=False, remaining_to_guess=1)
 
         self.assertEqual(current_score, 0)
         self.assertFalse(game_over)  # training mode, no game over
         self.assertEqual(best_streak, 9)  # new best streak
-        self.assertEqual(cache.get(f"{self.session_id}_user_streak"), 0)  # training, streak reset to 0
+        self.assertEqual(self.game_session.streak, 0)  # training, streak reset to 0
+        # Written with the session
+        self.assertFalse(UserStats.objects.exists())
+        self.game_session.save()
         created_stats = UserStats.objects.get(user=self.user, game_mode=self.game_service.GAME_MODE)
         self.assertEqual(created_stats.best_streak, 9)
 
         # Take the previous best streak into account
-        cache.set(f"{self.session_id}_user_streak", 2)
+        self._set_streak(2)
         (
             current_score,
             game_over,
             best_streak,
-        ) = self.game_service.user_get_streak_score(self.session_id, self.user, is_correct=False, remaining_to_guess=1)
+        ) = self.game_service.user_get_streak_score(self.game_session, is_correct=False, remaining_to_guess=1)
         self.assertEqual(current_score, 0)
         self.assertEqual(best_streak, 9)  # got the already stored best streak
-        self.assertEqual(cache.get(f"{self.session_id}_user_streak"), 0)  # training, streak reset to 0
+        self.assertEqual(self.game_session.streak, 0)  # training, streak reset to 0
 
         # Combo has another best streak
-        cache.set(f"{self.session_id}_user_streak", 4)
+        self._set_streak(4)
         game_service = GameServiceGuessCountryFromFlagChallengeCombo
         UserStats.objects.create(user=self.user, game_mode=game_service.GAME_MODE, best_streak=10)
+        game_service.load_best_streak(self.game_session)
         (
             current_score,
             game_over,
             best_streak,
-        ) = game_service.user_get_streak_score(self.session_id, self.user, is_correct=False, remaining_to_guess=1)
+        ) = game_service.user_get_streak_score(self.game_session, is_correct=False, remaining_to_guess=1)
         self.assertEqual(current_score, 4)
         self.assertTrue(game_over)
         self.assertEqual(best_streak, 10)
-        self.assertEqual(cache.get(f"{self.session_id}_user_streak"), 4)  # game over, streak reset to 0
+        self.assertEqual(self.game_session.streak, 4)  # game over, streak reset to 0
+
+    def test_user_get_streak_score_does_not_query_the_best_streak(self):
+        UserStats.objects.create(user=self.user, game_mode=self.game_service.GAME_MODE, best_streak=3)
+        self.game_session.user = GameUser.from_user(self.user)
+        self.game_service.load_best_streak(self.game_session)
+        self._set_streak(2)
+
+        with self.assertNumQueries(0):
+            _, _, best_streak = self.game_service.user_get_streak_score(
+                self.game_session, is_correct=False, remaining_to_guess=0
+            )
+
+        self.assertEqual(best_streak, 3)
+        self.assertFalse(self.game_session.has_unsaved_changes)
+
+    def test_new_best_streak_is_saved_with_the_answer(self):
+        self.game_session.user = GameUser.from_user(self.user)
+        self.game_service.load_best_streak(self.game_session)
+        self._set_streak(4)
+        self.game_service.user_get_streak_score(self.game_session, is_correct=False, remaining_to_guess=0)
+
+        self.game_session.answer_recorded()
+
+        self.assertEqual(UserStats.objects.get(user=self.user, game_mode=self.game_service.GAME_MODE).best_streak, 4)
+        self.assertFalse(self.game_session.has_unsaved_changes)
+
+    def test_best_streak_saved_from_another_tab_is_kept(self):
+        self.game_session.user = GameUser.from_user(self.user)
+        self.game_service.load_best_streak(self.game_session)
+        self._set_streak(4)
+        self.game_service.user_get_streak_score(self.game_session, is_correct=False, remaining_to_guess=0)
+
+        # Another tab saved a better streak in the meantime
+        UserStats.objects.create(user=self.user, game_mode=self.game_service.GAME_MODE, best_streak=6)
+        self.game_session.save()
+
+        self.assertEqual(UserStats.objects.get().best_streak, 6)
+        self.assertFalse(self.game_session.has_unsaved_changes)
 
     def test_should_cache_all_questions_at_session_start_when_in_challenge_mode(self):
         from core.models import Country
@@ -250,15 +353,16 @@ class GameServiceTest(FlagoraTestCase):
 
         session_id = uuid4()
 
-        GameServiceGuessCountryFromFlagChallengeCombo.get_questions(session_id)
+        GameServiceGuessCountryFromFlagChallengeCombo.get_questions(GameSession(session_id))
 
-        cached_data = cache.get(session_id)
+        cached_data = GameSession.load(session_id).questions.entries
 
         self.assertEqual(len(cached_data), 2)
         self.assertIn(0, cached_data)
         self.assertIn(1, cached_data)
 
-    def test_should_send_all_questions_at_once_in_challenge_mode(self):
+    @override_settings(GAME_CHALLENGE_CHUNK_SIZE=10)
+    def test_should_send_questions_by_chunk_in_challenge_mode(self):
         from core.models import Country
 
         Country.objects.all().delete()
@@ -286,16 +390,96 @@ class GameServiceTest(FlagoraTestCase):
 
         session_id = uuid4()
 
-        response = GameServiceGuessCountryFromFlagChallengeCombo.get_questions(session_id)
-        self.assertEqual(len(response.questions), 15)
+        response = GameServiceGuessCountryFromFlagChallengeCombo.get_questions(GameSession(session_id))
+        self.assertEqual(list(response.questions), list(range(10)))
+
+        # The deck is resumed from the session state store
+        session = GameSession.load(session_id)
+        response = GameServiceGuessCountryFromFlagChallengeCombo.get_questions(session)
+        self.assertEqual(list(response.questions), list(range(10, 15)))
+
+        response = GameServiceGuessCountryFromFlagChallengeCombo.get_questions(session)
+        self.assertEqual(response.questions, {})
+
+        self.assertCountEqual(session.questions.entries.values(), iso2_codes)
 
     def test_get_last_question(self):
         iso2_code = self.city.countries.first().iso2_code
-        questions_with_answer = {0: iso2_code}
-        result = self.game_service.get_last_question(questions_with_answer)
+        questions = QuestionLog({0: "FR", 1: iso2_code})
+        result = self.game_service.get_last_question(questions)
 
         self.assertEqual(result, iso2_code)
 
+    async def test_auser_accept_success(self):
+        result = await self.game_service.auser_accept(self.game_session, self.session_token, ["EU"])
+
+        self.assertTrue(result)
+        self.assertEqual(self.game_session.user, GameUser.from_user(self.user))
+        self.assertEqual(self.game_session.continents, ["EU"])
+
+    async def test_auser_accept_game_token(self):
+        token = game_token_issue(self.user, self.game_service.GAME_MODE)
+
+        result = await self.game_service.auser_accept(self.game_session, token)
+
+        self.assertTrue(result)
+        self.assertEqual(self.game_session.user, GameUser.from_user(self.user))
+
+    async def test_auser_accept_invalid_session(self):
+        result = await self.game_service.auser_accept(self.game_session, uuid4())
+
+        self.assertFalse(result)
+        self.assertFalse(self.game_session.user.is_authenticated)
+
+    @patch("api.services.user_country_score.UserCountryScoreService.compute_questions")
+    @patch("api.flag_store.flag_store.aget_path")
+    async def test_aget_questions(self, mock_aget_path, mock_compute_questions):
+        mock_compute_questions.return_value = [self.country]
+        mock_aget_path.return_value = "/mock/path/to/flag.svg"
+
+        result = await self.game_service.aget_questions(self.game_session)
+
+        self.assertEqual(result.questions, {0: "/mock/path/to/flag.svg"})
+        self.assertEqual(GameSession.load(self.session_id).questions.entries, {0: self.country.iso2_code})
+
+    async def test_acheck_answer_registers_guess(self):
+        self._set_questions(0, self.country.iso2_code)
+        self.game_session.user = GameUser.from_user(self.user)
+
+        is_correct, country = await self.game_service.acheck_answer(self.game_session, 0, self.country.iso2_code)
+
+        self.assertTrue(is_correct)
+        self.assertEqual(country.iso2_code, self.country.iso2_code)
+        await guess_recorder.aflush()
+        self.assertEqual(await Guess.objects.filter(score__user=self.user, is_correct=True).acount(), 1)
+
+    @override_settings(GAME_QUESTION_QUEUE_SIZE=30)
+    async def test_acheck_answer_removes_country_from_question_queue(self):
+        self._set_questions(0, self.country.iso2_code)
+        self.game_session.user = GameUser.from_user(self.user)
+        queue_key = question_queue.get_key(self.user.id, self.game_service.GAME_MODE, None)
+        question_queue.replace(queue_key, [self.country.id])
+
+        await self.game_service.acheck_answer(self.game_session, 0, self.country.iso2_code)
+
+        self.assertEqual(question_queue.pop(queue_key, 10), ([], 0))
+
+    async def test_auser_get_streak_score_authenticated_user(self):
+        self._set_streak(5)
+        self.game_session.user = GameUser.from_user(self.user)
+        await self.game_service.aload_best_streak(self.game_session)
+
+        current_score, game_over, best_streak = await self.game_service.auser_get_streak_score(
+            self.game_session, is_correct=False, remaining_to_guess=0
+        )
+
+        self.assertEqual(current_score, 0)
+        self.assertFalse(game_over)
+        self.assertEqual(best_streak, 5)
+        await self.game_session.asave()
+        stats = await UserStats.objects.aget(user=self.user, game_mode=self.game_service.GAME_MODE)
+        self.assertEqual(stats.best_streak, 5)
+
 
 @override_settings(
     CACHES={
@@ -310,6 +494,7 @@ class GameServiceGuessCapitalFromCountryTest(FlagoraTestCase):
     def setUp(self):
         super().setUp()
         self.session_id = uuid4()
+        self.game_session = GameSession(self.session_id, user=GameUser.from_user(self.user))
 
         # Patch the compute_questions method to return our country
         patcher = patch("api.services.user_country_score.UserCountryScoreService.compute_questions")
@@ -317,54 +502,48 @@ class GameServiceGuessCapitalFromCountryTest(FlagoraTestCase):
         self.mock_compute_questions = patcher.start()
         self.mock_compute_questions.return_value = [self.country]
 
-        # Patch user_get
-        patcher_user = patch(
-            "api.services.game_modes.training_modes.game_guess_capital_from_country.GameServiceGuessCapitalFromCountryTrainingInfinite.user_get"
-        )
-        self.addCleanup(patcher_user.stop)
-        self.mock_user_get = patcher_user.start()
-        self.mock_user_get.return_value = self.user
-
     def test_get_questions_stores_correct_data_in_cache(self):
-        result = GameServiceGuessCapitalFromCountryTrainingInfinite.get_questions(self.session_id)
+        result = GameServiceGuessCapitalFromCountryTrainingInfinite.get_questions(self.game_session)
 
         self.assertIn(0, result.questions)
         self.assertEqual(result.questions[0], self.country.iso2_code)
 
-        cached_data = cache.get(self.session_id)
+        cached_data = GameSession.load(self.session_id).questions.entries
         self.assertIsNotNone(cached_data)
         self.assertIn(0, cached_data)
 
     def test_check_answer_correct(self):
-        GameServiceGuessCapitalFromCountryTrainingInfinite.get_questions(self.session_id)
+        GameServiceGuessCapitalFromCountryTrainingInfinite.get_questions(self.game_session)
         is_correct, country, remaining_cities = GameServiceGuessCapitalFromCountryTrainingInfinite.check_answer(
-            self.session_id,
+            self.game_session,
             0,
             self.city.pk,
-            self.user,
         )
         self.assertTrue(is_correct)
-        self.assertEqual(country, self.country)
+        self.assertEqual(country.id, self.country.id)
 
     def test_check_answer_incorrect(self):
-        GameServiceGuessCapitalFromCountryTrainingInfinite.get_questions(self.session_id)
+        GameServiceGuessCapitalFromCountryTrainingInfinite.get_questions(self.game_session)
         is_correct, country, remaining_cities = GameServiceGuessCapitalFromCountryTrainingInfinite.check_answer(
-            self.session_id, 0, 9889798798797987, self.user
+            self.game_session, 0, 9889798798797987
         )
         self.assertFalse(is_correct)
-        self.assertEqual(country, self.country)
+        self.assertEqual(country.id, self.country.id)
 
     def test_check_answer_invalid_question_index(self):
-        GameServiceGuessCapitalFromCountryTrainingInfinite.get_questions(self.session_id)
+        GameServiceGuessCapitalFromCountryTrainingInfinite.get_questions(self.game_session)
         is_correct, country, remaining_cities = GameServiceGuessCapitalFromCountryTrainingInfinite.check_answer(
-            self.session_id, 999, self.city.pk, self.user
+            self.game_session, 999, self.city.pk
         )
         self.assertFalse(is_correct)
         self.assertIsNone(country)
         self.assertEqual(remaining_cities, 0)
 
     def test_get_correct_answer(self):
-        result = GameServiceGuessCapitalFromCountryTrainingInfinite.get_correct_answer(self.user, self.country, "en")
+        country = country_catalog.get().get_country(self.country.iso2_code)
+        result = GameServiceGuessCapitalFromCountryTrainingInfinite.get_correct_answer(
+            GameUser.from_user(self.user), country, "en"
+        )
         self.assertEqual(len(result), 1)
         self.assertTrue(result[0].name.startswith(self.city.name_en))
         self.assertEqual(result[0].wikipedia_link, self.city.wikipedia_link_en)
@@ -375,23 +554,58 @@ class GameServiceGuessCapitalFromCountryTest(FlagoraTestCase):
         country2 = CountryFactory(name_en="Country2")
         country2.cities.add(self.city)
 
-        # Cache questions
-        questions_with_answer = {0: ([self.city.id], [], self.city.countries.first().iso2_code)}
-        cache.set(self.session_id, questions_with_answer)
+        self.game_session.questions = QuestionLog({0: ([self.city.id], [], self.city.countries.first().iso2_code)})
 
         with self.assertRaises(ValueError) as cm:
             GameServiceGuessCapitalFromCountryTrainingInfinite.check_answer(
-                session_id=self.session_id,
+                session=self.game_session,
                 question_index=0,
                 answer_submitted="SomeAnswer",
-                user=self.user,
             )
 
         self.assertIn("Multiple countries found for cities", str(cm.exception))
 
     def test_get_last_question(self):
         iso2_code = self.city.countries.first().iso2_code
-        questions_with_answer = {0: ([self.city.id], [], iso2_code)}
-        result = GameServiceGuessCapitalFromCountryTrainingInfinite.get_last_question(questions_with_answer)
+        questions = QuestionLog({0: ([self.city.id], [], iso2_code)})
+        result = GameServiceGuessCapitalFromCountryTrainingInfinite.get_last_question(questions)
 
         self.assertEqual(result, iso2_code)
+
+    def test_check_answer_keeps_question_after_first_of_multiple_capitals(self):
+        first_capital = CityFactory(is_capital=True)
+        second_capital = CityFactory(is_capital=True)
+        country = CountryFactory(iso2_code="ZA", iso3_code="ZAF", cities=[first_capital, second_capital])
+        self.mock_compute_questions.return_value = [country]
+        GameServiceGuessCapitalFromCountryTrainingInfinite.get_questions(self.game_session)
+
+        is_correct, _, remaining_cities = GameServiceGuessCapitalFromCountryTrainingInfinite.check_answer(
+            self.game_session, 0, first_capital.pk
+        )
+        self.assertTrue(is_correct)
+        self.assertEqual(remaining_cities, 1)
+
+        is_correct, found_country, remaining_cities = GameServiceGuessCapitalFromCountryTrainingInfinite.check_answer(
+            self.game_session, 0, second_capital.pk
+        )
+        self.assertTrue(is_correct)
+        self.assertEqual(found_country.id, country.id)
+        self.assertEqual(remaining_cities, 0)
+        self.assertEqual(self.game_session.questions[0][2], country.iso2_code)
+
+    async def test_acheck_answer_correct(self):
+        await GameServiceGuessCapitalFromCountryTrainingInfinite.aget_questions(self.game_session)
+        is_correct, country, remaining_cities = await GameServiceGuessCapitalFromCountryTrainingInfinite.acheck_answer(
+            self.game_session, 0, self.city.pk
+        )
+        self.assertTrue(is_correct)
+        self.assertEqual(country.id, self.country.id)
+
+    async def test_aget_correct_answer(self):
+        country = (await country_catalog.aget()).get_country(self.country.iso2_code)
+        result = await GameServiceGuessCapitalFromCountryTrainingInfinite.aget_correct_answer(
+            GameUser.from_user(self.user), country, "en"
+        )
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0].name, self.city.name_en)
+        self.assertEqual(result[0].wikipedia_link, self.city.wikipedia_link_en)
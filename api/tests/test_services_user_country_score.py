@@ -1,13 +1,19 @@
 import random
+from collections import Counter
 from datetime import timedelta
 from unittest.mock import patch
 
 from django.contrib.auth.models import AnonymousUser
+from django.test import override_settings
 from django.utils import timezone
 from freezegun import freeze_time
 
+from api.challenge_deck import ChallengeDeck
+from api.country_catalog import country_catalog
 from api.services.user_country_score import UserCountryScoreService
-from core.models import Country, Guess, UserCountryScore
+from api.weighted_sampling import weighted_sample
+from core.models import Country, Guess, GuessRollup, UserCountryScore
+from core.models.guess_rollup import RollupPeriods
 from core.models.user_country_score import GameModes
 from core.tests.factories import CityFactory, CountryFactory, GuessFactory, UserCountryScoreFactory
 from flagora.tests.base import FlagoraTestCase
@@ -98,7 +104,246 @@ class ComputeWeightTest(UserCountryScoreServiceTestCase):
         self.assertTrue(0 < result["weight"] < 1)
 
 
+class ComputeWeightsVectorizedTest(UserCountryScoreServiceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.service = UserCountryScoreService(self.user, GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE)
+
+    def test_same_results_as_compute_weight(self):
+        self.add_guesses([False, True, False])
+        for minutes_ago, guess in zip([3, 700, 50000], self.score.user_guesses.all()):
+            Guess.objects.filter(pk=guess.pk).update(created_at=self.now - timedelta(minutes=minutes_ago))
+        other_score = UserCountryScoreFactory(user=self.user, country=CountryFactory(iso2_code="IS", iso3_code="ISL"))
+        other_score.user_guesses.add(GuessFactory(is_correct=True))
+        # No guesses at all
+        UserCountryScoreFactory(user=self.user, country=CountryFactory(iso2_code="NO", iso3_code="NOR"))
+
+        scores = UserCountryScore.objects.filter(user=self.user).order_by("pk")
+        with freeze_time(self.now):
+            expected = [self.service.compute_weight(score) for score in scores]
+            result = self.service.compute_weights_vectorized(scores)
+
+        self.assertEqual(result, expected)
+
+    def test_guesses_loaded_in_one_query(self):
+        self.add_guesses([False, True])
+
+        # Scores with their country, guesses, guess rollups
+        with self.assertNumQueries(3):
+            self.service.compute_weights_vectorized(UserCountryScore.objects.all())
+
+    def test_no_scores(self):
+        self.assertEqual(self.service.compute_weights_vectorized(UserCountryScore.objects.none()), [])
+
+    @override_settings(GAME_WEIGHTING_ENGINE="numpy")
+    def test_selected_by_setting(self):
+        with patch.object(UserCountryScoreService, "compute_weights_vectorized", return_value=[]) as mock_vectorized:
+            self.service.compute_weights(UserCountryScore.objects.all())
+
+        mock_vectorized.assert_called_once()
+
+
+class ComputeWeightsTest(UserCountryScoreServiceTestCase):
+    def _add_scores(self, count, guesses_per_score):
+        for _ in range(count):
+            index = Country.objects.count()
+            iso2_code = f"X{chr(ord('A') + index)}"
+            UserCountryScoreFactory(
+                user=self.user,
+                country=CountryFactory(iso2_code=iso2_code, iso3_code=f"{iso2_code}X"),
+                user_guesses=GuessFactory.create_batch(guesses_per_score),
+            )
+
+    def test_same_results_as_compute_weight(self):
+        self.add_guesses([False, True, False])
+        self._add_scores(2, guesses_per_score=2)
+        service = UserCountryScoreService(self.user, GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE)
+
+        scores = UserCountryScore.objects.order_by("pk")
+        with freeze_time(self.now):
+            expected = [service.compute_weight(score) for score in scores]
+            result = service.compute_weights(scores)
+
+        self.assertEqual(result, expected)
+
+    def test_query_count_does_not_depend_on_history(self):
+        service = UserCountryScoreService(self.user, GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE)
+        self._add_scores(2, guesses_per_score=1)
+
+        # Scores with their country, guesses, guess rollups
+        with self.assertNumQueries(3):
+            service.compute_weights(UserCountryScore.objects.all())
+
+        self._add_scores(10, guesses_per_score=5)
+
+        with self.assertNumQueries(3):
+            service.compute_weights(UserCountryScore.objects.all())
+
+    @override_settings(GAME_WEIGHTING_ENGINE="totals")
+    def test_from_decayed_totals(self):
+        self._add_scores(2, guesses_per_score=3)
+        service = UserCountryScoreService(self.user, GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE)
+
+        # The guesses are not needed
+        with self.assertNumQueries(1):
+            result = service.compute_weights(UserCountryScore.objects.all())
+
+        self.assertEqual(len(result), 3)
+
+
+@override_settings(GAME_WEIGHTING_ENGINE="database")
+class DatabaseQuestionsTest(UserCountryScoreServiceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.service = UserCountryScoreService(
+            self.user, GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE, rng=random.Random(7)
+        )
+        self.score.game_mode = GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE
+        self.score.save()
+        self.add_guesses([False, True, False], spacing_minutes=700)
+        self.other_score = UserCountryScoreFactory(
+            user=self.user,
+            country=CountryFactory(iso2_code="IS", iso3_code="ISL"),
+            game_mode=GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE,
+            user_guesses=[GuessFactory(is_correct=True)],
+        )
+        Guess.objects.filter(score=self.other_score).update(created_at=self.now - timedelta(days=2))
+        GuessRollup.objects.create(
+            score=self.other_score,
+            period=RollupPeriods.WEEK,
+            bucket_start=self.now - timedelta(days=60),
+            guess_count=3,
+            correct_count=1,
+            decayed_failures=1.6,
+            decayed_total=2.5,
+            last_guess_at=self.now - timedelta(days=56),
+        )
+        # Only guessed by another user
+        self.unseen_country = CountryFactory(iso2_code="NO", iso3_code="NOR")
+        UserCountryScoreFactory(
+            country=self.unseen_country,
+            game_mode=GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE,
+            user_guesses=[GuessFactory(is_correct=False)],
+        )
+        UserCountryScore.objects.update(updated_at=self.now - timedelta(minutes=10))
+
+    def test_same_weights_as_compute_weights(self):
+        with freeze_time(self.now):
+            expected = {
+                result["country"].pk: result["weight"]
+                for result in self.service.compute_weights(UserCountryScore.objects.filter(user=self.user))
+            }
+            expected[self.unseen_country.pk] = self.service.get_default_weight(self.unseen_country)["weight"]
+            countries = self.service.annotate_database_weights(Country.objects.filter(pk__in=expected))
+
+        result = {country.pk: country.weight for country in countries}
+        self.assertEqual(result.keys(), expected.keys())
+        for country_id, weight in expected.items():
+            # compute_weight rounds the weights to 4 decimals
+            self.assertAlmostEqual(result[country_id], weight, places=4)
+
+    def test_old_guesses_do_not_underflow(self):
+        # Decays below the smallest float
+        self.score.user_guesses.add(GuessFactory(is_correct=False, created_at=self.now - timedelta(days=3000)))
+        GuessRollup.objects.create(
+            score=self.score,
+            period=RollupPeriods.DAY,
+            bucket_start=self.now - timedelta(days=3000),
+            guess_count=1,
+            correct_count=0,
+            decayed_failures=1.0,
+            decayed_total=1.0,
+            last_guess_at=self.now - timedelta(days=3000),
+        )
+
+        with freeze_time(self.now):
+            expected = self.service.compute_weight(self.score)
+            countries = list(self.service.annotate_database_weights(Country.objects.filter(pk=self.country.pk)))
+
+        self.assertAlmostEqual(countries[0].weight, expected["weight"], places=4)
+
+    def test_only_selection_fetched(self):
+        service = UserCountryScoreService(self.user, GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE)
+        country_catalog.get()
+
+        # Scores update times, weighted selection
+        with freeze_time(self.now), self.assertNumQueries(2):
+            questions = service.compute_questions(last_question=None)
+
+        self.assertCountEqual(questions, [self.country, self.other_score.country, self.unseen_country])
+
+    def test_respects_cooldown_and_excluded_countries(self):
+        UserCountryScore.objects.filter(pk=self.score.pk).update(updated_at=self.now)
+
+        with freeze_time(self.now):
+            questions = self.service.personalized_questions(
+                10, last_question=None, exclude_country_ids={self.unseen_country.pk}
+            )
+
+        self.assertEqual(questions, [self.other_score.country])
+
+    def test_reproducible_with_seeded_rng(self):
+        with freeze_time(self.now):
+            questions = self.service.compute_questions(last_question=None)
+            service = UserCountryScoreService(
+                self.user, GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE, rng=random.Random(7)
+            )
+            self.assertEqual(service.compute_questions(last_question=None), questions)
+
+    def test_same_selection_frequencies_as_weighted_sample(self):
+        """
+        The first picks of both implementations follow the weights: chi-squared test of their frequencies.
+        """
+        draws = 1000
+        with freeze_time(self.now):
+            scored_questions = self.service.compute_weights(UserCountryScore.objects.filter(user=self.user))
+            scored_questions.append(self.service.get_default_weight(self.unseen_country))
+            country_ids = {question["country"].pk for question in scored_questions}
+            database_picks = Counter(self.service.database_questions(country_ids, 1)[0].pk for _ in range(draws))
+        python_picks = Counter(
+            weighted_sample(
+                [question["country"].pk for question in scored_questions],
+                [question["weight"] for question in scored_questions],
+                1,
+                self.service.rng,
+            )[0]
+            for _ in range(draws)
+        )
+
+        total_weight = sum(question["weight"] for question in scored_questions)
+        for picks in (database_picks, python_picks):
+            chi_squared = sum(
+                (picks[question["country"].pk] - draws * question["weight"] / total_weight) ** 2
+                / (draws * question["weight"] / total_weight)
+                for question in scored_questions
+            )
+            # 3 countries: 2 degrees of freedom, p = 0.001
+            self.assertLess(chi_squared, 13.82)
+
+
 class ComputeQuestionsTest(UserCountryScoreServiceTestCase):
+    def test_cooldown_reduced_in_constant_queries(self):
+        UserCountryScore.objects.all().delete()
+        # Only countries seen 45 seconds ago, the cooldown must be reduced to 30 seconds
+        self.country.delete()
+        countries = [CountryFactory(iso2_code=f"Q{index}", iso3_code=f"QQ{index}") for index in range(3)]
+        for country in countries:
+            UserCountryScoreFactory(
+                user=self.user,
+                country=country,
+                game_mode=GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE,
+                user_guesses=[GuessFactory()],
+            )
+        UserCountryScore.objects.all().update(updated_at=self.now - timedelta(seconds=45))
+        country_catalog.get()
+
+        service = UserCountryScoreService(self.user, GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE)
+        # Scores update times, scores with their country, guesses, guess rollups
+        with freeze_time(self.now), self.assertNumQueries(4):
+            questions = service.compute_questions(last_question=None)
+
+        self.assertCountEqual(questions, countries)
+
     def test_compute_questions_weighted_random(self):
         # Add multiple scores
         UserCountryScore.objects.all().delete()
@@ -154,7 +399,7 @@ class ComputeQuestionsTest(UserCountryScoreServiceTestCase):
         no_guess_country = self.country
 
         # Patch compute_weight to make test predictable
-        mock_weight.side_effect = lambda score: {
+        mock_weight.side_effect = lambda score, guesses=None, rollups=None: {
             "user_country_score": score,
             "country": score.country,
             "weight": 1.0,
@@ -181,6 +426,39 @@ class ComputeQuestionsTest(UserCountryScoreServiceTestCase):
             result = service.compute_questions(last_question=None)
         self.assertEqual(len(result), 1)
 
+    def test_anonymous_questions_from_catalog(self):
+        for index in range(12):
+            CountryFactory(iso2_code=f"A{chr(65 + index)}", iso3_code=f"AA{chr(65 + index)}")
+        CountryFactory(iso2_code="ZZ", iso3_code="ZZZ", flag=None)
+        country_catalog.get()
+        service = UserCountryScoreService(
+            AnonymousUser(), GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE, rng=random.Random(3)
+        )
+
+        with self.assertNumQueries(0):
+            questions = service.compute_questions(last_question=None)
+
+        self.assertEqual(len(questions), 10)
+        self.assertEqual(len({question.id for question in questions}), 10)
+        self.assertNotIn("ZZ", [question.iso2_code for question in questions])
+
+    def test_challenge_questions_from_catalog(self):
+        country_catalog.get()
+        service = UserCountryScoreService(self.user, GameModes.GUESS_CAPITAL_FROM_COUNTRY_CHALLENGE_COMBO)
+
+        with self.assertNumQueries(0):
+            questions = service.compute_questions(last_question=None)
+
+        self.assertEqual([question.iso2_code for question in questions], [self.country.iso2_code])
+
+    async def test_acompute_questions_from_catalog(self):
+        await country_catalog.aget()
+        service = UserCountryScoreService(self.user, GameModes.GUESS_COUNTRY_FROM_FLAG_CHALLENGE_COMBO)
+
+        questions = await service.acompute_questions(last_question=None)
+
+        self.assertEqual([question.iso2_code for question in questions], [self.country.iso2_code])
+
     def test_compute_questions_no_user_guesses_in_challenge_mode(self):
         from core.models import Country
 
@@ -373,8 +651,10 @@ class ComputeQuestionsTest(UserCountryScoreServiceTestCase):
             questions = service.compute_questions(last_question=None)
 
         self.assertEqual(len(questions), 15)
+        # Catalog entries
+        question_ids = [question.id for question in questions]
         for country in countries:
-            self.assertIn(country, questions)
+            self.assertIn(country.id, question_ids)
 
     def test_should_return_questions_without_duplicates_when_requesting_questions_in_challenge_mode(self):
         from core.models import Country
@@ -404,8 +684,9 @@ class ComputeQuestionsTest(UserCountryScoreServiceTestCase):
         with freeze_time(self.now):
             questions = service.compute_questions(last_question=None)
 
-        self.assertIn(country_with_flag, questions)
-        self.assertNotIn(country_without_flag, questions)
+        question_ids = [question.id for question in questions]
+        self.assertIn(country_with_flag.id, question_ids)
+        self.assertNotIn(country_without_flag.id, question_ids)
 
     def test_should_respect_continent_filtering_when_requesting_all_questions_in_challenge_mode(self):
         from core.models import Country
@@ -422,12 +703,12 @@ class ComputeQuestionsTest(UserCountryScoreServiceTestCase):
         with freeze_time(self.now):
             questions = service.compute_questions(last_question=None)
 
-        self.assertIn(european_country, questions)
-        self.assertIn(asian_country, questions)
-        self.assertNotIn(african_country, questions)
+        question_ids = [question.id for question in questions]
+        self.assertIn(european_country.id, question_ids)
+        self.assertIn(asian_country.id, question_ids)
+        self.assertNotIn(african_country.id, question_ids)
 
-    @patch("api.services.user_country_score.random.shuffle")
-    def test_should_randomize_order_when_requesting_questions_in_challenge_mode(self, mock_shuffle):
+    def test_should_order_questions_by_deck_seed_when_requesting_questions_in_challenge_mode(self):
         from core.models import Country
 
         Country.objects.all().delete()
@@ -437,10 +718,39 @@ class ComputeQuestionsTest(UserCountryScoreServiceTestCase):
         CountryFactory(name_en="Spain", iso2_code="ES")
 
         service = UserCountryScoreService(self.user, GameModes.GUESS_COUNTRY_FROM_FLAG_CHALLENGE_COMBO)
+        deck = ChallengeDeck(seed=42)
         with freeze_time(self.now):
-            service.compute_questions(last_question=None)
+            questions = service.compute_questions(last_question=None, deck=deck)
+
+        country_ids = list(Country.objects.values_list("id", flat=True))
+        self.assertEqual([country.id for country in questions], ChallengeDeck(seed=42).get_order(country_ids))
+        self.assertEqual(deck.cursor, 3)
+
+    @override_settings(GAME_CHALLENGE_CHUNK_SIZE=2)
+    def test_should_return_next_chunk_of_the_deck_in_challenge_mode(self):
+        from core.models import Country
+
+        Country.objects.all().delete()
 
-        mock_shuffle.assert_called_once()
+        countries = [
+            CountryFactory(name_en="France", iso2_code="FR", iso3_code="FRA"),
+            CountryFactory(name_en="Germany", iso2_code="DE", iso3_code="DEU"),
+            CountryFactory(name_en="Spain", iso2_code="ES", iso3_code="ESP"),
+        ]
+
+        service = UserCountryScoreService(self.user, GameModes.GUESS_COUNTRY_FROM_FLAG_CHALLENGE_COMBO)
+        deck = ChallengeDeck()
+        with freeze_time(self.now):
+            first_chunk = service.compute_questions(last_question=None, deck=deck)
+            second_chunk = service.compute_questions(last_question=None, deck=deck)
+            last_chunk = service.compute_questions(last_question=None, deck=deck)
+
+        self.assertEqual(len(first_chunk), 2)
+        self.assertEqual(len(second_chunk), 1)
+        self.assertEqual(last_chunk, [])
+        self.assertCountEqual(
+            [question.id for question in first_chunk + second_chunk], [country.id for country in countries]
+        )
 
     @patch("random.random")
     @patch("api.services.user_country_score.UserCountryScoreService.compute_weight")
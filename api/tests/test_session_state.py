@@ -0,0 +1,161 @@
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from api.session_state import SessionStateStore, next_streak
+
+
+class SessionStateStoreRedisTest(SimpleTestCase):
+    """
+    Run against the Redis cache configured in the settings.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.store = SessionStateStore()
+        self.session_id = uuid4()
+        self.redis_key = cache.make_key(self.store.get_key(self.session_id))
+        self.client = cache._cache.get_client(self.redis_key, write=True)
+
+    def tearDown(self):
+        super().tearDown()
+        self.store.delete(self.session_id)
+
+    def test_fields_are_stored_in_one_hash(self):
+        self.store.set(self.session_id, {"continents": ["EU"], "streak": 3, "questions": {0: "FR"}})
+
+        self.assertEqual(self.client.type(self.redis_key), b"hash")
+        self.assertEqual(set(self.client.hkeys(self.redis_key)), {b"continents", b"streak", b"questions"})
+
+    def test_get_only_requested_fields(self):
+        self.store.set(self.session_id, {"continents": ["EU"], "streak": 3, "questions": {0: "FR"}})
+
+        self.assertEqual(
+            self.store.get(self.session_id, ["streak", "questions"]), {"streak": 3, "questions": {0: "FR"}}
+        )
+
+    def test_get_missing_fields(self):
+        self.store.set(self.session_id, {"streak": 0})
+
+        self.assertEqual(self.store.get(self.session_id, ["streak", "questions"]), {"streak": 0})
+        self.assertEqual(self.store.get(uuid4(), ["streak"]), {})
+
+    def test_set_keeps_other_fields(self):
+        self.store.set(self.session_id, {"continents": ["EU"], "streak": 3})
+        self.store.set(self.session_id, {"streak": 4})
+
+        self.assertEqual(self.store.get(self.session_id, ["continents", "streak"]), {"continents": ["EU"], "streak": 4})
+
+    def test_read_refreshes_ttl(self):
+        self.store.set(self.session_id, {"streak": 1})
+        self.client.expire(self.redis_key, 10)
+
+        self.store.get(self.session_id, ["streak"])
+
+        self.assertGreater(self.client.ttl(self.redis_key), 10)
+        self.assertLessEqual(self.client.ttl(self.redis_key), self.store.TIMEOUT_SECONDS)
+
+    def test_delete_removes_all_fields(self):
+        self.store.set(self.session_id, {"continents": ["EU"], "streak": 3, "questions": {0: "FR"}})
+
+        self.store.delete(self.session_id)
+
+        self.assertFalse(self.client.exists(self.redis_key))
+        self.assertEqual(self.store.get(self.session_id, ["continents", "streak", "questions"]), {})
+
+    def test_update_streak_matches_next_streak(self):
+        for current_streak, is_correct, remaining_to_guess, is_challenge in itertools.product(
+            [0, 3], [True, False], [0, 1], [True, False]
+        ):
+            with self.subTest(
+                current_streak=current_streak,
+                is_correct=is_correct,
+                remaining_to_guess=remaining_to_guess,
+                is_challenge=is_challenge,
+            ):
+                self.store.set(self.session_id, {"streak": current_streak})
+
+                result = self.store.update_streak(self.session_id, is_correct, remaining_to_guess, is_challenge)
+
+                self.assertEqual(result, next_streak(current_streak, is_correct, remaining_to_guess, is_challenge))
+                self.assertEqual(self.store.get(self.session_id, ["streak"]), {"streak": result[0]})
+
+    def test_update_streak_of_new_session(self):
+        self.assertEqual(self.store.update_streak(self.session_id, True, 0, False), (1, False, None))
+        self.assertGreater(self.client.ttl(self.redis_key), 0)
+
+    def test_update_streak_leaves_ttl_to_writes(self):
+        self.store.set(self.session_id, {"streak": 1})
+        self.client.expire(self.redis_key, 10)
+
+        self.store.update_streak(self.session_id, True, 0, False)
+
+        self.assertLessEqual(self.client.ttl(self.redis_key), 10)
+
+    def test_streak_script_registered_once(self):
+        self.store.update_streak(self.session_id, True, 0, False)
+        script = self.store.get_update_streak_script(self.client)
+
+        self.store.update_streak(self.session_id, True, 0, False)
+
+        self.assertIs(self.store.get_update_streak_script(self.client), script)
+        self.assertEqual(self.store.get(self.session_id, ["streak"]), {"streak": 2})
+
+    def test_concurrent_streak_updates_are_not_lost(self):
+        # The first update loads the script
+        self.store.update_streak(self.session_id, True, 0, False)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: self.store.update_streak(self.session_id, True, 0, False), range(19)))
+
+        self.assertEqual(self.store.get(self.session_id, ["streak"]), {"streak": 20})
+
+    async def test_async_set_and_get(self):
+        await self.store.aset(self.session_id, {"streak": 2})
+
+        self.assertEqual(await self.store.aget(self.session_id, ["streak"]), {"streak": 2})
+
+        await self.store.adelete(self.session_id)
+
+        self.assertEqual(await self.store.aget(self.session_id, ["streak"]), {})
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "isolated-test-cache",
+        }
+    }
+)
+class SessionStateStoreFallbackTest(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.store = SessionStateStore()
+        self.session_id = uuid4()
+
+    def tearDown(self):
+        super().tearDown()
+        cache.clear()
+
+    def test_set_get_and_delete(self):
+        self.store.set(self.session_id, {"continents": ["EU"], "streak": 3})
+        self.store.set(self.session_id, {"streak": 4})
+
+        self.assertEqual(self.store.get(self.session_id, ["streak", "questions"]), {"streak": 4})
+        self.assertEqual(cache.get(self.store.get_key(self.session_id)), {"continents": ["EU"], "streak": 4})
+
+        self.store.delete(self.session_id)
+
+        self.assertEqual(self.store.get(self.session_id, ["continents", "streak"]), {})
+
+    def test_update_streak(self):
+        self.store.set(self.session_id, {"streak": 3})
+
+        self.assertEqual(self.store.update_streak(self.session_id, False, 0, True), (3, True, 3))
+        self.assertEqual(self.store.update_streak(self.session_id, False, 0, False), (0, False, 3))
+        self.assertEqual(self.store.get(self.session_id, ["streak"]), {"streak": 0})
@@ -0,0 +1,48 @@
+import random
+from collections import Counter
+
+from django.test import SimpleTestCase
+
+from api.weighted_sampling import weighted_sample
+
+
+class WeightedSampleTest(SimpleTestCase):
+    def test_picks_distinct_items(self):
+        sample = weighted_sample(["FR", "DE", "ES", "IT"], [1, 2, 3, 4], 3)
+
+        self.assertEqual(len(sample), 3)
+        self.assertEqual(len(set(sample)), 3)
+
+    def test_k_larger_than_items(self):
+        self.assertCountEqual(weighted_sample(["FR", "DE"], [1, 1], 10), ["FR", "DE"])
+        self.assertEqual(weighted_sample([], [], 10), [])
+
+    def test_items_without_weight_are_not_picked(self):
+        self.assertEqual(weighted_sample(["FR", "DE", "ES"], [0, 1, 0], 3), ["DE"])
+
+    def test_seeded_rng_is_reproducible(self):
+        items = list(range(100))
+        weights = [index + 1 for index in items]
+
+        self.assertEqual(
+            weighted_sample(items, weights, 10, random.Random(42)),
+            weighted_sample(items, weights, 10, random.Random(42)),
+        )
+
+    def test_picks_are_proportional_to_weights(self):
+        rng = random.Random(7)
+        weights = {"FR": 1, "DE": 2, "ES": 3}
+        trials = 30000
+
+        first_picks = Counter()
+        second_picks_after_es = Counter()
+        for _ in range(trials):
+            first, second = weighted_sample(list(weights), list(weights.values()), 2, rng)
+            first_picks[first] += 1
+            if first == "ES":
+                second_picks_after_es[second] += 1
+
+        for country, weight in weights.items():
+            self.assertAlmostEqual(first_picks[country] / trials, weight / 6, delta=0.01)
+        # Then proportional to the weights left
+        self.assertAlmostEqual(second_picks_after_es["DE"] / first_picks["ES"], 2 / 3, delta=0.02)
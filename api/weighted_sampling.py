@@ -0,0 +1,27 @@
+import heapq
+import math
+import random
+from collections.abc import Sequence
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+def weighted_sample(items: Sequence[T], weights: Sequence[float], k: int, rng: random.Random | None = None) -> list[T]:
+    """
+    Pick up to k distinct items, each pick being proportional to the weights of the items left, in pick order.
+    Items without a positive weight are never picked.
+
+    Each item gets a key -ln(u) / weight, with u uniform in (0, 1]: the item with the smallest key is the first pick,
+    and so on (Efraimidis-Spirakis). The k smallest keys are kept in a heap, in O(n log k).
+
+    Give a seeded rng for a reproducible sample.
+    """
+    get_random = rng.random if rng is not None else random.random
+    keyed_items = (
+        # 1 - random() is in (0, 1], its log is defined
+        (-math.log(1.0 - get_random()) / weight, index)  # nosec
+        for index, weight in enumerate(weights)
+        if weight > 0
+    )
+    return [items[index] for _, index in heapq.nsmallest(k, keyed_items)]
@@ -7,7 +7,16 @@ from django.utils.html import format_html
 from django.utils.translation import gettext as _
 from django.utils.translation import gettext_lazy
 
-from core.models import City, Country, Guess, User, UserCountryScore, UserPreferenceGameMode, UserStats
+from core.models import (
+    City,
+    Country,
+    Guess,
+    GuessRollup,
+    User,
+    UserCountryScore,
+    UserPreferenceGameMode,
+    UserStats,
+)
 from core.services.country_services import country_update
 
 
@@ -177,4 +186,11 @@ class UserCountryScoreAdmin(admin.ModelAdmin):
 
 @admin.register(Guess)
 class GuessAdmin(admin.ModelAdmin):
-    pass
+    list_display = ("score", "is_correct", "created_at")
+    raw_id_fields = ("score",)
+
+
+@admin.register(GuessRollup)
+class GuessRollupAdmin(admin.ModelAdmin):
+    list_filter = ("period",)
+    list_display = ("score", "period", "bucket_start", "guess_count", "correct_count")
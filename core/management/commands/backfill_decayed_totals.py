@@ -0,0 +1,56 @@
+import logging
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from core.models import Guess, GuessRollup, UserCountryScore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Compute the decayed totals of the user country scores from all their guesses and guess rollups."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Number of scores updated per transaction.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        updated_count = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                # Locked, not to lose the guesses written meanwhile
+                scores = list(
+                    UserCountryScore.objects.select_for_update().filter(pk__gt=last_id).order_by("pk")[:batch_size]
+                )
+                if not scores:
+                    break
+
+                self.backfill(scores)
+                updated_count += len(scores)
+                last_id = scores[-1].pk
+
+        logger.info(self.style.SUCCESS(f"Decayed totals computed for {updated_count} scores."))
+
+    @staticmethod
+    def backfill(scores: list[UserCountryScore]) -> None:
+        scores_by_id = {score.pk: score for score in scores}
+        for score in scores:
+            score.reset_decayed_totals()
+
+        # Guesses folded by compact_guesses
+        for rollup in GuessRollup.objects.filter(score_id__in=scores_by_id):
+            scores_by_id[rollup.score_id].add_rollup(rollup)
+
+        guesses = (
+            Guess.objects.filter(score_id__in=scores_by_id)
+            .order_by("created_at")
+            .values_list("score_id", "created_at", "is_correct")
+        )
+        for score_id, created_at, is_correct in guesses:
+            scores_by_id[score_id].add_guess(created_at, is_correct)
+
+        UserCountryScore.objects.bulk_update(scores, ["decayed_failures", "decayed_total", "last_guess_at"])
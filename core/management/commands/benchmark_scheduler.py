@@ -0,0 +1,285 @@
+import json
+import logging
+import math
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.country_catalog import country_catalog
+from api.game_session import ANONYMOUS_GAME_USER, GameUser
+from api.services.user_country_score import UserCountryScoreService
+from core.models import Guess, User, UserCountryScore
+from core.models.user_country_score import GameModes
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+USERNAME_PREFIX = "scheduler-bench"
+TRAINING_GAME_MODES = [
+    GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE,
+    GameModes.GUESS_CAPITAL_FROM_COUNTRY_TRAINING_INFINITE,
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the question scheduler (UserCountryScoreService.personalized_questions) on synthetic learners: "
+        "their guess histories are written in a transaction rolled back at the end, and the scheduler runs in it "
+        "with a frozen clock and a seeded random generator. Reports the latency percentiles, the query counts and "
+        "the distribution of the selected countries, and compares them with a previous report. Needs the countries "
+        "to be imported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1, help="Number of synthetic learners.")
+        parser.add_argument("--guesses", type=int, default=1000, help="Number of guesses in each learner history.")
+        parser.add_argument(
+            "--accuracy",
+            default="0.4:0.9",
+            help="Accuracy of the learners at the start and at the end of their history, e.g. 0.4:0.9.",
+        )
+        parser.add_argument("--continents", nargs="*", default=None, help="Continent codes the learners play with.")
+        parser.add_argument(
+            "--game-mode",
+            default=GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE,
+            choices=TRAINING_GAME_MODES,
+        )
+        parser.add_argument("--days", type=int, default=90, help="Time span of the histories, until the frozen clock.")
+        parser.add_argument("--runs", type=int, default=100, help="Number of scheduler runs per learner.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the histories and of the scheduler.")
+        parser.add_argument(
+            "--engine",
+            choices=["python", "numpy", "totals", "database"],
+            help="Weighting engine, GAME_WEIGHTING_ENGINE by default.",
+        )
+        parser.add_argument(
+            "--now",
+            default="2025-06-07T18:00:00+00:00",
+            help="Frozen clock of the scheduler runs, ISO 8601.",
+        )
+        parser.add_argument("--output", help="Write the report to this JSON file.")
+        parser.add_argument("--baseline", help="JSON report of a previous run to compare with.")
+
+    def handle(self, *args, **options):
+        try:
+            accuracy_start, accuracy_end = (float(value) for value in options["accuracy"].split(":"))
+            now = datetime.fromisoformat(options["now"])
+        except ValueError as e:
+            raise CommandError(f"Invalid option: {e}") from e
+        if timezone.is_naive(now):
+            now = timezone.make_aware(now)
+
+        rng = random.Random(options["seed"])  # nosec
+        game_mode = options["game_mode"]
+        continents = options["continents"] or None
+
+        catalog = country_catalog.get()
+        scheduler = UserCountryScoreService(ANONYMOUS_GAME_USER, game_mode, continents)
+        country_ids = sorted(scheduler.get_valid_country_ids(catalog))
+        if not country_ids:
+            raise CommandError("No country to play with: import the countries first.")
+
+        # Nothing is left in the database, whatever happens
+        with transaction.atomic():
+            learners = []
+            for index in range(options["users"]):
+                user = User.objects.create(
+                    username=f"{USERNAME_PREFIX}-{index}",
+                    email=f"{USERNAME_PREFIX}-{index}@example.com",
+                    language="en",
+                )
+                failure_rates = self.create_history(
+                    user,
+                    game_mode,
+                    country_ids,
+                    options["guesses"],
+                    (accuracy_start, accuracy_end),
+                    now - timedelta(days=options["days"]),
+                    now,
+                    rng,
+                )
+                learners.append((user, failure_rates))
+                logger.info(f"Learner {index + 1}/{options['users']}: {options['guesses']} guesses written.")
+
+            report = self.run_scheduler(
+                learners, game_mode, continents, options["runs"], options["seed"], now, options["engine"]
+            )
+            transaction.set_rollback(True)
+
+        report["options"] = {
+            key: options[key]
+            for key in ("users", "guesses", "accuracy", "continents", "game_mode", "days", "runs", "seed", "engine")
+        }
+        report["eligible_countries"] = len(country_ids)
+
+        self.print_report(report)
+        if options["baseline"]:
+            with open(options["baseline"]) as baseline_file:
+                self.print_comparison(report, json.load(baseline_file))
+        if options["output"]:
+            with open(options["output"], "w") as output_file:
+                json.dump(report, output_file, indent=2)
+
+    @staticmethod
+    def create_history(
+        user: User,
+        game_mode: str,
+        country_ids: list[int],
+        guesses_count: int,
+        accuracy: tuple[float, float],
+        start: datetime,
+        end: datetime,
+        rng: random.Random,
+        batch_size: int = 5000,
+    ) -> dict[int, float]:
+        """
+        Write the guesses of a learner whose accuracy goes linearly from accuracy[0] to accuracy[1],
+        each country being easier or harder by a random offset. Return the failure rate of each guessed country.
+        """
+        difficulties = {country_id: rng.uniform(-0.2, 0.2) for country_id in country_ids}
+        span_seconds = (end - start).total_seconds()
+        times = sorted(rng.uniform(0, span_seconds) for _ in range(guesses_count))
+
+        with transaction.atomic():
+            scores = UserCountryScore.objects.bulk_create(
+                [UserCountryScore(user=user, country_id=country_id, game_mode=game_mode) for country_id in country_ids]
+            )
+            scores_by_country = {score.country_id: score for score in scores}
+            outcomes = {}
+
+            for batch_start in range(0, guesses_count, batch_size):
+                batch = []
+                for index in range(batch_start, min(batch_start + batch_size, guesses_count)):
+                    progress = index / max(guesses_count - 1, 1)
+                    country_id = rng.choice(country_ids)
+                    expected_accuracy = accuracy[0] + (accuracy[1] - accuracy[0]) * progress
+                    is_correct = rng.random() < min(max(expected_accuracy - difficulties[country_id], 0.0), 1.0)
+                    batch.append((country_id, start + timedelta(seconds=times[index]), is_correct))
+
+                Guess.objects.bulk_create(
+                    [
+                        Guess(score=scores_by_country[country_id], created_at=created_at, is_correct=is_correct)
+                        for country_id, created_at, is_correct in batch
+                    ]
+                )
+
+                for country_id, created_at, is_correct in batch:
+                    scores_by_country[country_id].add_guess(created_at, is_correct)
+                    outcomes.setdefault(country_id, []).append(is_correct)
+
+            # Countries never guessed are new to the learner
+            unguessed_score_ids = [
+                score.pk for country_id, score in scores_by_country.items() if country_id not in outcomes
+            ]
+            UserCountryScore.objects.filter(pk__in=unguessed_score_ids).delete()
+            guessed_scores = [score for country_id, score in scores_by_country.items() if country_id in outcomes]
+            for score in guessed_scores:
+                score.updated_at = score.last_guess_at
+            UserCountryScore.objects.bulk_update(
+                guessed_scores, ["updated_at", "decayed_failures", "decayed_total", "last_guess_at"], batch_size=1000
+            )
+
+        return {country_id: results.count(False) / len(results) for country_id, results in outcomes.items()}
+
+    @staticmethod
+    def run_scheduler(
+        learners: list[tuple[User, dict[int, float]]],
+        game_mode: str,
+        continents: list[str] | None,
+        runs: int,
+        seed: int,
+        now: datetime,
+        engine: str | None,
+    ) -> dict:
+        """
+        Run the scheduler directly, without the question queue, with the clock frozen at now.
+        """
+        executed_queries = []
+
+        def count_query(execute, sql, params, many, context):
+            executed_queries.append(sql)
+            return execute(sql, params, many, context)
+
+        latencies = []
+        query_counts = []
+        picks = Counter()
+        picked_failure_rates = []
+        never_seen_picks = 0
+        repeated_last_questions = 0
+
+        for index, (user, failure_rates) in enumerate(learners):
+            service = UserCountryScoreService(
+                GameUser.from_user(user),
+                game_mode,
+                continents,
+                rng=random.Random(seed + index),  # nosec
+                clock=lambda: now,
+                weighting_engine=engine,
+            )
+            # Not measured: loads the country catalog
+            last_question = service.personalized_questions(service.SELECTION_LEN, last_question=None)[-1].iso2_code
+
+            for _ in range(runs):
+                executed_queries.clear()
+                with connection.execute_wrapper(count_query):
+                    started_at = time.perf_counter()
+                    questions = service.personalized_questions(service.SELECTION_LEN, last_question=last_question)
+                    latencies.append((time.perf_counter() - started_at) * 1000)
+                query_counts.append(len(executed_queries))
+
+                for country in questions:
+                    picks[country.id] += 1
+                    if country.id in failure_rates:
+                        picked_failure_rates.append(failure_rates[country.id])
+                    else:
+                        never_seen_picks += 1
+                if questions and questions[0].iso2_code == last_question:
+                    repeated_last_questions += 1
+                last_question = questions[-1].iso2_code if questions else None
+
+        total_picks = sum(picks.values())
+        probabilities = np.array(list(picks.values()), dtype=float) / max(total_picks, 1)
+        all_failure_rates = [rate for _, failure_rates in learners for rate in failure_rates.values()]
+        return {
+            "latency_ms": {f"p{percentile}": float(np.percentile(latencies, percentile)) for percentile in (50, 90, 99)}
+            | {"max": max(latencies), "mean": float(np.mean(latencies))},
+            "queries": {"min": min(query_counts), "max": max(query_counts), "mean": float(np.mean(query_counts))},
+            "distribution": {
+                "picks": total_picks,
+                "distinct_countries": len(picks),
+                # 1 when every picked country is picked as often
+                "normalized_entropy": float(-(probabilities * np.log(probabilities)).sum() / math.log(len(picks)))
+                if len(picks) > 1
+                else 0.0,
+                "top_10_share": sum(count for _, count in picks.most_common(10)) / max(total_picks, 1),
+                "never_seen_share": never_seen_picks / max(total_picks, 1),
+                # Higher than the mean failure rate when the scheduler favors the weak countries
+                "picked_failure_rate": float(np.mean(picked_failure_rates)) if picked_failure_rates else 0.0,
+                "mean_failure_rate": float(np.mean(all_failure_rates)) if all_failure_rates else 0.0,
+                "repeated_last_question": repeated_last_questions,
+            },
+        }
+
+    def print_report(self, report: dict) -> None:
+        for section in ("latency_ms", "queries", "distribution"):
+            self.stdout.write(self.style.MIGRATE_HEADING(section))
+            for key, value in report[section].items():
+                self.stdout.write(f"  {key}: {value:.4g}" if isinstance(value, float) else f"  {key}: {value}")
+
+    def print_comparison(self, report: dict, baseline: dict) -> None:
+        self.stdout.write(self.style.MIGRATE_HEADING("compared with the baseline"))
+        if baseline.get("options") != report["options"]:
+            self.stdout.write(self.style.WARNING("  The baseline was run with other options."))
+        for section in ("latency_ms", "queries", "distribution"):
+            for key, value in report[section].items():
+                baseline_value = baseline.get(section, {}).get(key)
+                if baseline_value is None:
+                    continue
+                change = f" ({(value - baseline_value) / baseline_value:+.1%})" if baseline_value else ""
+                self.stdout.write(f"  {section}.{key}: {baseline_value:.4g} -> {value:.4g}{change}")
@@ -0,0 +1,88 @@
+import logging
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Guess, GuessRollup, UserCountryScore
+from core.models.guess_rollup import RollupPeriods
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Fold the old guesses of the user country scores into daily or weekly rollups, and delete them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--after-days",
+            type=int,
+            default=settings.GUESS_COMPACTION_AFTER_DAYS,
+            help="Age of the guesses to compact.",
+        )
+        parser.add_argument("--period", choices=RollupPeriods.values, default=settings.GUESS_COMPACTION_PERIOD)
+        parser.add_argument("--batch-size", type=int, default=500, help="Number of scores compacted per transaction.")
+
+    def handle(self, *args, **options):
+        period = options["period"]
+        # Only whole buckets, so that a bucket is never folded twice
+        before = GuessRollup.get_bucket_start(timezone.now() - timezone.timedelta(days=options["after_days"]), period)
+
+        compacted_count = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                # Locked, not to compact the guesses being written to the score
+                score_ids = list(
+                    UserCountryScore.objects.select_for_update()
+                    .filter(pk__gt=last_id)
+                    .order_by("pk")
+                    .values_list("pk", flat=True)[: options["batch_size"]]
+                )
+                if not score_ids:
+                    break
+
+                compacted_count += self.compact(score_ids, before, period)
+                last_id = score_ids[-1]
+
+        logger.info(self.style.SUCCESS(f"{compacted_count} guesses compacted, until {before.isoformat()}."))
+
+    @staticmethod
+    def compact(score_ids: list[int], before, period: str) -> int:
+        """
+        Fold the guesses of the scores made before the given time into their rollups, and delete them.
+        Return the number of guesses compacted.
+        """
+        guesses = list(
+            Guess.objects.filter(score_id__in=score_ids, created_at__lt=before).values_list(
+                "score_id", "pk", "created_at", "is_correct"
+            )
+        )
+        if not guesses:
+            return 0
+
+        rollups = {
+            (rollup.score_id, rollup.bucket_start): rollup
+            for rollup in GuessRollup.objects.filter(
+                score_id__in={score_id for score_id, _, _, _ in guesses}, period=period
+            )
+        }
+        for score_id, _, created_at, is_correct in guesses:
+            bucket_start = GuessRollup.get_bucket_start(created_at, period)
+            rollup = rollups.get((score_id, bucket_start))
+            if rollup is None:
+                rollup = rollups[(score_id, bucket_start)] = GuessRollup(
+                    score_id=score_id, period=period, bucket_start=bucket_start
+                )
+            rollup.add_guess(created_at, is_correct)
+
+        GuessRollup.objects.bulk_update(
+            [rollup for rollup in rollups.values() if rollup.pk is not None],
+            ["guess_count", "correct_count", "decayed_failures", "decayed_total", "last_guess_at"],
+        )
+        GuessRollup.objects.bulk_create([rollup for rollup in rollups.values() if rollup.pk is None])
+        Guess.objects.filter(pk__in=[guess_id for _, guess_id, _, _ in guesses]).delete()
+
+        return len(guesses)
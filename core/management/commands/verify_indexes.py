@@ -0,0 +1,170 @@
+import json
+import logging
+from datetime import timedelta
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from core.models import Country, Guess, GuessRollup, User, UserCountryScore, UserStats
+from core.models.guess_rollup import RollupPeriods
+from core.models.user_country_score import GameModes
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+USERNAME_PREFIX = "index-check"
+GAME_MODE = GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that the hot queries of the scheduler and of the stats use their indexes: a few learners are seeded "
+        "in a transaction rolled back at the end, and EXPLAIN is run on each query. Needs the countries to be "
+        "imported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10, help="Number of seeded learners.")
+        parser.add_argument("--guesses", type=int, default=20, help="Number of guesses of each seeded score.")
+
+    def handle(self, *args, **options):
+        country_ids = list(Country.objects.values_list("pk", flat=True))
+        if not country_ids:
+            raise CommandError("No country to seed the scores with: import the countries first.")
+
+        failures = []
+        with transaction.atomic():
+            users = self.seed(country_ids, options["users"], options["guesses"])
+            with connection.cursor() as cursor:
+                for model in (UserCountryScore, Guess, GuessRollup, UserStats):
+                    cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+                # The seeded tables are too small for the planner to prefer an index on its own: the check is
+                # whether an index matches each query, not what it costs
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for name, queryset, columns in self.get_checks(users[0]):
+                table = queryset.model._meta.db_table
+                expected_indexes = self.get_index_names(table, columns)
+                used_indexes = self.get_used_index_names(queryset)
+                if expected_indexes & used_indexes:
+                    logger.info(self.style.SUCCESS(f"{name}: {', '.join(sorted(expected_indexes & used_indexes))}."))
+                else:
+                    failures.append(name)
+                    logger.error(
+                        f"{name}: no index on {table} ({', '.join(columns)}) used, "
+                        f"used: {', '.join(sorted(used_indexes)) or 'none'}."
+                    )
+
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"Queries not using their index: {', '.join(failures)}.")
+
+    @staticmethod
+    def seed(country_ids: list[int], users_count: int, guesses_count: int) -> list[User]:
+        now = timezone.now()
+        users = User.objects.bulk_create(
+            [
+                User(username=f"{USERNAME_PREFIX}-{index}", email=f"{USERNAME_PREFIX}-{index}@example.com")
+                for index in range(users_count)
+            ]
+        )
+        # Interleaved, as the scores of the users are created over time
+        scores = UserCountryScore.objects.bulk_create(
+            [
+                UserCountryScore(user=user, country_id=country_id, game_mode=game_mode)
+                for country_id in country_ids
+                for game_mode in (GAME_MODE, GameModes.GUESS_CAPITAL_FROM_COUNTRY_TRAINING_INFINITE)
+                for user in users
+            ]
+        )
+        # Spread as in real histories, for the planner statistics of updated_at
+        for index, score in enumerate(scores):
+            score.updated_at = now - timedelta(minutes=index * 37 % (30 * 24 * 60))
+        UserCountryScore.objects.bulk_update(scores, ["updated_at"], batch_size=1000)
+        Guess.objects.bulk_create(
+            [Guess(score=score, is_correct=index % 3 == 0) for score in scores for index in range(guesses_count)],
+            batch_size=5000,
+        )
+        GuessRollup.objects.bulk_create(
+            [
+                GuessRollup(
+                    score=score,
+                    period=RollupPeriods.DAY,
+                    bucket_start=GuessRollup.get_bucket_start(now - timedelta(days=60), RollupPeriods.DAY),
+                    guess_count=1,
+                    last_guess_at=now - timedelta(days=60),
+                )
+                for score in scores
+            ]
+        )
+        UserStats.objects.bulk_create(
+            [UserStats(user=user, game_mode=game_mode) for game_mode in GameModes.values for user in users]
+        )
+        return users
+
+    @staticmethod
+    def get_checks(user: User) -> list[tuple[str, QuerySet, list[str]]]:
+        """
+        (name, query, leading columns of the index it should use), in the shapes of the scheduler and stats queries.
+        """
+        now = timezone.now()
+        user_scores = UserCountryScore.objects.filter(user=user, game_mode=GAME_MODE)
+        score_ids = list(user_scores.values_list("pk", flat=True)[:10])
+        return [
+            (
+                "scheduler update times",
+                user_scores.order_by().values_list("country_id", "updated_at"),
+                ["user_id", "game_mode"],
+            ),
+            (
+                "scheduler cooled down scores",
+                user_scores.filter(updated_at__lte=now - timedelta(minutes=5)),
+                ["user_id", "game_mode", "updated_at"],
+            ),
+            (
+                "scheduler guess history",
+                Guess.objects.filter(score_id__in=score_ids).values_list("score_id", "created_at", "is_correct"),
+                ["score_id"],
+            ),
+            (
+                "scheduler guess rollups",
+                GuessRollup.objects.filter(score_id__in=score_ids),
+                ["score_id"],
+            ),
+            (
+                "stats recent guesses",
+                Guess.objects.filter(score__in=user_scores, created_at__gt=now - timedelta(days=30)),
+                ["score_id", "created_at"],
+            ),
+            (
+                "stats best streak",
+                UserStats.objects.filter(user_id=user.id, game_mode=GAME_MODE),
+                ["user_id", "game_mode"],
+            ),
+        ]
+
+    @staticmethod
+    def get_index_names(table: str, columns: list[str]) -> set[str]:
+        """
+        Indexes of the table starting with the given columns.
+        """
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+        return {
+            name
+            for name, constraint in constraints.items()
+            if (constraint["index"] or constraint["unique"]) and constraint["columns"][: len(columns)] == columns
+        }
+
+    @staticmethod
+    def get_used_index_names(queryset: QuerySet) -> set[str]:
+        def walk(plan: dict):
+            if "Index Name" in plan:
+                yield plan["Index Name"]
+            for subplan in plan.get("Plans", []):
+                yield from walk(subplan)
+
+        return set(walk(json.loads(queryset.explain(format="json"))[0]["Plan"]))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_add_default_wikipedia_links'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guess',
+            name='idempotency_key',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True, verbose_name='idempotency key'),
+        ),
+    ]
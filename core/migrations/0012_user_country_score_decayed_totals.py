@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_guess_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercountryscore',
+            name='decayed_failures',
+            field=models.FloatField(default=0, verbose_name='decayed failures'),
+        ),
+        migrations.AddField(
+            model_name='usercountryscore',
+            name='decayed_total',
+            field=models.FloatField(default=0, verbose_name='decayed total'),
+        ),
+        migrations.AddField(
+            model_name='usercountryscore',
+            name='last_guess_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='last guess at'),
+        ),
+    ]
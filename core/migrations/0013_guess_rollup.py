@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_user_country_score_decayed_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GuessRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('DAY', 'Day'), ('WEEK', 'Week')], verbose_name='period')),
+                ('bucket_start', models.DateTimeField(verbose_name='bucket start')),
+                ('guess_count', models.PositiveIntegerField(default=0, verbose_name='guess count')),
+                ('correct_count', models.PositiveIntegerField(default=0, verbose_name='correct count')),
+                ('decayed_failures', models.FloatField(default=0, verbose_name='decayed failures')),
+                ('decayed_total', models.FloatField(default=0, verbose_name='decayed total')),
+                ('last_guess_at', models.DateTimeField(verbose_name='last guess at')),
+                ('score', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='guess_rollups', to='core.usercountryscore', verbose_name='user country score')),
+            ],
+            options={
+                'verbose_name': 'guess rollup',
+                'verbose_name_plural': 'guess rollups',
+                'ordering': ('bucket_start',),
+                'unique_together': {('score', 'period', 'bucket_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:39
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 10000
+
+
+def copy_scores_to_guesses(apps, schema_editor):
+    """
+    Set the score of each guess from the through table of UserCountryScore.user_guesses, one range of
+    through rows per transaction so that the guess table is never locked as a whole.
+    """
+    UserCountryScore = apps.get_model("core", "UserCountryScore")
+    Guess = apps.get_model("core", "Guess")
+    through_model = UserCountryScore.user_guesses.through
+    connection = schema_editor.connection
+    quote_name = connection.ops.quote_name
+
+    last_id = through_model.objects.aggregate(last_id=models.Max("pk"))["last_id"] or 0
+    for batch_start in range(0, last_id, BATCH_SIZE):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {quote_name(Guess._meta.db_table)} SET score_id = through.usercountryscore_id "
+                f"FROM {quote_name(through_model._meta.db_table)} AS through "
+                f"WHERE through.guess_id = {quote_name(Guess._meta.db_table)}.id "
+                "AND through.id > %s AND through.id <= %s",
+                [batch_start, batch_start + BATCH_SIZE],
+            )
+
+
+def copy_guesses_to_through_table(apps, schema_editor):
+    UserCountryScore = apps.get_model("core", "UserCountryScore")
+    Guess = apps.get_model("core", "Guess")
+    through_model = UserCountryScore.user_guesses.through
+
+    guesses = Guess.objects.filter(score__isnull=False).order_by("pk").values_list("pk", "score_id")
+    last_id = 0
+    while batch := list(guesses.filter(pk__gt=last_id)[:BATCH_SIZE]):
+        with transaction.atomic(using=schema_editor.connection.alias):
+            through_model.objects.bulk_create(
+                [through_model(usercountryscore_id=score_id, guess_id=guess_id) for guess_id, score_id in batch]
+            )
+        last_id = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+    # The backfill commits batch by batch
+    atomic = False
+
+    dependencies = [
+        ('core', '0013_guess_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guess',
+            name='score',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='guesses', to='core.usercountryscore', verbose_name='user country score'),
+        ),
+        migrations.RunPython(copy_scores_to_guesses, reverse_code=copy_guesses_to_through_table),
+        migrations.RemoveField(
+            model_name='usercountryscore',
+            name='user_guesses',
+        ),
+        migrations.AddIndex(
+            model_name='guess',
+            index=models.Index(fields=['score', 'created_at'], name='core_guess_score_created_idx'),
+        ),
+    ]
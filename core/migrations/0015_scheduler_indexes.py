@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built without locking the tables against writes
+    atomic = False
+
+    dependencies = [
+        ('core', '0014_guess_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='guess',
+            index=models.Index(fields=['score', 'created_at'], include=('is_correct',), name='core_guess_score_covering_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='guess',
+            name='core_guess_score_created_idx',
+        ),
+        AddIndexConcurrently(
+            model_name='usercountryscore',
+            index=models.Index(fields=['user', 'game_mode', 'updated_at'], include=('country',), name='core_ucs_user_mode_updated_idx'),
+        ),
+        # Redundant once the indexes above exist
+        migrations.AlterField(
+            model_name='usercountryscore',
+            name='country',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='country_scores', to='core.country', verbose_name='country'),
+        ),
+        migrations.AlterField(
+            model_name='usercountryscore',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='user_scores', to=settings.AUTH_USER_MODEL, verbose_name='user'),
+        ),
+        migrations.AlterField(
+            model_name='userstats',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='user_stats', to=settings.AUTH_USER_MODEL, verbose_name='user'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_scheduler_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='guess',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='created at'),
+        ),
+    ]
@@ -3,5 +3,6 @@ from .country import Country  # noqa
 from .guess import Guess  # noqa
 from .user import User  # noqa
 from .user_country_score import UserCountryScore  # noqa
+from .guess_rollup import GuessRollup  # noqa
 from .user_stats import UserStats  # noqa
 from .user_preference_game_mode import UserPreferenceGameMode  # noqa
@@ -1,13 +1,33 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
 class Guess(models.Model):
-    created_at = models.DateTimeField(db_index=True, auto_now_add=True, verbose_name=_("created at"))
+    # Time of the answer, set by the guess recorder (the guess is written later)
+    created_at = models.DateTimeField(db_index=True, default=timezone.now, editable=False, verbose_name=_("created at"))
     is_correct = models.BooleanField(verbose_name=_("is correct"))
+    # Indexed with created_at and is_correct, see Meta.indexes
+    score = models.ForeignKey(
+        "core.UserCountryScore",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,
+        related_name="guesses",
+        verbose_name=_("user country score"),
+    )
+    # Set by the guess recorder, so that a batch written twice does not duplicate guesses
+    idempotency_key = models.UUIDField(
+        null=True, blank=True, unique=True, editable=False, verbose_name=_("idempotency key")
+    )
 
     class Meta:
         ordering = ("created_at",)
+        indexes = [
+            # Guesses of scores since a given time (stats, scheduler, compaction), without reading the table
+            models.Index(fields=["score", "created_at"], include=["is_correct"], name="core_guess_score_covering_idx"),
+        ]
         verbose_name = _("guess")
         verbose_name_plural = _("guesses")
 
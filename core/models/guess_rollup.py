@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from core.models.user_country_score import UserCountryScore
+
+
+class RollupPeriods(models.TextChoices):
+    DAY = "DAY", _("Day")
+    WEEK = "WEEK", _("Week")
+
+
+class GuessRollup(models.Model):
+    """
+    Guesses of a score folded into one row per day or per week, once they are old enough to barely
+    weigh on the scheduler (see the compact_guesses command).
+    """
+
+    score = models.ForeignKey(
+        UserCountryScore,
+        on_delete=models.CASCADE,
+        related_name="guess_rollups",
+        verbose_name=_("user country score"),
+    )
+    period = models.CharField(choices=RollupPeriods.choices, verbose_name=_("period"))
+    bucket_start = models.DateTimeField(verbose_name=_("bucket start"))
+    guess_count = models.PositiveIntegerField(default=0, verbose_name=_("guess count"))
+    correct_count = models.PositiveIntegerField(default=0, verbose_name=_("correct count"))
+
+    # Guesses weighted by exp(-age / DECAY_CONSTANT) with their age taken at the end of the bucket,
+    # so that the weights of the guesses are kept exactly. See add_guess.
+    decayed_failures = models.FloatField(default=0, verbose_name=_("decayed failures"))
+    decayed_total = models.FloatField(default=0, verbose_name=_("decayed total"))
+    last_guess_at = models.DateTimeField(verbose_name=_("last guess at"))
+
+    class Meta:
+        ordering = ("bucket_start",)
+        unique_together = ("score", "period", "bucket_start")
+        verbose_name = _("guess rollup")
+        verbose_name_plural = _("guess rollups")
+
+    def __str__(self):
+        return f"{self.guess_count} guesses of score {self.score_id} from {self.bucket_start}"
+
+    @staticmethod
+    def get_bucket_start(created_at: datetime, period: str) -> datetime:
+        bucket_start = created_at.replace(hour=0, minute=0, second=0, microsecond=0)
+        if period == RollupPeriods.WEEK:
+            bucket_start -= timedelta(days=bucket_start.weekday())
+        return bucket_start
+
+    @staticmethod
+    def get_bucket_end(bucket_start: datetime, period: str) -> datetime:
+        return bucket_start + (timedelta(weeks=1) if period == RollupPeriods.WEEK else timedelta(days=1))
+
+    @property
+    def bucket_end(self) -> datetime:
+        return self.get_bucket_end(self.bucket_start, self.period)
+
+    def add_guess(self, created_at: datetime, is_correct: bool) -> None:
+        weight = UserCountryScore.get_decay((self.bucket_end - created_at).total_seconds() / 60)
+        self.guess_count += 1
+        self.decayed_total += weight
+        if is_correct:
+            self.correct_count += 1
+        else:
+            self.decayed_failures += weight
+        if self.last_guess_at is None or created_at > self.last_guess_at:
+            self.last_guess_at = created_at
@@ -1,8 +1,15 @@
+import math
+from datetime import datetime
+from typing import TYPE_CHECKING
+
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
 from core.models import Country, Guess
 
+if TYPE_CHECKING:
+    from core.models import GuessRollup
+
 
 class GameModes(models.TextChoices):
     GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE = (
@@ -24,28 +31,98 @@ class GameModes(models.TextChoices):
 
 
 class UserCountryScore(models.Model):
+    # Minutes, decay of the weight of a guess with its age
+    DECAY_CONSTANT = 4000
+
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("created at"))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_("updated at"))
+    # Not indexed on their own: both lead an index of Meta
     country = models.ForeignKey(
         Country,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name="country_scores",
         verbose_name=_("country"),
     )
     user = models.ForeignKey(
         "core.User",
         on_delete=models.CASCADE,
+        db_index=False,
         related_name="user_scores",
         verbose_name=_("user"),
     )
     game_mode = models.CharField(choices=GameModes.choices, verbose_name=_("game mode"))
-    user_guesses = models.ManyToManyField(Guess, blank=True, related_name="user_scores", verbose_name=_("user guesses"))
+
+    # Running totals of the guesses, each weighted by exp(-age / DECAY_CONSTANT) with its age taken
+    # at last_guess_at, the reference time. See add_guess.
+    decayed_failures = models.FloatField(default=0, verbose_name=_("decayed failures"))
+    decayed_total = models.FloatField(default=0, verbose_name=_("decayed total"))
+    last_guess_at = models.DateTimeField(null=True, blank=True, verbose_name=_("last guess at"))
 
     class Meta:
         ordering = ("created_at",)
         unique_together = ("country", "game_mode", "user")
+        indexes = [
+            # Scores of a user in a game mode, cooled down or not (scheduler, stats): the unique index above
+            # starts with the country
+            models.Index(
+                fields=["user", "game_mode", "updated_at"], include=["country"], name="core_ucs_user_mode_updated_idx"
+            ),
+        ]
         verbose_name = _("user country score")
         verbose_name_plural = _("user country scores")
 
     def __str__(self):
         return f"{self.user.username} score for {self.country.iso2_code} - {self.game_mode}"
+
+    @property
+    def user_guesses(self) -> models.Manager[Guess]:
+        """
+        The guesses of the score, kept under the name of the former many-to-many field (see Guess.score).
+        """
+        return self.guesses
+
+    @classmethod
+    def get_decay(cls, minutes: float) -> float:
+        return math.exp(-minutes / cls.DECAY_CONSTANT)
+
+    def add_guess(self, created_at: datetime, is_correct: bool) -> None:
+        """
+        Add a guess to the decayed totals, without the other guesses: moving the reference time to a newer guess
+        only scales the totals down, as all the guesses get older by the same time.
+        """
+        if self.last_guess_at is None or created_at >= self.last_guess_at:
+            if self.last_guess_at is not None:
+                decay = self.get_decay((created_at - self.last_guess_at).total_seconds() / 60)
+                self.decayed_failures *= decay
+                self.decayed_total *= decay
+            self.last_guess_at = created_at
+            weight = 1.0
+        else:
+            # Older than the reference time (e.g., written late)
+            weight = self.get_decay((self.last_guess_at - created_at).total_seconds() / 60)
+
+        self.decayed_total += weight
+        if not is_correct:
+            self.decayed_failures += weight
+
+    def add_rollup(self, rollup: "GuessRollup") -> None:
+        """
+        Add the guesses of a rollup to the decayed totals, as add_guess does for each guess.
+        The weights of the rollup are taken at the end of its bucket: they only need to be scaled.
+        """
+        if self.last_guess_at is None or rollup.last_guess_at > self.last_guess_at:
+            if self.last_guess_at is not None:
+                decay = self.get_decay((rollup.last_guess_at - self.last_guess_at).total_seconds() / 60)
+                self.decayed_failures *= decay
+                self.decayed_total *= decay
+            self.last_guess_at = rollup.last_guess_at
+
+        scale = self.get_decay((self.last_guess_at - rollup.bucket_end).total_seconds() / 60)
+        self.decayed_total += rollup.decayed_total * scale
+        self.decayed_failures += rollup.decayed_failures * scale
+
+    def reset_decayed_totals(self) -> None:
+        self.decayed_failures = 0
+        self.decayed_total = 0
+        self.last_guess_at = None
@@ -8,9 +8,11 @@ class UserStats(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("created at"))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_("updated at"))
 
+    # Not indexed on its own: leads the unique index of Meta
     user = models.ForeignKey(
         "core.User",
         on_delete=models.CASCADE,
+        db_index=False,
         related_name="user_stats",
         verbose_name=_("user"),
     )
@@ -1,12 +1,13 @@
 from datetime import datetime
 
-from django.db.models import Count, Q
+from django.db.models import Count, F, OuterRef, QuerySet, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from api.flag_store import flag_store
 from api.schema import CityOutStats, CountryOutStats, UserStats, UserStatsByGameMode
 from api.utils import user_get_language
-from core.models import Guess, User, UserCountryScore
+from core.models import Guess, GuessRollup, User, UserCountryScore
 from core.models.user_country_score import GameModes
 from core.services.user_services import user_get_best_steak
 
@@ -23,22 +24,23 @@ def get_game_mode_stats(user: User, game_mode: str, name_field: str, max_thresho
     """Get statistics for a specific game mode."""
     user_scores = UserCountryScore.objects.filter(user=user, game_mode=game_mode)
     user_guesses = Guess.objects.filter(
-        user_scores__in=user_scores,
+        score__in=user_scores,
         created_at__gt=max_threshold,
     ).order_by("created_at")
 
+    # Old guesses are folded into rollups by compact_guesses
+    rollup_counts = GuessRollup.objects.filter(score__in=user_scores, bucket_start__gt=max_threshold).aggregate(
+        total=Coalesce(Sum("guess_count"), 0), correct=Coalesce(Sum("correct_count"), 0)
+    )
+
     # Basic statistics
-    total = user_guesses.count()
-    correct = user_guesses.filter(is_correct=True).count()
+    total = user_guesses.count() + rollup_counts["total"]
+    correct = user_guesses.filter(is_correct=True).count() + rollup_counts["correct"]
     success_rate = round(correct / total * 100, 2) if total else 0
     max_streak = user_get_best_steak(user, game_mode)
 
     # Annotated scores for most failed/correct analysis
-    annotated_scores = user_scores.annotate(
-        fails=Count("user_guesses", filter=Q(user_guesses__is_correct=False)),
-        corrects=Count("user_guesses", filter=Q(user_guesses__is_correct=True)),
-        total=Count("user_guesses"),
-    )
+    annotated_scores = annotate_guess_counts(user_scores)
 
     most_failed_obj = annotated_scores.order_by("-fails").first()
     most_correct_obj = annotated_scores.order_by("-corrects").first()
@@ -57,6 +59,26 @@ def get_game_mode_stats(user: User, game_mode: str, name_field: str, max_thresho
     )
 
 
+def annotate_guess_counts(user_scores: QuerySet[UserCountryScore]) -> QuerySet[UserCountryScore]:
+    """
+    Annotate the number of correct, failed and total guesses of each score, raw guesses and rollups together.
+    Subqueries, as joining both relations would count each guess once per rollup.
+    """
+    guesses = Guess.objects.filter(score=OuterRef("pk")).order_by().values("score")
+    rollups = GuessRollup.objects.filter(score=OuterRef("pk")).order_by().values("score")
+
+    def count_guesses(**filters):
+        return Coalesce(Subquery(guesses.filter(**filters).annotate(count=Count("pk")).values("count")), 0)
+
+    def sum_rollups(field: str):
+        return Coalesce(Subquery(rollups.annotate(total=Sum(field)).values("total")), 0)
+
+    return user_scores.annotate(
+        corrects=count_guesses(is_correct=True) + sum_rollups("correct_count"),
+        total=count_guesses() + sum_rollups("guess_count"),
+    ).annotate(fails=F("total") - F("corrects"))
+
+
 def calculate_success_rate(obj) -> float:
     """Calculate success rate for a score object."""
     if obj and obj.total:
@@ -1,9 +1,45 @@
+from typing import TYPE_CHECKING
+
+from django.utils import timezone
+
 from core.models import User, UserStats
 from core.models.user_country_score import GameModes
 
+if TYPE_CHECKING:
+    from api.game_session import GameUser
+
+
+def user_get_best_steak(user: "User | GameUser", game_mode: GameModes) -> int:
+    try:
+        return UserStats.objects.get(user_id=user.id, game_mode=game_mode).best_streak
+    except UserStats.DoesNotExist:
+        return 0
+
 
-def user_get_best_steak(user: User, game_mode: GameModes) -> int:
+async def auser_get_best_steak(user: "User | GameUser", game_mode: GameModes) -> int:
     try:
-        return UserStats.objects.get(user=user, game_mode=game_mode).best_streak
+        return (await UserStats.objects.aget(user_id=user.id, game_mode=game_mode)).best_streak
     except UserStats.DoesNotExist:
         return 0
+
+
+def user_set_best_streak(user: "User | GameUser", game_mode: GameModes, best_streak: int) -> None:
+    """
+    Save a new best streak, unless a better one was saved in the meantime (e.g., from another tab).
+    """
+    updated = UserStats.objects.filter(user_id=user.id, game_mode=game_mode, best_streak__lt=best_streak).update(
+        best_streak=best_streak, updated_at=timezone.now()
+    )
+    if not updated:
+        # No stats yet, or already better
+        UserStats.objects.get_or_create(user_id=user.id, game_mode=game_mode, defaults={"best_streak": best_streak})
+
+
+async def auser_set_best_streak(user: "User | GameUser", game_mode: GameModes, best_streak: int) -> None:
+    updated = await UserStats.objects.filter(user_id=user.id, game_mode=game_mode, best_streak__lt=best_streak).aupdate(
+        best_streak=best_streak, updated_at=timezone.now()
+    )
+    if not updated:
+        await UserStats.objects.aget_or_create(
+            user_id=user.id, game_mode=game_mode, defaults={"best_streak": best_streak}
+        )
@@ -1,5 +1,6 @@
 import factory.fuzzy
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
 from factory.django import DjangoModelFactory
 from faker import Faker
 
@@ -55,7 +56,7 @@ class GuessFactory(DjangoModelFactory):
     class Meta:
         model = "core.Guess"
 
-    created_at = factory.Faker("date_time")
+    created_at = factory.LazyFunction(timezone.now)
     is_correct = factory.fuzzy.FuzzyChoice([True, False])
 
 
@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 from api.schema import CorrectAnswer
 
@@ -9,15 +9,10 @@ class MockGameService:
         country.name_fr = "Allemagne"
         country.iso2_code = "DE"
 
-        user = MagicMock()
-        user.language = "fr"
-
-        self._user = user
         self._country = country
 
         # Methods as mocks so tests can override .return_value
         self.user_accept = MagicMock(return_value=True)
-        self.user_get = MagicMock(return_value=self._user)
         self.check_answer = MagicMock(return_value=(check_answer_result, self._country))
         self.get_correct_answer = MagicMock(
             return_value=[
@@ -34,3 +29,12 @@ class MockGameService:
         questions_mock = MagicMock()
         questions_mock.model_dump.return_value = {"questions": []}
         self.get_questions = MagicMock(return_value=questions_mock)
+
+        # Async counterparts share the same return values
+        self.auser_accept = AsyncMock(side_effect=lambda *args, **kwargs: self.user_accept.return_value)
+        self.acheck_answer = AsyncMock(side_effect=lambda *args, **kwargs: self.check_answer.return_value)
+        self.aget_correct_answer = AsyncMock(side_effect=lambda *args, **kwargs: self.get_correct_answer.return_value)
+        self.auser_get_streak_score = AsyncMock(
+            side_effect=lambda *args, **kwargs: self.user_get_streak_score.return_value
+        )
+        self.aget_questions = AsyncMock(side_effect=lambda *args, **kwargs: self.get_questions.return_value)
@@ -0,0 +1,121 @@
+import json
+import random
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+
+from api.country_catalog import country_catalog
+from core.management.commands.benchmark_scheduler import Command
+from core.models import Guess, User, UserCountryScore
+from core.models.user_country_score import GameModes
+from core.tests.factories import CountryFactory
+from flagora.tests.base import FlagoraTestCase
+
+
+class BenchmarkSchedulerCommandTest(FlagoraTestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(14):
+            CountryFactory(
+                iso2_code=f"B{chr(65 + index)}", iso3_code=f"BB{chr(65 + index)}", continent="EU" if index % 2 else "AF"
+            )
+        country_catalog.clear()
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.output_path = Path(self.output_dir.name) / "report.json"
+
+    def tearDown(self):
+        super().tearDown()
+        self.output_dir.cleanup()
+
+    def run_benchmark(self, *args):
+        call_command(
+            "benchmark_scheduler",
+            "--guesses=200",
+            "--runs=5",
+            f"--output={self.output_path}",
+            *args,
+            stdout=StringIO(),
+        )
+        return json.loads(self.output_path.read_text())
+
+    def test_report(self):
+        report = self.run_benchmark("--users=2")
+
+        self.assertEqual(report["distribution"]["picks"], 2 * 5 * 10)
+        self.assertEqual(report["distribution"]["repeated_last_question"], 0)
+        self.assertGreater(report["latency_ms"]["p99"], 0)
+        self.assertGreater(report["queries"]["min"], 0)
+        self.assertEqual(report["eligible_countries"], 15)
+
+    def test_nothing_is_written(self):
+        self.run_benchmark()
+
+        # Written in a transaction rolled back
+        self.assertFalse(User.objects.filter(username__startswith="scheduler-bench-").exists())
+        self.assertFalse(UserCountryScore.objects.exists())
+        self.assertFalse(Guess.objects.exists())
+
+    def test_nothing_is_written_on_error(self):
+        with (
+            patch.object(Command, "run_scheduler", side_effect=RuntimeError),
+            self.assertRaises(RuntimeError),
+        ):
+            self.run_benchmark()
+
+        self.assertFalse(User.objects.filter(username__startswith="scheduler-bench-").exists())
+
+    def test_history(self):
+        now = timezone.now()
+        failure_rates = Command.create_history(
+            self.user,
+            GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE,
+            [self.country.id],
+            200,
+            (0.4, 0.9),
+            now - timedelta(days=10),
+            now,
+            random.Random(0),
+        )
+
+        score = UserCountryScore.objects.get(user=self.user)
+        self.assertEqual(Guess.objects.filter(score=score).count(), 200)
+        self.assertEqual(score.updated_at, score.last_guess_at)
+        self.assertGreater(score.decayed_total, 0)
+        self.assertEqual(list(failure_rates), [self.country.id])
+
+    def test_reproducible(self):
+        first_report = self.run_benchmark("--engine=numpy")
+        second_report = self.run_benchmark("--engine=numpy")
+
+        self.assertEqual(first_report["distribution"], second_report["distribution"])
+
+    def test_database_engine(self):
+        report = self.run_benchmark("--engine=database")
+
+        self.assertEqual(report["distribution"]["picks"], 5 * 10)
+        # Scores update times, weighted selection, after the seeding of random()
+        self.assertEqual(report["queries"]["max"], 3)
+
+    def test_continents(self):
+        report = self.run_benchmark("--continents", "EU")
+
+        self.assertEqual(report["eligible_countries"], 7)
+        self.assertLessEqual(report["distribution"]["distinct_countries"], 7)
+
+    def test_compare_with_baseline(self):
+        self.run_benchmark()
+        out = StringIO()
+
+        call_command("benchmark_scheduler", "--guesses=200", "--runs=5", f"--baseline={self.output_path}", stdout=out)
+
+        self.assertIn("compared with the baseline", out.getvalue())
+        self.assertNotIn("other options", out.getvalue())
+
+    def test_no_country(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark_scheduler", "--continents", "OC", stdout=StringIO())
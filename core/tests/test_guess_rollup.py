@@ -0,0 +1,139 @@
+from datetime import UTC, datetime, timedelta
+
+from django.core.management import call_command
+from django.test import override_settings
+from freezegun import freeze_time
+
+from api.services.user_country_score import UserCountryScoreService
+from core.models import Guess, GuessRollup, UserCountryScore
+from core.models.guess_rollup import RollupPeriods
+from core.models.user_country_score import GameModes
+from core.tests.factories import CountryFactory, GuessFactory, UserCountryScoreFactory
+from core.tests.test_user_country_score import UserCountryScoreTestCase
+
+
+class GuessRollupTest(UserCountryScoreTestCase):
+    def test_get_bucket_start(self):
+        # A Saturday
+        created_at = datetime(2025, 6, 7, 18, 30, tzinfo=UTC)
+
+        self.assertEqual(GuessRollup.get_bucket_start(created_at, RollupPeriods.DAY), datetime(2025, 6, 7, tzinfo=UTC))
+        self.assertEqual(GuessRollup.get_bucket_start(created_at, RollupPeriods.WEEK), datetime(2025, 6, 2, tzinfo=UTC))
+
+    def test_add_guess(self):
+        bucket_start = datetime(2025, 6, 1, tzinfo=UTC)
+        rollup = GuessRollup(score=self.score, period=RollupPeriods.DAY, bucket_start=bucket_start)
+
+        rollup.add_guess(bucket_start + timedelta(hours=4), is_correct=False)
+        rollup.add_guess(bucket_start + timedelta(hours=2), is_correct=True)
+
+        self.assertEqual(rollup.guess_count, 2)
+        self.assertEqual(rollup.correct_count, 1)
+        self.assertEqual(rollup.last_guess_at, bucket_start + timedelta(hours=4))
+        self.assertAlmostEqual(rollup.decayed_failures, UserCountryScore.get_decay(20 * 60))
+        self.assertAlmostEqual(
+            rollup.decayed_total, UserCountryScore.get_decay(20 * 60) + UserCountryScore.get_decay(22 * 60)
+        )
+
+
+@override_settings(GUESS_COMPACTION_AFTER_DAYS=28, GUESS_COMPACTION_PERIOD=RollupPeriods.DAY)
+class CompactGuessesCommandTest(UserCountryScoreTestCase):
+    def setUp(self):
+        super().setUp()
+        days = 24 * 60
+        # Two guesses on the same day, one on the day after, all older than 28 days, and two recent guesses
+        self.add_guesses(
+            [(40 * days, False), (40 * days - 30, True), (39 * days, False), (3 * days, True), (20, False)]
+        )
+
+    def compact(self, **options):
+        with freeze_time(self.now):
+            call_command("compact_guesses", **options)
+
+    def test_old_guesses_folded(self):
+        self.compact()
+
+        rollups = list(self.score.guess_rollups.all())
+        self.assertEqual(
+            [(rollup.guess_count, rollup.correct_count) for rollup in rollups],
+            [(2, 1), (1, 0)],
+        )
+        self.assertEqual(rollups[0].bucket_start, GuessRollup.get_bucket_start(self.now - timedelta(days=40), "DAY"))
+        self.assertEqual(rollups[0].last_guess_at, self.now - timedelta(days=40) + timedelta(minutes=30))
+        # Recent guesses are kept
+        self.assertEqual(self.score.user_guesses.count(), 2)
+        self.assertEqual(Guess.objects.count(), 2)
+
+    def test_weekly(self):
+        self.compact(period=RollupPeriods.WEEK)
+
+        self.assertEqual(sum(rollup.guess_count for rollup in self.score.guess_rollups.all()), 3)
+        self.assertTrue(all(rollup.period == RollupPeriods.WEEK for rollup in self.score.guess_rollups.all()))
+
+    def test_compact_twice(self):
+        self.compact(batch_size=1)
+        self.add_guesses([(41 * 24 * 60, True)])
+        self.compact()
+
+        self.assertEqual(
+            [(rollup.guess_count, rollup.correct_count) for rollup in self.score.guess_rollups.all()],
+            [(1, 1), (2, 1), (1, 0)],
+        )
+        self.assertEqual(Guess.objects.count(), 2)
+
+    def test_other_scores_compacted(self):
+        other_score = UserCountryScoreFactory(
+            user=self.user, country=CountryFactory(iso2_code="IS", iso3_code="ISL"), user_guesses=[GuessFactory()]
+        )
+        Guess.objects.filter(score=other_score).update(created_at=self.now - timedelta(days=100))
+
+        self.compact(batch_size=1)
+
+        self.assertEqual(other_score.guess_rollups.get().guess_count, 1)
+        self.assertFalse(other_score.user_guesses.exists())
+
+    def test_same_weights_after_compaction(self):
+        service = UserCountryScoreService(self.user, GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE)
+        scores = UserCountryScore.objects.all()
+        with freeze_time(self.now):
+            expected = service.compute_weight(self.score)
+
+        self.compact()
+
+        with freeze_time(self.now):
+            results = [
+                service.compute_weight(self.score),
+                service.compute_weights(scores)[0],
+                service.compute_weights_vectorized(scores)[0],
+            ]
+        for result in results:
+            self.assertAlmostEqual(result["failure_score"], expected["failure_score"])
+            self.assertAlmostEqual(result["forgetting_score"], expected["forgetting_score"])
+            self.assertAlmostEqual(result["weight"], expected["weight"])
+
+    def test_forgetting_score_from_rollups(self):
+        Guess.objects.filter(created_at__gt=self.now - timedelta(days=28)).delete()
+        service = UserCountryScoreService(self.user, GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE)
+        with freeze_time(self.now):
+            expected = service.compute_weight(self.score)
+
+        self.compact()
+
+        self.assertFalse(self.score.user_guesses.exists())
+        with freeze_time(self.now):
+            result = service.compute_weights_vectorized(UserCountryScore.objects.all())[0]
+        self.assertAlmostEqual(result["forgetting_score"], expected["forgetting_score"])
+        self.assertAlmostEqual(result["failure_score"], expected["failure_score"])
+
+    def test_backfill_decayed_totals_after_compaction(self):
+        call_command("backfill_decayed_totals")
+        self.score.refresh_from_db()
+        expected = (self.score.decayed_failures, self.score.decayed_total, self.score.last_guess_at)
+
+        self.compact()
+        call_command("backfill_decayed_totals")
+
+        self.score.refresh_from_db()
+        self.assertAlmostEqual(self.score.decayed_failures, expected[0])
+        self.assertAlmostEqual(self.score.decayed_total, expected[1])
+        self.assertEqual(self.score.last_guess_at, expected[2])
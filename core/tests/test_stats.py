@@ -4,7 +4,8 @@ from unittest.mock import patch
 from django.utils import timezone
 from freezegun import freeze_time
 
-from core.models import Guess, UserStats
+from core.models import Guess, GuessRollup, UserStats
+from core.models.guess_rollup import RollupPeriods
 from core.models.user_country_score import GameModes
 from core.services.stats_sevices import user_get_stats
 from core.tests.factories import CityFactory, CountryFactory, GuessFactory, UserCountryScoreFactory
@@ -186,6 +187,44 @@ class UserStatsTestCase(FlagoraTestCase):
         # Should only count the recent guess
         self.assertEqual(flag_result.stats.success_rate, 0.0)  # Only the False guess counted
 
+    @patch("api.flag_store.flag_store")
+    def test_user_get_stats_with_guess_rollups(self, mock_flag_store):
+        """Test that the guesses folded into rollups are counted with the raw guesses."""
+        mock_flag_store.get_path.return_value = "/flags/test.png"
+
+        score, other_score = self.create_user_scores_and_guesses(
+            GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE,
+            [(self.country, [True]), (self.country2, [True, True])],
+        )[0]
+        GuessRollup.objects.create(
+            score=score,
+            period=RollupPeriods.DAY,
+            bucket_start=self.now - timedelta(days=40),
+            guess_count=4,
+            correct_count=1,
+            last_guess_at=self.now - timedelta(days=40),
+        )
+        # Too old for the success rate, but counted per country
+        GuessRollup.objects.create(
+            score=other_score,
+            period=RollupPeriods.DAY,
+            bucket_start=self.now - timedelta(days=400),
+            guess_count=2,
+            correct_count=2,
+            last_guess_at=self.now - timedelta(days=400),
+        )
+
+        with freeze_time(self.now):
+            results = user_get_stats(self.user)
+        flag_result = next(r for r in results if r.game_mode == GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE)
+
+        # 4 correct guesses out of 7
+        self.assertEqual(flag_result.stats.success_rate, 57.14)
+        self.assertEqual(flag_result.stats.most_failed.iso2_code, self.country.iso2_code)
+        self.assertEqual(flag_result.stats.most_failed.success_rate, 40.0)
+        self.assertEqual(flag_result.stats.most_correctly_guessed.iso2_code, self.country2.iso2_code)
+        self.assertEqual(flag_result.stats.most_correctly_guessed.success_rate, 100.0)
+
     @patch("api.flag_store.flag_store")
     def test_user_language_handling(self, mock_flag_store):
         mock_flag_store.get_path.return_value = "/flags/test.png"
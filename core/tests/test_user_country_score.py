@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.utils import timezone
+from freezegun import freeze_time
+
+from api.services.user_country_score import UserCountryScoreService
+from core.models import Guess, UserCountryScore
+from core.models.user_country_score import GameModes
+from core.tests.factories import GuessFactory, UserCountryScoreFactory
+from flagora.tests.base import FlagoraTestCase
+
+
+class UserCountryScoreTestCase(FlagoraTestCase):
+    def setUp(self):
+        super().setUp()
+        self.score = UserCountryScoreFactory(
+            user=self.user, country=self.country, game_mode=GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE
+        )
+        with freeze_time("2025-06-07 18:00:00"):
+            self.now = timezone.now()
+
+    def add_guesses(self, guesses):
+        """
+        Add (minutes ago, is_correct) guesses to self.score.
+        """
+        for minutes_ago, is_correct in guesses:
+            guess = GuessFactory(is_correct=is_correct)
+            Guess.objects.filter(pk=guess.pk).update(created_at=self.now - timedelta(minutes=minutes_ago))
+            self.score.user_guesses.add(guess)
+
+
+class DecayedTotalsTest(UserCountryScoreTestCase):
+    def test_add_guess(self):
+        self.score.add_guess(self.now - timedelta(minutes=4000), is_correct=False)
+        self.score.add_guess(self.now, is_correct=True)
+
+        self.assertEqual(self.score.last_guess_at, self.now)
+        self.assertAlmostEqual(self.score.decayed_failures, UserCountryScore.get_decay(4000))
+        self.assertAlmostEqual(self.score.decayed_total, UserCountryScore.get_decay(4000) + 1)
+
+    def test_add_older_guess(self):
+        self.score.add_guess(self.now, is_correct=True)
+        self.score.add_guess(self.now - timedelta(minutes=4000), is_correct=False)
+
+        self.assertEqual(self.score.last_guess_at, self.now)
+        self.assertAlmostEqual(self.score.decayed_failures, UserCountryScore.get_decay(4000))
+        self.assertAlmostEqual(self.score.decayed_total, UserCountryScore.get_decay(4000) + 1)
+
+    def test_same_weight_as_from_guesses(self):
+        self.add_guesses([(3, False), (700, True), (50000, False), (20, True)])
+        call_command("backfill_decayed_totals")
+        self.score.refresh_from_db()
+        service = UserCountryScoreService(self.user, GameModes.GUESS_COUNTRY_FROM_FLAG_TRAINING_INFINITE)
+
+        with freeze_time(self.now):
+            expected = service.compute_weight(self.score)
+            result = service.compute_weight_from_totals(self.score)
+
+        self.assertEqual(result["failure_score"], expected["failure_score"])
+        self.assertEqual(result["forgetting_score"], expected["forgetting_score"])
+        self.assertEqual(result["weight"], expected["weight"])
+
+
+class BackfillDecayedTotalsCommandTest(UserCountryScoreTestCase):
+    def test_backfill(self):
+        self.add_guesses([(10, False), (5, True)])
+        other_score = UserCountryScoreFactory(
+            user=self.user, country=self.country, game_mode=GameModes.GUESS_COUNTRY_FROM_FLAG_CHALLENGE_COMBO
+        )
+        other_score.decayed_total = 3
+        other_score.save()
+
+        call_command("backfill_decayed_totals", batch_size=1)
+
+        self.score.refresh_from_db()
+        self.assertEqual(self.score.last_guess_at, self.now - timedelta(minutes=5))
+        self.assertAlmostEqual(self.score.decayed_failures, UserCountryScore.get_decay(5))
+        self.assertAlmostEqual(self.score.decayed_total, UserCountryScore.get_decay(5) + 1)
+        # No guesses
+        other_score.refresh_from_db()
+        self.assertEqual(other_score.decayed_total, 0)
+        self.assertIsNone(other_score.last_guess_at)
+
+
+class GuessScoreTest(UserCountryScoreTestCase):
+    def test_user_guesses(self):
+        self.add_guesses([(3, False), (20, True)])
+
+        self.assertEqual(list(self.score.user_guesses.all()), list(Guess.objects.filter(score=self.score)))
+        self.assertEqual(self.score.user_guesses.count(), 2)
+
+    def test_guesses_deleted_with_score(self):
+        self.add_guesses([(3, False)])
+        other_guess = GuessFactory()
+
+        self.score.delete()
+
+        self.assertEqual(list(Guess.objects.all()), [other_guess])
@@ -0,0 +1,38 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+
+from core.management.commands.verify_indexes import Command
+from core.models import Country, Guess, User, UserCountryScore
+from core.tests.factories import CountryFactory
+from flagora.tests.base import FlagoraTestCase
+
+
+class VerifyIndexesCommandTest(FlagoraTestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(20):
+            CountryFactory(iso2_code=f"V{chr(65 + index)}", iso3_code=f"VV{chr(65 + index)}")
+
+    def test_indexes_used(self):
+        call_command("verify_indexes", stdout=StringIO())
+
+        # Seeded in a transaction rolled back
+        self.assertFalse(User.objects.filter(username__startswith="index-check-").exists())
+        self.assertFalse(UserCountryScore.objects.exists())
+        self.assertFalse(Guess.objects.exists())
+
+    def test_index_not_used(self):
+        checks = [("guesses by correctness", Guess.objects.filter(is_correct=True), ["is_correct"])]
+
+        with patch.object(Command, "get_checks", return_value=checks), self.assertRaises(CommandError) as context:
+            call_command("verify_indexes", stdout=StringIO())
+
+        self.assertIn("guesses by correctness", str(context.exception))
+
+    def test_no_country(self):
+        Country.objects.all().delete()
+
+        with self.assertRaises(CommandError):
+            call_command("verify_indexes", stdout=StringIO())
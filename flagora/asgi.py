@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
+import atexit
 import os
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "flagora.settings")
@@ -20,8 +21,13 @@ django_asgi_app = get_asgi_application()
 from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
 from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
 
+from api.guess_recorder import guess_recorder  # noqa: E402
 from api.routing import websocket_urlpatterns  # noqa: E402
 
+# Write the queued guesses periodically, and once more on shutdown
+guess_recorder.start()
+atexit.register(guess_recorder.stop)
+
 application = ProtocolTypeRouter(
     {
         "http": django_asgi_app,
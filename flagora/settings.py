@@ -104,6 +104,38 @@ CACHES = {
         "LOCATION": f"redis://{os.environ['REDIS_HOST']}:{os.environ['REDIS_PORT']}",
     }
 }
+
+# Game websocket
+# "thread_sensitive" (channels default): sync handlers of all connections share one thread
+# "pool": sync handlers run on a bounded thread pool, see api/game_executor.py
+GAME_EXECUTION_MODE = os.environ.get("GAME_EXECUTION_MODE", "thread_sensitive")
+GAME_EXECUTOR_MAX_WORKERS = int(os.environ.get("GAME_EXECUTOR_MAX_WORKERS", "8"))
+# Interval of the queue depth logs of the pool, 0 to disable
+GAME_EXECUTOR_STATS_LOG_SECONDS = float(os.environ.get("GAME_EXECUTOR_STATS_LOG_SECONDS", "60"))
+# Number of questions that can still be answered in a game, older ones are dropped.
+# Must stay above the number of questions sent at once.
+GAME_QUESTION_LOG_RETENTION = int(os.environ.get("GAME_QUESTION_LOG_RETENTION", "500"))
+# Number of questions sent at once in challenge modes
+GAME_CHALLENGE_CHUNK_SIZE = int(os.environ.get("GAME_CHALLENGE_CHUNK_SIZE", "20"))
+# Engine computing the weights of the personalized questions: "python",
+# "numpy" (vectorized, same results, needs the numpy extra: uv sync --extra numpy),
+# "totals" (from the decayed totals of the scores, run the backfill_decayed_totals command first)
+# or "database" (weights and weighted selection computed by PostgreSQL, only the selection is fetched)
+GAME_WEIGHTING_ENGINE = os.environ.get("GAME_WEIGHTING_ENGINE", "python")
+# Personalized questions picked in advance per player (see api/question_queue.py), 0 (the default) to disable.
+# The queue is computed again in the background when it has no more than the low-water mark.
+GAME_QUESTION_QUEUE_SIZE = int(os.environ.get("GAME_QUESTION_QUEUE_SIZE", "0"))
+GAME_QUESTION_QUEUE_LOW_WATER_MARK = int(os.environ.get("GAME_QUESTION_QUEUE_LOW_WATER_MARK", "10"))
+# Guesses are queued in Redis and written by batch, when the batch size is reached and every flush interval
+# (see api/guess_recorder.py), 0 to only flush on the batch size
+GUESS_RECORDER_BATCH_SIZE = int(os.environ.get("GUESS_RECORDER_BATCH_SIZE", "100"))
+GUESS_RECORDER_FLUSH_SECONDS = float(os.environ.get("GUESS_RECORDER_FLUSH_SECONDS", "5"))
+# Guesses older than this are folded into daily or weekly rollups by the compact_guesses command
+GUESS_COMPACTION_AFTER_DAYS = int(os.environ.get("GUESS_COMPACTION_AFTER_DAYS", "28"))
+GUESS_COMPACTION_PERIOD = os.environ.get("GUESS_COMPACTION_PERIOD", "DAY")
+# Lifetime of the signed tokens used to join a game (see api/game_token.py)
+GAME_TOKEN_MAX_AGE_SECONDS = int(os.environ.get("GAME_TOKEN_MAX_AGE_SECONDS", "300"))
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 